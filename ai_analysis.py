@@ -2,7 +2,7 @@ import os
 import json
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from openai import OpenAI
 from dotenv import load_dotenv
 
@@ -13,20 +13,73 @@ logger = logging.getLogger(__name__)
 class AIAnalyzer:
     """AI-powered health data analysis and recommendations"""
     
-    def __init__(self):
+    def __init__(self, state_store=None):
         self.api_key = os.environ.get("OPENAI_API_KEY")
+        self.state_store = state_store
         if not self.api_key:
             logger.warning("OpenAI API key not found. AI features will be limited.")
             self.client = None
         else:
             self.client = OpenAI(api_key=self.api_key)
+        
+        # Latest AI result per kind, tagged with the data version it was generated for
+        self._results = {}
+        self._synced_mtime = None
+        self.sync_from_store()
+    
+    def sync_from_store(self) -> bool:
+        """Reuse persisted AI results (from before a restart or from the scheduler leader)"""
+        if not self.state_store:
+            return False
+        mtime = self.state_store.mtime('ai')
+        if mtime is None or mtime == self._synced_mtime:
+            return False
+        self._synced_mtime = mtime
+        document = self.state_store.load('ai')
+        if not document or not document.get('payload'):
+            return False
+        self._results = document['payload']
+        logger.info(f"Restored AI analysis from {document.get('saved_at')}")
+        return True
+    
+    def get_cached_result(self, kind: str, data_version: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Result of ``kind`` generated for ``data_version``, if there is one"""
+        if data_version is None:
+            return None
+        entry = self._results.get(kind)
+        if entry and entry.get('data_version') == data_version:
+            return entry['result']
+        return None
+    
+    def _store_result(self, kind: str, data_version: Optional[int], result: Dict[str, Any]):
+        """Cache a successful AI result for its data version and persist it"""
+        if data_version is None:
+            return
+        # Replace the whole mapping so concurrent readers never see it mid-update
+        results = dict(self._results)
+        results[kind] = {
+            'data_version': data_version,
+            'generated_at': datetime.now().isoformat(),
+            'result': result
+        }
+        self._results = results
+        if self.state_store:
+            self.state_store.save('ai', results)
     
-    def generate_recommendations(self, health_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate AI-powered health recommendations based on current data"""
+    def generate_recommendations(self, health_data: Dict[str, Any], data_version: Optional[int] = None) -> Dict[str, Any]:
+        """Generate AI-powered health recommendations based on current data
+        
+        When ``data_version`` is given the result is generated once per version
+        and served from cache afterwards.
+        """
         try:
             if not self.client:
                 return self._get_fallback_recommendations()
             
+            cached = self.get_cached_result('recommendations', data_version)
+            if cached is not None:
+                return cached
+            
             # Prepare data summary for AI analysis
             data_summary = self._prepare_data_summary(health_data)
             
@@ -80,18 +133,24 @@ class AIAnalyzer:
                 max_tokens=1000
             )
             
-            return json.loads(response.choices[0].message.content)
+            result = json.loads(response.choices[0].message.content)
+            self._store_result('recommendations', data_version, result)
+            return result
             
         except Exception as e:
             logger.error(f"Error generating AI recommendations: {e}")
             return self._get_fallback_recommendations()
     
-    def simulate_scenarios(self, health_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Simulate different health scenarios using AI"""
+    def simulate_scenarios(self, health_data: Dict[str, Any], data_version: Optional[int] = None) -> Dict[str, Any]:
+        """Simulate different health scenarios using AI, once per ``data_version`` when given"""
         try:
             if not self.client:
                 return self._get_fallback_scenarios()
             
+            cached = self.get_cached_result('scenarios', data_version)
+            if cached is not None:
+                return cached
+            
             data_summary = self._prepare_data_summary(health_data)
             
             prompt = f"""
@@ -162,7 +221,9 @@ class AIAnalyzer:
                 max_tokens=1500
             )
             
-            return json.loads(response.choices[0].message.content)
+            result = json.loads(response.choices[0].message.content)
+            self._store_result('scenarios', data_version, result)
+            return result
             
         except Exception as e:
             logger.error(f"Error simulating scenarios: {e}")
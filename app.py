@@ -1,11 +1,13 @@
 import os
 import logging
-from flask import Flask, render_template, jsonify, request
+import re
+from flask import Flask, Response, render_template, jsonify, request, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
 from flask_cors import CORS
-from data_processor import HealthDataProcessor
-from ai_analysis import AIAnalyzer
-from weather_service import WeatherService
-from scheduler import DataScheduler
+import services
+from serialization import Payload, PayloadCache, dumps, json_response
+from deltas import DeltaHistory
 import json
 from datetime import datetime
 from dotenv import load_dotenv
@@ -18,26 +20,93 @@ load_dotenv() # Load environment variables from .env file
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "health-dashboard-secret-key")
+# Largest accepted report upload; bigger requests get 413
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get("MAX_UPLOAD_MB", "50")) * 1024 * 1024
 
 # Debugging: Print environment variables to check if API keys are loaded
 # Removed temporary debug print statements as per instruction
 CORS(app)
 
-# Initialize services
-try:
-    data_processor = HealthDataProcessor()
-    ai_analyzer = AIAnalyzer()
-    weather_service = WeatherService()
-    scheduler = DataScheduler(data_processor, ai_analyzer, weather_service)
+# Services (and pandas, numpy, openai, apscheduler with them) are built lazily.
+# Warm-up runs in the background once the server starts handling traffic, so
+# importing this module stays fast and starts no threads before a fork.
+@app.before_request
+def ensure_warm_up():
+    services.start_warm_up()
+
+# Encoded (and compressed) response bodies, rebuilt only when the data version changes
+payload_cache = PayloadCache()
+
+# Recent version diffs of the endpoints that accept ?since=<version>
+delta_histories = {
+    'map-data': DeltaHistory(key=lambda entry: entry['location']),
+    'disease-trends': DeltaHistory(),
+    'alerts': DeltaHistory(key=lambda entry: f"{entry['priority']}: {entry['message']}"),
+}
+
+def versioned_json(name, version, build):
+    """JSON response for ``build()``, encoded once per data version.
+    
+    Endpoints with a delta history also answer ``?since=<version>``: with
+    ``{"delta": true, "version", "added", "changed", "removed"}`` when the
+    diff can be composed, otherwise with ``{"delta": false, "version", "data"}``
+    holding the full payload.
+    
+    Point-in-time reads (``?as_of=``) of an older version are encoded per
+    request and not cached, so they never evict the current version's body;
+    their ETag still names the version they show.
+    """
+    if version is None:
+        return json_response(build(), request)
+    if request.args.get('as_of'):
+        return Payload(dumps(build()), etag=f"{name}-v{version}").to_response(request)
+    
+    history = delta_histories.get(name)
+    if history is None:
+        return payload_cache.get_or_build(name, version, build).to_response(request)
+    
+    def build_and_record():
+        data = build()
+        history.record(version, data)
+        return data
     
-    # Start the scheduler
-    scheduler.start()
-    logger.info("All services initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize services: {e}")
-    data_processor = None
-    ai_analyzer = None
-    weather_service = None
+    payload = payload_cache.get_or_build(name, version, build_and_record)
+    since = request.args.get('since', type=int)
+    if since is None:
+        return payload.to_response(request)
+    
+    delta = history.delta(since, version)
+    if delta is None:
+        # Too old (or unknown here) - wrap the already encoded full payload
+        return Payload(b'{"delta":false,"version":%d,"data":%b}' % (version, payload.body)).to_response(request)
+    return json_response({'delta': True, 'since': since, 'version': version, **delta}, request)
+
+def requested_snapshot(data_processor):
+    """``(snapshot, None)`` for the health data a read endpoint should answer from, or ``(None, error response)``.
+    
+    That is the current snapshot, or with ``?as_of=<version or ISO date/time>``
+    the one that was current then.
+    """
+    as_of = request.args.get('as_of')
+    if not as_of:
+        return data_processor.get_snapshot(), None
+    try:
+        return data_processor.get_snapshot_as_of(as_of), None
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    except LookupError as e:
+        return None, (jsonify({"error": str(e)}), 404)
+
+@app.route('/healthz')
+def healthz():
+    """Liveness probe - the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe - data and caches are loaded"""
+    status = services.get_status()
+    return jsonify(status), 200 if status['ready'] else 503
 
 @app.route('/')
 def index():
@@ -48,11 +117,14 @@ def index():
 def get_dashboard_data():
     """Get main dashboard statistics"""
     try:
+        data_processor = services.data_processor.get()
         if not data_processor:
             return jsonify({"error": "Data processor not available"}), 500
             
-        stats = data_processor.get_dashboard_stats()
-        return jsonify(stats)
+        snapshot, error = requested_snapshot(data_processor)
+        if error:
+            return error
+        return versioned_json('dashboard-data', snapshot.version, lambda: data_processor.get_dashboard_stats(snapshot))
     except Exception as e:
         logger.error(f"Error getting dashboard data: {e}")
         return jsonify({"error": "Failed to fetch dashboard data"}), 500
@@ -61,11 +133,14 @@ def get_dashboard_data():
 def get_disease_trends():
     """Get disease trend data for charts"""
     try:
+        data_processor = services.data_processor.get()
         if not data_processor:
             return jsonify({"error": "Data processor not available"}), 500
             
-        trends = data_processor.get_disease_trends()
-        return jsonify(trends)
+        snapshot, error = requested_snapshot(data_processor)
+        if error:
+            return error
+        return versioned_json('disease-trends', snapshot.version, lambda: data_processor.get_disease_trends(snapshot))
     except Exception as e:
         logger.error(f"Error getting disease trends: {e}")
         return jsonify({"error": "Failed to fetch disease trends"}), 500
@@ -74,11 +149,12 @@ def get_disease_trends():
 def get_weather_data():
     """Get current weather data"""
     try:
+        weather_service = services.weather_service.get()
         if not weather_service:
             return jsonify({"error": "Weather service not available"}), 500
             
         weather = weather_service.get_current_weather()
-        return jsonify(weather)
+        return versioned_json('weather-data', weather_service.data_version, lambda: weather)
     except Exception as e:
         logger.error(f"Error getting weather data: {e}")
         return jsonify({"error": "Failed to fetch weather data"}), 500
@@ -87,12 +163,14 @@ def get_weather_data():
 def get_ai_recommendations():
     """Get AI-powered recommendations"""
     try:
+        data_processor = services.data_processor.get()
+        ai_analyzer = services.ai_analyzer.get()
         if not ai_analyzer or not data_processor:
             return jsonify({"error": "AI analyzer not available"}), 500
             
-        current_data = data_processor.get_current_data()
-        recommendations = ai_analyzer.generate_recommendations(current_data)
-        return jsonify(recommendations)
+        snapshot = data_processor.get_snapshot()
+        recommendations = ai_analyzer.generate_recommendations(snapshot.data, data_version=snapshot.version)
+        return json_response(recommendations, request)
     except Exception as e:
         logger.error(f"Error getting AI recommendations: {e}")
         return jsonify({"error": "Failed to fetch AI recommendations"}), 500
@@ -101,12 +179,14 @@ def get_ai_recommendations():
 def get_scenario_simulation():
     """Get AI scenario simulation"""
     try:
+        data_processor = services.data_processor.get()
+        ai_analyzer = services.ai_analyzer.get()
         if not ai_analyzer or not data_processor:
             return jsonify({"error": "AI analyzer not available"}), 500
             
-        current_data = data_processor.get_current_data()
-        scenarios = ai_analyzer.simulate_scenarios(current_data)
-        return jsonify(scenarios)
+        snapshot = data_processor.get_snapshot()
+        scenarios = ai_analyzer.simulate_scenarios(snapshot.data, data_version=snapshot.version)
+        return json_response(scenarios, request)
     except Exception as e:
         logger.error(f"Error getting scenario simulation: {e}")
         return jsonify({"error": "Failed to fetch scenario simulation"}), 500
@@ -115,25 +195,87 @@ def get_scenario_simulation():
 def get_map_data():
     """Get data for disease distribution map"""
     try:
+        data_processor = services.data_processor.get()
         if not data_processor:
             return jsonify({"error": "Data processor not available"}), 500
             
-        map_data = data_processor.get_map_data()
-        logger.info(f"Returning map data with {len(map_data)} locations")
-        return jsonify(map_data)
+        snapshot, error = requested_snapshot(data_processor)
+        if error:
+            return error
+        
+        def build_map_data():
+            map_data = data_processor.get_map_data(snapshot)
+            logger.info(f"Returning map data with {len(map_data)} locations")
+            return map_data
+        
+        return versioned_json('map-data', snapshot.version, build_map_data)
     except Exception as e:
         logger.error(f"Error getting map data: {e}")
         return jsonify({"error": "Failed to fetch map data"}), 500
 
+@app.route('/api/choropleth')
+def get_choropleth():
+    """District boundaries joined to the current case counts, simplified for ?zoom=<level> (default 6)"""
+    try:
+        zoom = request.args.get('zoom', default=6, type=int)
+        data_processor = services.data_processor.get()
+        boundaries = services.boundaries.get()
+        if not data_processor or not boundaries:
+            return jsonify({"error": "Choropleth not available"}), 500
+        if not boundaries.available:
+            return jsonify({"error": boundaries.error or "No district boundaries loaded"}), 404
+        
+        snapshot, error = requested_snapshot(data_processor)
+        if error:
+            return error
+        level = boundaries.level_for_zoom(zoom)
+        return versioned_json(f'choropleth-{level}', snapshot.version,
+                              lambda: boundaries.choropleth(level, data_processor.get_location_table(snapshot)))
+    except Exception as e:
+        logger.error(f"Error getting choropleth: {e}")
+        return jsonify({"error": "Failed to fetch choropleth"}), 500
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.geojson')
+def get_map_tile(z, x, y):
+    """GeoJSON tile of the disease map's district locations.
+    
+    Tiles survive data versions unless one of their districts changed, and
+    their ETags with them; browsers revalidate (no-cache) and mostly get 304.
+    """
+    try:
+        from map_tiles import GEOJSON_MIMETYPE, is_valid_tile
+        if not is_valid_tile(z, x, y):
+            return jsonify({"error": "No such tile"}), 404
+        
+        data_processor = services.data_processor.get()
+        tiles = services.map_tiles.get()
+        if not data_processor or not tiles:
+            return jsonify({"error": "Map tiles not available"}), 500
+        
+        snapshot, error = requested_snapshot(data_processor)
+        if error:
+            return error
+        # Tiles of an older version (?as_of) are built without touching the cache
+        payload = tiles.get(snapshot.version, data_processor.get_location_table(snapshot), z, x, y)
+        response = payload.to_response(request, mimetype=GEOJSON_MIMETYPE)
+        response.cache_control.no_cache = True
+        return response
+    except Exception as e:
+        logger.error(f"Error getting map tile {z}/{x}/{y}: {e}")
+        return jsonify({"error": "Failed to fetch map tile"}), 500
+
 @app.route('/api/alerts')
 def get_alerts():
     """Get current health alerts"""
     try:
+        data_processor = services.data_processor.get()
         if not data_processor:
             return jsonify({"error": "Data processor not available"}), 500
             
-        alerts = data_processor.get_alerts()
-        return jsonify(alerts)
+        snapshot, error = requested_snapshot(data_processor)
+        if error:
+            return error
+        return versioned_json('alerts', snapshot.version, lambda: data_processor.get_alerts(snapshot))
     except Exception as e:
         logger.error(f"Error getting alerts: {e}")
         return jsonify({"error": "Failed to fetch alerts"}), 500
@@ -142,11 +284,14 @@ def get_alerts():
 def get_high_risk_areas():
     """Get top 5 high-risk areas for health alerts"""
     try:
+        data_processor = services.data_processor.get()
         if not data_processor:
             return jsonify({"error": "Data processor not available"}), 500
             
-        high_risk_areas = data_processor.get_high_risk_areas()
-        return jsonify(high_risk_areas)
+        snapshot, error = requested_snapshot(data_processor)
+        if error:
+            return error
+        return versioned_json('high-risk-areas', snapshot.version, lambda: data_processor.get_high_risk_areas(snapshot))
     except Exception as e:
         logger.error(f"Error getting high-risk areas: {e}")
         return jsonify({"error": "Failed to fetch high-risk areas"}), 500
@@ -155,24 +300,110 @@ def get_high_risk_areas():
 def get_disease_surveillance():
     """Get disease surveillance data"""
     try:
+        data_processor = services.data_processor.get()
         if not data_processor:
             return jsonify({"error": "Data processor not available"}), 500
             
-        surveillance_data = data_processor.get_disease_surveillance()
-        return jsonify(surveillance_data)
+        snapshot, error = requested_snapshot(data_processor)
+        if error:
+            return error
+        return versioned_json('disease-surveillance', snapshot.version,
+                              lambda: data_processor.get_disease_surveillance(snapshot))
     except Exception as e:
         logger.error(f"Error getting disease surveillance: {e}")
         return jsonify({"error": "Failed to fetch disease surveillance"}), 500
 
+@app.route('/api/surveillance')
+def get_surveillance():
+    """Slice the surveillance cube: ?level=national|province|district&province=&disease=&weeks=&as_of="""
+    try:
+        data_processor = services.data_processor.get()
+        if not data_processor:
+            return jsonify({"error": "Data processor not available"}), 500
+            
+        snapshot, error = requested_snapshot(data_processor)
+        if error:
+            return error
+        surveillance = data_processor.get_surveillance(
+            level=request.args.get('level', 'national'),
+            province=request.args.get('province'),
+            disease=request.args.get('disease'),
+            weeks=request.args.get('weeks', type=int),
+            snapshot=snapshot
+        )
+        return json_response(surveillance, request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting surveillance slice: {e}")
+        return jsonify({"error": "Failed to fetch surveillance data"}), 500
+
+@app.route('/api/export')
+def export_data():
+    """Download weekly case counts: ?format=csv|parquet&from=<week>&to=<week>&province=&disease=
+    
+    CSV is streamed while it is produced. Both formats are spooled to disk
+    per data version and filters, so Range requests (resumed downloads,
+    guarded by If-Range) are answered from the complete file.
+    """
+    try:
+        from data_export import MIMETYPES, ExportQuery, parquet_available
+        data_processor = services.data_processor.get()
+        exporter = services.exporter.get()
+        if not data_processor or not exporter:
+            return jsonify({"error": "Export not available"}), 500
+        
+        query = ExportQuery(
+            format=request.args.get('format', 'csv').lower(),
+            from_week=request.args.get('from') or None,
+            to_week=request.args.get('to') or None,
+            province=request.args.get('province') or None,
+            disease=request.args.get('disease') or None
+        )
+        if query.format not in MIMETYPES:
+            return jsonify({"error": f"format must be one of {', '.join(MIMETYPES)}"}), 400
+        for week in (query.from_week, query.to_week):
+            if week and not re.fullmatch(r'\d{4}-W\d{2}', week):
+                return jsonify({"error": "from and to must look like 2025-W30"}), 400
+        if query.format == 'parquet' and not parquet_available():
+            return jsonify({"error": "Parquet export needs pyarrow, which is not installed"}), 501
+        
+        version = data_processor.data_version
+        etag = query.key(version)
+        path = exporter.spooled(version, query)
+        if path is None and (query.format == 'parquet' or request.range is not None):
+            path = exporter.build(version, query)
+        if path is not None:
+            return send_file(path, mimetype=query.mimetype, as_attachment=True, download_name=query.filename,
+                             etag=etag, conditional=True, max_age=0)
+        
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(exporter.stream(version, query), mimetype=query.mimetype)
+            response.headers['Content-Disposition'] = f'attachment; filename="{query.filename}"'
+            response.headers['X-Accel-Buffering'] = 'no'
+        response.set_etag(etag)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.cache_control.no_cache = True
+        return response
+    except Exception as e:
+        logger.error(f"Error exporting data: {e}")
+        return jsonify({"error": "Failed to export data"}), 500
+
 @app.route('/api/climate-monitoring')
 def get_climate_monitoring():
     """Get climate and environmental health monitoring data"""
     try:
+        data_processor = services.data_processor.get()
+        weather_service = services.weather_service.get()
         if not weather_service or not data_processor:
             return jsonify({"error": "Services not available"}), 500
             
-        climate_data = weather_service.get_climate_health_monitoring()
-        return jsonify(climate_data)
+        # Refresh the weather cache first so the version matches what gets encoded
+        weather_service.get_current_weather()
+        return versioned_json('climate-monitoring', weather_service.data_version,
+                              weather_service.get_climate_health_monitoring)
     except Exception as e:
         logger.error(f"Error getting climate monitoring: {e}")
         return jsonify({"error": "Failed to fetch climate monitoring"}), 500
@@ -181,11 +412,13 @@ def get_climate_monitoring():
 def get_weather_alerts():
     """Get weather alerts for health monitoring"""
     try:
+        weather_service = services.weather_service.get()
         if not weather_service:
             return jsonify({"error": "Weather service not available"}), 500
             
-        alerts = weather_service.get_weather_alerts()
-        return jsonify(alerts)
+        # Refresh the weather cache first so the version matches what gets encoded
+        weather_service.get_current_weather()
+        return versioned_json('weather-alerts', weather_service.data_version, weather_service.get_weather_alerts)
     except Exception as e:
         logger.error(f"Error getting weather alerts: {e}")
         return jsonify({
@@ -194,18 +427,139 @@ def get_weather_alerts():
             'last_updated': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/events')
+def stream_events():
+    """Server-sent events announcing new data versions and the sections they affect"""
+    try:
+        broker = services.event_broker.get()
+        if not broker:
+            return jsonify({"error": "Event stream not available"}), 500
+            
+        broker.start()
+        if not broker.try_open():
+            return jsonify({"error": "Too many open event streams"}), 503, {'Retry-After': '60'}
+        
+        response = Response(broker.stream(), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        # Stop nginx-style proxies from buffering the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.call_on_close(broker.release)
+        return response
+    except Exception as e:
+        logger.error(f"Error opening event stream: {e}")
+        return jsonify({"error": "Failed to open event stream"}), 500
+
+@app.route('/api/reports', methods=['POST'])
+def upload_report():
+    """Upload a weekly report workbook and ingest it right away.
+    
+    Send it as multipart form field ``file``, or as the raw request body
+    with ``?filename=``. ``week`` (e.g. 2025-W30) gives the epi-week; it may
+    be left out when the file name carries it ("Weekly_Report-21-2025.xlsx",
+    "IDSR week 30 2025.xlsx") or the workbook's title does, and the upload
+    is rejected otherwise. A file name
+    already in the data directory is rejected with 409, never overwritten.
+    A report older than the latest one is only added to the surveillance
+    history; the current report stays published.
+    """
+    try:
+        data_processor = services.data_processor.get()
+        if not data_processor:
+            return jsonify({"error": "Data processor not available"}), 500
+            
+        upload = request.files.get('file')
+        if upload is not None:
+            stream, filename = upload.stream, upload.filename
+        else:
+            stream, filename = request.stream, request.args.get('filename')
+        filename = secure_filename(filename or '')
+        if not filename.lower().endswith('.xlsx'):
+            return jsonify({"error": "An .xlsx file name is required"}), 400
+        
+        week = request.values.get('week')
+        if week and not re.fullmatch(r'\d{4}-W\d{2}', week):
+            return jsonify({"error": "week must look like 2025-W30"}), 400
+        
+        result = data_processor.ingest_upload(stream, filename, week=week)
+        logger.info(f"Ingested uploaded report {filename}: {result}")
+        return jsonify(result), 201
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Report is too large"}), 413
+    except FileExistsError as e:
+        return jsonify({"error": f"{e}; upload it under a new name"}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error ingesting uploaded report: {e}")
+        return jsonify({"error": "Failed to ingest report"}), 500
+
+@app.route('/api/reports/weekly.xlsx')
+def get_weekly_report():
+    """Weekly Excel report of the current data version.
+    
+    Served from the per-version cache once built. Until then this starts a
+    build in the background (if none is running) and answers 202 with a
+    Retry-After header, so no web worker waits for the workbook.
+    """
+    try:
+        from weekly_report import XLSX_MIMETYPE
+        weekly_reports = services.weekly_reports.get()
+        if not weekly_reports:
+            return jsonify({"error": "Weekly reports not available"}), 500
+        
+        build = weekly_reports.request()
+        version = build['version']
+        if build['status'] == 'ready':
+            return send_file(weekly_reports.path(version), mimetype=XLSX_MIMETYPE, as_attachment=True,
+                             download_name=f"weekly_report_v{version}.xlsx", etag=f"weekly-report-v{version}",
+                             conditional=True, max_age=0)
+        if build['status'] == 'failed':
+            return jsonify({"error": "Failed to build weekly report", "version": version}), 500
+        
+        response = jsonify({"message": "Weekly report is being built", **build})
+        response.headers['Retry-After'] = '5'
+        return response, 202
+    except Exception as e:
+        logger.error(f"Error getting weekly report: {e}")
+        return jsonify({"error": "Failed to fetch weekly report"}), 500
+
 @app.route('/api/refresh-data', methods=['POST'])
 def refresh_data():
-    """Manually refresh all data"""
+    """Queue a background refresh of all data"""
     try:
-        if scheduler:
-            scheduler.update_all_data()
-            return jsonify({"message": "Data refresh initiated"})
-        else:
+        scheduler = services.scheduler.get()
+        if not scheduler:
             return jsonify({"error": "Scheduler not available"}), 500
+        
+        job, created = scheduler.request_refresh(trigger='manual')
+        status_url = f"/api/refresh-status/{job['job_id']}"
+        response = jsonify({
+            "message": "Data refresh initiated" if created else "Data refresh already in progress",
+            "job_id": job['job_id'],
+            "status": job['status'],
+            "status_url": status_url
+        })
+        response.headers['Location'] = status_url
+        return response, 202
     except Exception as e:
         logger.error(f"Error refreshing data: {e}")
         return jsonify({"error": "Failed to refresh data"}), 500
 
+@app.route('/api/refresh-status/<job_id>')
+def get_refresh_status(job_id):
+    """Get progress and stage timings of a refresh job"""
+    try:
+        scheduler = services.scheduler.get()
+        if not scheduler:
+            return jsonify({"error": "Scheduler not available"}), 500
+        
+        job_status = scheduler.get_refresh_job(job_id)
+        if job_status is None:
+            return jsonify({"error": "Refresh job not found"}), 404
+        return jsonify(job_status)
+    except Exception as e:
+        logger.error(f"Error getting refresh status: {e}")
+        return jsonify({"error": "Failed to fetch refresh status"}), 500
+
 if __name__ == '__main__':
     app.run(debug=True, host="0.0.0.0", port=8000)
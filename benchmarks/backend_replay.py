@@ -0,0 +1,323 @@
+"""Record and replay the app's OpenAI and OpenWeatherMap traffic.
+
+Run from the project root:
+
+    python -m benchmarks.backend_replay record recordings/ [--port 8765]
+    python -m benchmarks.backend_replay replay recordings/ [--port 8765] [--latency-scale 1]
+        [--error-rate 0.05] [--reset-rate 0.01] [--hang-rate 0.01] [--hang-seconds 30]
+
+Both modes serve the two backends on one local port with the paths of
+StubServer, so the app is pointed at it with OPENWEATHER_BASE_URL and
+OPENAI_BASE_URL (printed on start). In record mode each request is
+forwarded to the real service with the app's own API keys, and the
+response is appended to recordings.jsonl in the directory along with
+its round-trip time. API keys are never written.
+
+In replay mode the recorded responses are served back after their
+recorded latency (times --latency-scale, or a fixed --latency-ms). At the
+given rates, faults are injected instead: error responses, connections
+closed without a response, and requests held for --hang-seconds before
+the answer. A request gets a recording of the same request if there is
+one, else one of the same route (the same weather endpoint, or a
+completion with the same model and system prompt, since the prompts
+embed the current data), else a 404. Faults are drawn from a seeded
+generator, so a run with the same --seed injects the same sequence.
+
+benchmarks.load_test --replay DIR runs the load test against recordings.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import StubServer  # noqa: E402
+
+RECORDINGS_FILE = 'recordings.jsonl'
+
+# Local path prefix and real base URL of each backend
+UPSTREAMS = {
+    'weather': ('/data/2.5', 'https://api.openweathermap.org/data/2.5'),
+    'openai': ('/v1', 'https://api.openai.com/v1')
+}
+
+# Query parameters that carry credentials; forwarded, never recorded or matched on
+SECRET_PARAMS = ('appid',)
+
+FORWARDED_HEADERS = ('Authorization', 'Content-Type', 'Accept', 'OpenAI-Organization', 'OpenAI-Project')
+
+FAULTS = ('error', 'reset', 'hang')
+
+
+def route(path):
+    """(backend, upstream path) of a local request path, or (None, None)"""
+    for backend, (prefix, _) in UPSTREAMS.items():
+        if path.startswith(prefix + '/'):
+            return backend, path[len(prefix):]
+    return None, None
+
+
+def request_keys(backend, path, query, body):
+    """The key of this exact request and the looser key of its route"""
+    if backend == 'openai':
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            request = {}
+        system = next((message.get('content', '') for message in request.get('messages', [])
+                       if message.get('role') == 'system'), '')
+        exact = hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+        loose = hashlib.sha256(f"{request.get('model')}\n{system}".encode()).hexdigest()
+        return f"openai {path} {exact}", f"openai {path} {loose}"
+    params = '&'.join(f"{key}={value}" for key, value in sorted(query.items()) if key not in SECRET_PARAMS)
+    return f"{backend} {path}?{params}", f"{backend} {path}"
+
+
+def error_body(backend, status, message):
+    if backend == 'openai':
+        return {'error': {'message': message, 'type': 'server_error', 'code': status}}
+    return {'cod': status, 'message': message}
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.handle_backend('GET')
+
+    def do_POST(self):
+        self.handle_backend('POST')
+
+    def handle_backend(self, method):
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        backend, path = route(url.path)
+        if backend is None:
+            return self.reply(404, error_body(None, 404, 'not found'))
+        query = dict(parse_qsl(url.query))
+        server = self.server
+        server.count(backend)
+
+        if server.recording:
+            entry = server.forward(backend, method, path, query, body, self.headers)
+            if entry is None:
+                return self.reply(502, error_body(backend, 502, 'upstream request failed'))
+            return self.reply(entry['status'], entry['body'], entry['content_type'])
+
+        fault = server.draw_fault(backend)
+        if fault == 'reset':
+            # Close the connection without answering
+            self.close_connection = True
+            return
+        if fault == 'hang':
+            time.sleep(server.hang_seconds)
+        entry = server.match(backend, path, query, body)
+        if entry is None:
+            return self.reply(404, error_body(backend, 404, 'no recording for this request'))
+        time.sleep(server.latency_of(entry))
+        if fault == 'error':
+            return self.reply(server.error_status, error_body(backend, server.error_status, 'injected fault'))
+        self.reply(entry['status'], entry['body'], entry['content_type'])
+
+    def reply(self, status, body, content_type='application/json'):
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer(StubServer):
+    """Records backend traffic to ``directory``, or replays it with configurable latency and faults"""
+
+    def __init__(self, directory, record=False, latency_scale=1.0, latency=None, error_rate=0.0,
+                 error_status=503, reset_rate=0.0, hang_rate=0.0, hang_seconds=30.0, seed=0,
+                 host='127.0.0.1', port=0):
+        super().__init__(latency or 0.0, host, port, handler=ReplayHandler)
+        self.directory = directory
+        self.path = os.path.join(directory, RECORDINGS_FILE)
+        self.recording = record
+        self.latency_scale = latency_scale
+        self.fixed_latency = latency
+        self.rates = {'error': error_rate, 'reset': reset_rate, 'hang': hang_rate}
+        self.error_status = error_status
+        self.hang_seconds = hang_seconds
+        self.random = random.Random(seed)
+        self.exact = defaultdict(list)
+        self.routes = defaultdict(list)
+        self.turns = Counter()
+        self.outcomes = {backend: Counter() for backend in UPSTREAMS}
+
+        if record:
+            os.makedirs(directory, exist_ok=True)
+        else:
+            self.load()
+
+    def load(self):
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    self.index(json.loads(line))
+
+    def index(self, entry):
+        self.exact[entry['key']].append(entry)
+        self.routes[entry['route']].append(entry)
+
+    def environ(self):
+        env = super().environ()
+        if self.recording:
+            # Recording forwards the app's real keys
+            del env['OPENAI_API_KEY'], env['OPENWEATHER_API_KEY']
+        return env
+
+    def forward(self, backend, method, path, query, body, headers):
+        """Send the request to the real service, record the response and return it"""
+        import requests
+
+        key, loose = request_keys(backend, path, query, body)
+        start = time.perf_counter()
+        try:
+            response = requests.request(method, UPSTREAMS[backend][1] + path, params=query, data=body or None,
+                                        headers={name: headers[name] for name in FORWARDED_HEADERS if name in headers},
+                                        timeout=120)
+        except requests.RequestException as e:
+            print(f"{backend} {method} {path}: {e}", file=sys.stderr)
+            with self._lock:
+                self.outcomes[backend]['failed'] += 1
+            return None
+        entry = {
+            'backend': backend,
+            'method': method,
+            'path': path,
+            'query': {name: value for name, value in query.items() if name not in SECRET_PARAMS},
+            'key': key,
+            'route': loose,
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type', 'application/json'),
+            'body': response.text,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+            'recorded_at': datetime.now().isoformat(timespec='seconds')
+        }
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            self.index(entry)
+            self.outcomes[backend]['recorded'] += 1
+        return entry
+
+    def match(self, backend, path, query, body):
+        """A recording of this request, else of its route, taking turns among several"""
+        key, loose = request_keys(backend, path, query, body)
+        with self._lock:
+            for outcome, candidates, turn in (('replayed', self.exact.get(key), key),
+                                              ('fallback', self.routes.get(loose), loose)):
+                if candidates:
+                    self.outcomes[backend][outcome] += 1
+                    self.turns[turn] += 1
+                    return candidates[(self.turns[turn] - 1) % len(candidates)]
+            self.outcomes[backend]['missed'] += 1
+        return None
+
+    def draw_fault(self, backend):
+        with self._lock:
+            draw = self.random.random()
+            for fault in FAULTS:
+                if draw < self.rates[fault]:
+                    self.outcomes[backend][fault] += 1
+                    return fault
+                draw -= self.rates[fault]
+        return None
+
+    def latency_of(self, entry):
+        if self.fixed_latency is not None:
+            return self.fixed_latency
+        return entry['latency_ms'] / 1000 * self.latency_scale
+
+    def summary(self):
+        with self._lock:
+            return {backend: {'requests': self.calls[backend], **outcomes}
+                    for backend, outcomes in self.outcomes.items()}
+
+
+def add_replay_arguments(parser):
+    """Latency and fault options of a replay, shared with benchmarks.load_test"""
+    group = parser.add_argument_group('replay')
+    group.add_argument('--latency-scale', type=float, default=1.0, help='multiplier of the recorded latencies')
+    group.add_argument('--latency-ms', type=float, help='fixed latency instead of the recorded one')
+    group.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with an error')
+    group.add_argument('--error-status', type=int, default=503)
+    group.add_argument('--reset-rate', type=float, default=0.0, help='share of connections closed unanswered')
+    group.add_argument('--hang-rate', type=float, default=0.0, help='share of requests held for --hang-seconds')
+    group.add_argument('--hang-seconds', type=float, default=30.0)
+    group.add_argument('--seed', type=int, default=0, help='seed of the fault sequence')
+    return group
+
+
+def replay_server(directory, args, host='127.0.0.1', port=0):
+    """A ReplayServer of ``directory`` configured from ``add_replay_arguments`` options"""
+    return ReplayServer(directory, latency_scale=args.latency_scale,
+                        latency=None if args.latency_ms is None else args.latency_ms / 1000,
+                        error_rate=args.error_rate, error_status=args.error_status, reset_rate=args.reset_rate,
+                        hang_rate=args.hang_rate, hang_seconds=args.hang_seconds, seed=args.seed,
+                        host=host, port=port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('mode', choices=('record', 'replay'))
+    parser.add_argument('directory', help=f'directory of {RECORDINGS_FILE}')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', action='store_true', help='print the summary on exit as JSON')
+    add_replay_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.mode == 'replay' and not os.path.exists(os.path.join(args.directory, RECORDINGS_FILE)):
+        print(f"No {RECORDINGS_FILE} in {args.directory}; record one first", file=sys.stderr)
+        return 2
+    if args.mode == 'record':
+        server = ReplayServer(args.directory, record=True, host=args.host, port=args.port)
+    else:
+        server = replay_server(args.directory, args, args.host, args.port)
+
+    print(f"{args.mode.capitalize()}ing on {server.base_url}; start the app with:", file=sys.stderr)
+    for name, value in server.environ().items():
+        print(f"  export {name}={value}", file=sys.stderr)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    server.start()
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+    summary = server.summary()
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    for backend, outcomes in summary.items():
+        print(f"{backend:<8} " + ', '.join(f"{name} {count}" for name, count in outcomes.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
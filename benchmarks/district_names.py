@@ -0,0 +1,102 @@
+"""Cost of resolving raw district names to canonical district ids.
+
+Run from the project root:
+
+    python -m benchmarks.district_names [--repeat 100000]
+
+The script builds a fresh DistrictIndex and resolves the district
+spellings of the weekly reports, boundary files and weather feed. It
+reports the time to build the index, to resolve a name the first time
+(exact and trigram matches) and from the memo afterwards, and checks
+that every spelling lands on the expected district.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from district_names import DistrictIndex  # noqa: E402
+
+# (spelling, province, expected canonical name or None for a non-district row)
+SPELLINGS = [
+    ('D.I. Khan', 'KP', 'Dera Ismail Khan'),
+    ('Dera Ismail Khan', 'Khyber Pakhtunkhwa', 'Dera Ismail Khan'),
+    ('Kamber', 'Sindh', 'Kambar Shahdadkot'),
+    ('Kambar Shahdad Kot', 'Sindh', 'Kambar Shahdadkot'),
+    ('Kachhi (Bolan)', 'Balochistan', 'Kachhi'),
+    ('MusaKhel', 'Balochistan', 'Musakhel'),
+    ('Sohbat pur', 'Balochistan', 'Sohbatpur'),
+    ('Lasbella', 'Baluchistan', 'Lasbela'),
+    ('SWU', 'KP', 'South Waziristan Upper'),
+    ('South Waziristan (Lower)', 'KP', 'South Waziristan Lower'),
+    ('L & C Kurram', 'KP', 'Lower Kurram'),
+    ('Naushero Feroze', 'Sindh', 'Naushahro Feroze'),
+    ('Nawabshah', 'Sindh', 'Shaheed Benazirabad'),
+    ('Mirpurkhas', 'Sindh', 'Mirpur Khas'),
+    ('Larkano', 'Sindh', 'Larkana'),
+    ('Karachi Centre', 'Sindh', 'Karachi Central'),
+    ('Tando Mohammad Khan', 'Sindh', 'Tando Muhammad Khan'),
+    ('Islamabad', None, 'Islamabad'),
+    ('Quetta', None, 'Quetta'),
+    ('Total', 'KP', None),
+    ('Sindh Labs', 'Sindh', None),
+]
+
+
+def measure(repeat):
+    start = time.perf_counter()
+    index = DistrictIndex()
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    resolved = [index.resolve(name, province) for name, province, _ in SPELLINGS]
+    cold_seconds = (time.perf_counter() - start) / len(SPELLINGS)
+
+    wrong = [name for (name, _, expected), district_id in zip(SPELLINGS, resolved)
+             if (None if district_id is None else index.name(district_id)) != expected]
+
+    start = time.perf_counter()
+    for _ in range(repeat // len(SPELLINGS)):
+        for name, province, _ in SPELLINGS:
+            index.resolve(name, province)
+    memo_seconds = (time.perf_counter() - start) / (repeat // len(SPELLINGS) * len(SPELLINGS))
+
+    status = index.get_status()
+    return {
+        'districts': status['districts'],
+        'spellings': status['spellings'],
+        'trigrams': status['trigrams'],
+        'build_ms': round(build_seconds * 1000, 2),
+        'first_resolve_us': round(cold_seconds * 1e6, 1),
+        'memo_resolve_us': round(memo_seconds * 1e6, 2),
+        'resolved': status['resolved'],
+        'wrong': wrong
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=100000)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    result = measure(args.repeat)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0 if not result['wrong'] else 1
+
+    print(f"{result['districts']} districts, {result['spellings']} spellings, {result['trigrams']} trigrams")
+    print(f"  build index:            {result['build_ms']:10.2f} ms")
+    print(f"  first resolve:          {result['first_resolve_us']:10.1f} us per name")
+    print(f"  memoized resolve:       {result['memo_resolve_us']:10.2f} us per name")
+    print(f"  resolves by path:       {result['resolved']}")
+    print(f"  wrong matches:          {', '.join(result['wrong']) or 'none'}")
+    return 0 if not result['wrong'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
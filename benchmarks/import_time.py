@@ -0,0 +1,105 @@
+"""Measure how long `import app` takes and which heavy modules it pulls in.
+
+Run from the project root:
+
+    python -m benchmarks.import_time [--runs 5] [--max-ms 1500]
+
+Exits non-zero when the median import time exceeds ``--max-ms`` or when a
+module that should be imported lazily (pandas, numpy, openai, apscheduler)
+is loaded at import time, so start-up regressions are caught early.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported by the background warm-up
+LAZY_MODULES = ('pandas', 'numpy', 'openai', 'apscheduler')
+
+PROBE = """
+import sys, time, json, logging
+logging.disable(logging.CRITICAL)
+start = time.perf_counter()
+import app
+elapsed_ms = (time.perf_counter() - start) * 1000
+lazy = {lazy!r}
+print(json.dumps({{
+    'import_ms': elapsed_ms,
+    'eager_heavy_modules': [name for name in lazy if name in sys.modules],
+    'modules_loaded': len(sys.modules)
+}}))
+"""
+
+
+def measure_once():
+    """Import app in a fresh interpreter and return its measurements"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(lazy=LAZY_MODULES)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit=10):
+    """Top modules by cumulative import time, from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package"
+        try:
+            _, cumulative_us, name = line[len('import time:'):].split('|')
+            rows.append((int(cumulative_us), name.strip()))
+        except ValueError:
+            continue
+    rows.sort(reverse=True)
+    return [{'module': name, 'cumulative_ms': round(us / 1000, 1)} for us, name in rows[:limit]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to measure')
+    parser.add_argument('--max-ms', type=float, default=1500.0, help='fail if the median import time is above this')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    runs = [measure_once() for _ in range(args.runs)]
+    timings = [run['import_ms'] for run in runs]
+    report = {
+        'runs': args.runs,
+        'median_ms': round(statistics.median(timings), 1),
+        'min_ms': round(min(timings), 1),
+        'max_ms': round(max(timings), 1),
+        'modules_loaded': runs[-1]['modules_loaded'],
+        'eager_heavy_modules': runs[-1]['eager_heavy_modules'],
+        'slowest_imports': slowest_imports()
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import app: median {report['median_ms']} ms (min {report['min_ms']}, max {report['max_ms']}) "
+              f"over {args.runs} runs, {report['modules_loaded']} modules loaded")
+        for row in report['slowest_imports']:
+            print(f"  {row['cumulative_ms']:>8.1f} ms  {row['module']}")
+
+    failures = []
+    if report['eager_heavy_modules']:
+        failures.append(f"heavy modules imported eagerly: {', '.join(report['eager_heavy_modules'])}")
+    if report['median_ms'] > args.max_ms:
+        failures.append(f"median import time {report['median_ms']} ms exceeds {args.max_ms} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
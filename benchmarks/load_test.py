@@ -0,0 +1,363 @@
+"""Load test: many dashboards polling one gunicorn deployment.
+
+Run from the project root:
+
+    python -m benchmarks.load_test [--clients 1 10 50 100] [--duration 60] [--interval 300]
+
+The script starts a local stand-in for OpenWeatherMap and OpenAI
+(benchmarks.stubs.StubServer, with --backend-latency-ms per call) and
+gunicorn with the project's gunicorn.conf.py, pointed at the stand-in,
+in a scratch directory holding a copy of data/ (or, with --districts, a
+synthetic report of that size). With --replay DIR the stand-in serves
+responses recorded by benchmarks.backend_replay instead, with their
+latency and optional injected faults. Then, for each client count N, it
+simulates N dashboards opened over --ramp seconds. Each one does what
+dashboard.js does on load: the 11 /api/* fetches at once, over up to
+six keep-alive connections as a browser would, with ?since=<version> on
+the delta endpoints. It repeats the burst every --interval seconds, the
+refresh dashboard.js falls back to without EventSource, revalidating
+with If-None-Match like the browser cache (--no-cache sends plain GETs).
+With --sse every dashboard also holds an /api/events stream open, which
+ties up a gunicorn thread for the whole run, as real tabs do.
+
+For each N it reports p50/p95/p99 latency per endpoint, the time for a
+whole burst (page load), throughput and error rate. Errors are failed
+connections and responses with status 400 or above. Use a short
+--interval (e.g. 5) to compress many minutes of polling into one run.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.preload_memory import DASHBOARD_ENDPOINTS, child_pids, free_port, wait_until_ready  # noqa: E402
+from benchmarks.backend_replay import add_replay_arguments, replay_server  # noqa: E402
+from benchmarks.stubs import StubServer  # noqa: E402
+from benchmarks.synthetic_workbook import write_report  # noqa: E402
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# dashboard.js fetches these with ?since=<last version seen>
+DELTA_ENDPOINTS = ('/api/alerts', '/api/disease-trends')
+
+# Browsers open at most six HTTP/1.1 connections per host
+CONNECTIONS_PER_CLIENT = 6
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class Recorder:
+    """Latencies and outcomes of every request in one phase, shared by the clients"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.bursts = []
+        self.started = None
+        self.finished = None
+
+    def request(self, endpoint, status, seconds):
+        with self.lock:
+            now = time.perf_counter()
+            if self.started is None or now - seconds < self.started:
+                self.started = now - seconds
+            self.finished = now
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+
+    def burst(self, seconds):
+        with self.lock:
+            self.bursts.append(seconds)
+
+
+class Dashboard:
+    """One browser tab running dashboard.js"""
+
+    def __init__(self, host, port, recorder, revalidate=True, timeout=60):
+        self.host = host
+        self.port = port
+        self.recorder = recorder
+        self.revalidate = revalidate
+        self.timeout = timeout
+        self.etags = {}
+        self.versions = {}
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(CONNECTIONS_PER_CLIENT)
+        self.stream = None
+
+    def connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self.local.connection
+
+    def fetch(self, endpoint):
+        path = endpoint
+        if endpoint in DELTA_ENDPOINTS:
+            path = f"{endpoint}?since={self.versions.get(endpoint, 0)}"
+        headers = {'Accept': 'application/json'}
+        if self.revalidate and path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+
+        start = time.perf_counter()
+        try:
+            status, etag, body = self.request(path, headers)
+        except (OSError, http.client.HTTPException):
+            self.recorder.request(endpoint, 0, time.perf_counter() - start)
+            return
+        self.recorder.request(endpoint, status, time.perf_counter() - start)
+
+        if status == 200:
+            if etag:
+                self.etags[path] = etag
+            if endpoint in DELTA_ENDPOINTS:
+                try:
+                    self.versions[endpoint] = json.loads(body).get('version', 0)
+                except ValueError:
+                    pass
+
+    def request(self, path, headers):
+        """GET over this thread's keep-alive connection, reconnecting once if the server closed it"""
+        for attempt in (1, 2):
+            reused = getattr(self.local, 'connection', None) is not None
+            connection = self.connection()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                return response.status, response.getheader('ETag'), response.read()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                self.local.connection = None
+                # Browsers retry a request that hit an idle connection the server had just closed
+                stale = isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if attempt == 2 or not (reused and stale):
+                    raise
+
+    def burst(self):
+        """The fetches of one (re)load, all in flight together"""
+        start = time.perf_counter()
+        wait([self.pool.submit(self.fetch, endpoint) for endpoint in DASHBOARD_ENDPOINTS])
+        self.recorder.burst(time.perf_counter() - start)
+
+    def open_stream(self):
+        """Hold /api/events open in the background, as the EventSource does"""
+        def listen():
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=None)
+            start = time.perf_counter()
+            try:
+                connection.connect()
+                self.stream = connection.sock
+                connection.request('GET', '/api/events', headers={'Accept': 'text/event-stream'})
+                response = connection.getresponse()
+                self.recorder.request('/api/events', response.status, time.perf_counter() - start)
+                while response.status == 200 and response.readline():
+                    pass
+            except (OSError, http.client.HTTPException, ValueError):
+                # Shut down by close() at the end of the phase
+                pass
+
+        threading.Thread(target=listen, daemon=True).start()
+
+    def run(self, deadline, interval, sse):
+        if sse:
+            self.open_stream()
+        while True:
+            started = time.monotonic()
+            self.burst()
+            if started + interval >= deadline:
+                return
+            time.sleep(max(0.0, started + interval - time.monotonic()))
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        if self.stream is not None:
+            # Wakes the listening thread, which a plain close() would leave blocked until the next heartbeat
+            try:
+                self.stream.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def run_phase(host, port, clients, duration, interval, ramp, sse, revalidate):
+    recorder = Recorder()
+    dashboards = [Dashboard(host, port, recorder, revalidate) for _ in range(clients)]
+    deadline = time.monotonic() + ramp + duration
+    threads = []
+    for i, dashboard in enumerate(dashboards):
+        thread = threading.Thread(target=dashboard.run, args=(deadline, interval, sse), daemon=True)
+        threads.append(thread)
+        # Tabs open spread over the ramp, not all in the same millisecond
+        time.sleep(ramp / clients if i else 0)
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for dashboard in dashboards:
+        dashboard.close()
+    return summarize(clients, recorder)
+
+
+def summarize(clients, recorder):
+    endpoints = {}
+    total = errors = not_modified = 0
+    for endpoint, latencies in recorder.latencies.items():
+        latencies = sorted(latencies)
+        statuses = recorder.statuses[endpoint]
+        failed = sum(count for status, count in statuses.items() if status == 0 or status >= 400)
+        endpoints[endpoint] = {
+            'requests': len(latencies),
+            'errors': failed,
+            'not_modified': statuses.get(304, 0),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1)
+        }
+        # The event streams stay open for the whole phase; they are not part of the throughput
+        if endpoint != '/api/events':
+            total += len(latencies)
+            errors += failed
+            not_modified += statuses.get(304, 0)
+
+    bursts = sorted(recorder.bursts)
+    elapsed = (recorder.finished - recorder.started) if recorder.started is not None else 0.0
+    return {
+        'clients': clients,
+        'requests': total,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'not_modified': not_modified,
+        'seconds': round(elapsed, 2),
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+        'burst_p50_ms': round(percentile(bursts, 0.50) * 1000, 1) if bursts else None,
+        'burst_p95_ms': round(percentile(bursts, 0.95) * 1000, 1) if bursts else None,
+        'burst_p99_ms': round(percentile(bursts, 0.99) * 1000, 1) if bursts else None,
+        'endpoints': endpoints
+    }
+
+
+def prepare_workdir(districts):
+    """A scratch directory with data/ (a copy, or a synthetic report) and an empty state/"""
+    directory = tempfile.mkdtemp(prefix='load-test-')
+    if districts:
+        os.makedirs(os.path.join(directory, 'data'))
+        write_report(os.path.join(directory, 'data', 'IDSR week 30 2025.xlsx'), districts, '2025-W30')
+    else:
+        shutil.copytree(os.path.join(PROJECT_ROOT, 'data'), os.path.join(directory, 'data'),
+                        ignore=shutil.ignore_patterns('__pycache__', '*.py'))
+    return directory
+
+
+def start_gunicorn(directory, port, workers, threads, stub, preload):
+    env = dict(os.environ, STATE_DIR=os.path.join(directory, 'state'), THREADS=str(threads), **stub.environ())
+    if preload:
+        env['PRELOAD'] = '1'
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(PROJECT_ROOT, 'gunicorn.conf.py'),
+               '--pythonpath', PROJECT_ROOT, '-w', str(workers), '-b', f'127.0.0.1:{port}', 'app:app']
+    return subprocess.Popen(command, cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop(process):
+    workers = child_pids(process.pid)
+    process.send_signal(signal.SIGQUIT)
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        # Threads parked in event streams hold up even a quick shutdown; the scratch state is thrown away anyway
+        for pid in workers + [process.pid]:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 50, 100],
+                        help='numbers of concurrent dashboards, one phase each')
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds each phase runs after the ramp')
+    parser.add_argument('--interval', type=float, default=300.0, help='seconds between a dashboard\'s bursts')
+    parser.add_argument('--ramp', type=float, default=5.0, help='seconds over which the dashboards open')
+    parser.add_argument('--sse', action='store_true', help='hold an /api/events stream open per dashboard')
+    parser.add_argument('--no-cache', action='store_true', help='send plain GETs instead of revalidating')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=128, help='gunicorn threads per worker')
+    parser.add_argument('--preload', action='store_true', help='run gunicorn with --preload')
+    parser.add_argument('--districts', type=int, help='serve a synthetic report of this many districts')
+    parser.add_argument('--backend-latency-ms', type=float, default=200.0,
+                        help='delay of each stand-in OpenAI/OpenWeatherMap call')
+    parser.add_argument('--replay', metavar='DIR', help='serve the backends from recordings in DIR')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    add_replay_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        stub = replay_server(args.replay, args).start()
+    else:
+        stub = StubServer(args.backend_latency_ms / 1000).start()
+    directory = prepare_workdir(args.districts)
+    port = free_port()
+    process = start_gunicorn(directory, port, args.workers, args.threads, stub, args.preload)
+    phases = []
+    try:
+        if not wait_until_ready(f'http://127.0.0.1:{port}'):
+            print('gunicorn did not become ready', file=sys.stderr)
+            return 1
+        for clients in args.clients:
+            phases.append(run_phase('127.0.0.1', port, clients, args.duration, args.interval,
+                                    args.ramp, args.sse, not args.no_cache))
+    finally:
+        stop(process)
+        stub.stop()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    result = {
+        'workers': args.workers,
+        'threads': args.threads,
+        'interval': args.interval,
+        'sse': args.sse,
+        'backend_calls': stub.summary() if args.replay else dict(stub.calls),
+        'phases': phases
+    }
+    failed = any(phase['errors'] for phase in phases)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 1 if failed else 0
+
+    print(f"gunicorn {args.workers} workers x {args.threads} threads, burst every {args.interval:g}s"
+          f"{', with event streams' if args.sse else ''}; backend calls {result['backend_calls']}")
+    print(f"{'clients':>8}{'requests':>10}{'req/s':>9}{'errors':>9}{'304s':>7}"
+          f"{'load p50':>11}{'load p95':>11}{'load p99':>11}")
+    for phase in phases:
+        print(f"{phase['clients']:>8}{phase['requests']:>10}{phase['throughput_rps']:>9.1f}"
+              f"{phase['error_rate']:>8.1%}{phase['not_modified']:>7}"
+              f"{phase['burst_p50_ms']:>8.1f} ms{phase['burst_p95_ms']:>8.1f} ms{phase['burst_p99_ms']:>8.1f} ms")
+
+    for phase in phases:
+        print(f"\n{phase['clients']} clients{'':<19}{'requests':>9}{'errors':>8}{'p50':>11}{'p95':>11}{'p99':>11}")
+        for endpoint, stats in sorted(phase['endpoints'].items()):
+            print(f"  {endpoint:<27}{stats['requests']:>9}{stats['errors']:>8}"
+                  f"{stats['p50_ms']:>8.1f} ms{stats['p95_ms']:>8.1f} ms{stats['p99_ms']:>8.1f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
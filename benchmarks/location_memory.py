@@ -0,0 +1,110 @@
+"""Memory per map location: list of dicts versus LocationTable.
+
+Run from the project root:
+
+    python -m benchmarks.location_memory [--locations 100 10000 100000]
+
+For each size the script builds synthetic district locations spread over
+the seven provinces twice, once as the per-location dicts the map data
+used to be, and once as a LocationTable. It reports the bytes retained
+per location (tracemalloc, including the name strings each layout keeps)
+and the time taken for the two reads the API makes: the JSON edge
+conversion (``to_records``) and the top-5 high-risk lookup.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from location_table import LocationTable  # noqa: E402
+from sheet_schemas import PROVINCE_COORDS, district_coordinates  # noqa: E402
+
+PROVINCES = list(PROVINCE_COORDS)
+
+
+def synthetic_rows(count):
+    """(district, province, lat, lng, cases) rows, as the district sheet processor produces them"""
+    for i in range(count):
+        province = PROVINCES[i % len(PROVINCES)]
+        district = f"Tehsil {i:06d}"
+        yield (district, province, *district_coordinates(district, province), (i * 7919) % 6000)
+
+
+def build_dicts(count):
+    return [
+        {'location': f"{district}, {province}", 'lat': lat, 'lng': lng, 'cases': cases, 'province': province}
+        for district, province, lat, lng, cases in synthetic_rows(count)
+    ]
+
+
+def build_table(count):
+    return LocationTable.from_rows(synthetic_rows(count))
+
+
+def retained_bytes(build, count):
+    """Bytes still allocated after ``build(count)`` returns, and the built object"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build(count)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, value
+
+
+def timed(function, repeat=5):
+    """Best wall time of ``repeat`` calls, in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(count):
+    dict_bytes, records = retained_bytes(build_dicts, count)
+    table_bytes, table = retained_bytes(build_table, count)
+    return {
+        'locations': count,
+        'dict_bytes_per_location': round(dict_bytes / count, 1),
+        'table_bytes_per_location': round(table_bytes / count, 1),
+        'table_column_bytes_per_location': round(table.nbytes / count, 1),
+        'ratio': round(dict_bytes / table_bytes, 2) if table_bytes else None,
+        'dict_top5_ms': round(timed(lambda: sorted(records, key=lambda x: x.get('cases', 0), reverse=True)[:5]), 3),
+        'table_top5_ms': round(timed(lambda: table.to_records(table.top(5))), 3),
+        'table_to_records_ms': round(timed(table.to_records), 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, nargs='+', default=[100, 10000, 100000])
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    results = [measure(count) for count in args.locations]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{'locations':>10}{'dicts B/loc':>13}{'table B/loc':>13}{'ratio':>8}"
+          f"{'top5 dicts':>12}{'top5 table':>12}{'to_records':>12}")
+    for result in results:
+        print(f"{result['locations']:>10}{result['dict_bytes_per_location']:>13.1f}"
+              f"{result['table_bytes_per_location']:>13.1f}{result['ratio']:>7.2f}x"
+              f"{result['dict_top5_ms']:>9.3f} ms{result['table_top5_ms']:>9.3f} ms"
+              f"{result['table_to_records_ms']:>9.3f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Compare per-worker memory of gunicorn with and without --preload.
+
+Run from the project root (Linux only, reads /proc/<pid>/smaps_rollup):
+
+    python -m benchmarks.preload_memory [--workers 4] [--requests 50]
+
+For each mode the script starts gunicorn on a free port with a fresh state
+directory, waits until the workers are ready, replays the dashboard's API
+requests and then reports, per worker, RSS, PSS and private (unshared)
+memory. Private memory is what each additional worker really costs; with
+--preload it should stay well below the non-preloaded figure because the
+parsed data and imported modules remain shared copy-on-write.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The burst of requests dashboard.js sends on load
+DASHBOARD_ENDPOINTS = (
+    '/api/dashboard-data', '/api/weather-data', '/api/ai-recommendations',
+    '/api/scenario-simulation', '/api/alerts', '/api/high-risk-areas',
+    '/api/disease-surveillance', '/api/climate-monitoring', '/api/weather-alerts',
+    '/api/map-data', '/api/disease-trends'
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def read_memory_kb(pid):
+    """RSS, PSS and private memory of a process in kB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        'rss_kb': values.get('Rss', 0),
+        'pss_kb': values.get('Pss', 0),
+        'private_kb': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; the ppid follows the closing paren
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def get(url, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        response.read()
+        return response.status
+
+
+def wait_until_ready(base_url, timeout=120):
+    deadline = time.time() + timeout
+    consecutive = 0
+    while time.time() < deadline:
+        try:
+            get(f'{base_url}/readyz', timeout=5)
+            consecutive += 1
+            if consecutive >= 10:
+                return True
+        except Exception:
+            consecutive = 0
+        time.sleep(0.2)
+    return False
+
+
+def measure_mode(preload, workers, requests_per_endpoint, settle_seconds):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, STATE_DIR=tempfile.mkdtemp(prefix='preload-bench-'))
+    command = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', 'app:app']
+    if preload:
+        command.insert(3, '--preload')
+
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready(base_url):
+            raise RuntimeError('gunicorn did not become ready')
+        # Every worker warms up on boot; give the slower ones time to finish
+        time.sleep(settle_seconds)
+
+        for _ in range(requests_per_endpoint):
+            for endpoint in DASHBOARD_ENDPOINTS:
+                get(f'{base_url}{endpoint}')
+
+        master = read_memory_kb(process.pid)
+        worker_memory = [read_memory_kb(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    count = max(len(worker_memory), 1)
+    return {
+        'preload': preload,
+        'workers': len(worker_memory),
+        'master': master,
+        'worker_avg': {key: sum(w[key] for w in worker_memory) // count for key in ('rss_kb', 'pss_kb', 'private_kb')},
+        'total_pss_kb': master['pss_kb'] + sum(w['pss_kb'] for w in worker_memory)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=20, help='requests per endpoint before measuring')
+    parser.add_argument('--settle', type=float, default=5.0, help='seconds to wait after the first ready probe')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print('This benchmark needs Linux /proc/<pid>/smaps_rollup', file=sys.stderr)
+        return 2
+
+    results = [measure_mode(preload, args.workers, args.requests, args.settle) for preload in (False, True)]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{'mode':<12}{'workers':>8}{'RSS/worker':>14}{'PSS/worker':>14}{'private/worker':>16}{'total PSS':>12}")
+    for result in results:
+        avg = result['worker_avg']
+        print(f"{'preload' if result['preload'] else 'no preload':<12}{result['workers']:>8}"
+              f"{avg['rss_kb'] / 1024:>11.1f} MB{avg['pss_kb'] / 1024:>11.1f} MB"
+              f"{avg['private_kb'] / 1024:>13.1f} MB{result['total_pss_kb'] / 1024:>9.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
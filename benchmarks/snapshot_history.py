@@ -0,0 +1,147 @@
+"""Cost of each extra data version kept for as_of queries.
+
+Run from the project root:
+
+    python -m benchmarks.snapshot_history [--versions 52] [--districts 150]
+
+The script publishes ``--versions`` synthetic weekly snapshots, each
+adding one week to the surveillance history and changing every
+district's case count, and records them in a SnapshotHistory in a
+temporary directory. It reports:
+
+- the size of one full snapshot (what a plain copy per version costs),
+- the bytes each extra version added on disk, with structural sharing,
+- the memory held per version once every version is loaded for an
+  as_of read (tracemalloc), and the time to record and to read one.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from location_table import LocationTable  # noqa: E402
+from sheet_schemas import PROVINCE_COORDS, district_coordinates  # noqa: E402
+from snapshot import DataSnapshot, encode_section  # noqa: E402
+from snapshot_history import SnapshotHistory  # noqa: E402
+
+PROVINCES = list(PROVINCE_COORDS)
+DISEASES = [f"Disease {i:02d}" for i in range(30)]
+
+
+def synthetic_week(week, districts):
+    """One week's surveillance records, in the cube's record form"""
+    district_records = []
+    for i in range(districts):
+        province = PROVINCES[i % len(PROVINCES)]
+        for j, disease in enumerate(DISEASES):
+            district_records.append([province, f"District {i:03d}", disease, float((i * 31 + j * 7 + week) % 500)])
+    return {
+        'national': [[disease, float(1000 + week * j)] for j, disease in enumerate(DISEASES)],
+        'province': [[province, disease, float(100 + week + j)] for province in PROVINCES
+                     for j, disease in enumerate(DISEASES)],
+        'district': district_records
+    }
+
+
+def synthetic_versions(count, districts):
+    """Data dicts of ``count`` consecutive weekly versions"""
+    weeks = {}
+    for n in range(count):
+        week = f"2025-W{n % 52 + 1:02d}" if n < 52 else f"{2025 + n // 52}-W{n % 52 + 1:02d}"
+        weeks[week] = synthetic_week(n, districts)
+        weeks = dict(sorted(weeks.items())[-52:])
+        rows = []
+        for i in range(districts):
+            province = PROVINCES[i % len(PROVINCES)]
+            district = f"District {i:03d}"
+            rows.append((district, province, *district_coordinates(district, province), (i * 7919 + n * 13) % 6000))
+        yield {
+            'national_summary': {disease: 1000 + n * j for j, disease in enumerate(DISEASES)},
+            'dashboard_stats': {'malaria_cases': 50000 + n, 'dengue_cases': 70 + n},
+            'map_data': LocationTable.from_rows(rows),
+            'last_updated': week,
+            'surveillance': {'weeks': dict(weeks)}
+        }
+
+
+def measure(versions, districts):
+    history_dir = tempfile.mkdtemp(prefix='snapshot-history-')
+    try:
+        history = SnapshotHistory(history_dir, max_versions=versions + 1, max_days=3650)
+        full_bytes, new_bytes, record_seconds = [], [], []
+        for version, data in enumerate(synthetic_versions(versions, districts), start=1):
+            snapshot = DataSnapshot(data, version=version)
+            full_bytes.append(sum(len(encode_section(value)) for value in data.values()))
+            start = time.perf_counter()
+            stats = history.record(snapshot)
+            record_seconds.append(time.perf_counter() - start)
+            new_bytes.append(stats['new_bytes'])
+        status = history.get_status()
+        stored = [version for version, _ in history.versions()]
+
+        # Memory of every version held for reading, before and after decoding one section of each
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        snapshots = [history.get(version) for version in stored]
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        history.get(history.resolve(str(stored[len(stored) // 2]))).get('surveillance')
+        read_seconds = time.perf_counter() - start
+        del snapshots
+
+        extra = new_bytes[1:] or [0]
+        return {
+            'versions': versions,
+            'districts': districts,
+            'full_snapshot_bytes': full_bytes[-1],
+            'first_version_bytes': new_bytes[0],
+            'extra_version_bytes': round(sum(extra) / len(extra)),
+            'sharing_ratio': round(full_bytes[-1] / (sum(extra) / len(extra)), 1) if sum(extra) else None,
+            'disk_bytes': status['object_bytes'],
+            'copies_bytes': sum(full_bytes),
+            'held_bytes_per_version': round(held / len(stored)),
+            'record_ms': round(sum(record_seconds) / len(record_seconds) * 1000, 1),
+            'read_surveillance_ms': round(read_seconds * 1000, 1)
+        }
+    finally:
+        shutil.rmtree(history_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--versions', type=int, default=52)
+    parser.add_argument('--districts', type=int, default=150)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    result = measure(args.versions, args.districts)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    print(f"{result['versions']} versions, {result['districts']} districts x {len(DISEASES)} diseases")
+    print(f"  full snapshot:          {result['full_snapshot_bytes'] / 1024:10.1f} KB")
+    print(f"  first version on disk:  {result['first_version_bytes'] / 1024:10.1f} KB")
+    print(f"  each extra version:     {result['extra_version_bytes'] / 1024:10.1f} KB "
+          f"({result['sharing_ratio']}x smaller than a copy)")
+    print(f"  all versions on disk:   {result['disk_bytes'] / 1024:10.1f} KB "
+          f"(plain copies: {result['copies_bytes'] / 1024:.1f} KB)")
+    print(f"  held per version:       {result['held_bytes_per_version']:10d} B")
+    print(f"  record / as_of read:    {result['record_ms']:10.1f} ms / {result['read_surveillance_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Stand-ins for the OpenAI and OpenWeatherMap backends.
+
+``install(latency)`` replaces the OpenAI client class used by ai_analysis
+and the ``requests`` module used by weather_service, and sets dummy API
+keys, so the AI and weather code paths run end to end without network
+access. Each backend call sleeps ``latency`` seconds first, to stand in
+for the round trip.
+
+``StubServer`` answers the same calls over HTTP, for app processes (such
+as gunicorn workers) that cannot be patched in-process: point
+OPENWEATHER_BASE_URL at ``server.weather_url`` and OPENAI_BASE_URL at
+``server.openai_url``.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+
+def completion_content(messages):
+    """The JSON template the prompt asks for, which has the shape the caller parses"""
+    prompt = messages[-1]['content'] if messages else ''
+    start = prompt.find('{', prompt.find('JSON format'))
+    content = prompt[start:].strip() if start >= 0 else '{}'
+    try:
+        json.loads(content)
+    except ValueError:
+        content = '{}'
+    return content
+
+
+def weather_payload(url, params):
+    """OpenWeatherMap-shaped current weather, or UV index for ``/uvi``"""
+    lat, lon = float(params.get('lat', 30)), float(params.get('lon', 70))
+    if url.endswith('/uvi'):
+        return {'lat': lat, 'lon': lon, 'value': round(6 + lat % 4, 1)}
+    return {
+        'coord': {'lat': lat, 'lon': lon},
+        'weather': [{'main': 'Clear', 'description': 'clear sky' if lat > 30 else 'haze'}],
+        'main': {'temp': round(45 - lat / 2, 1), 'humidity': int(40 + lon % 40), 'pressure': 1004},
+        'wind': {'speed': 3.6},
+        'visibility': 6000
+    }
+
+
+class StubChatCompletions:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def create(self, model=None, messages=(), **kwargs):
+        """Answer with the JSON template the prompt asks for, which has the shape the caller parses"""
+        self.calls += 1
+        time.sleep(self.latency)
+        message = SimpleNamespace(role='assistant', content=completion_content(messages))
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, message=message, finish_reason='stop')])
+
+
+class StubOpenAI:
+    """Stands in for ``openai.OpenAI``; ``latency`` is set by ``install``"""
+
+    latency = 0.0
+    completions = None
+
+    def __init__(self, api_key=None, **kwargs):
+        if StubOpenAI.completions is None:
+            StubOpenAI.completions = StubChatCompletions(StubOpenAI.latency)
+        self.chat = SimpleNamespace(completions=StubOpenAI.completions)
+
+
+class StubResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class StubRequests:
+    """Stands in for the ``requests`` module: current weather and UV index by coordinates"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return StubResponse(weather_payload(url, params or {}))
+
+
+def install(latency=0.0):
+    """Route the app's OpenAI and OpenWeatherMap calls to the stubs; call before the services are built"""
+    import ai_analysis
+    import weather_service
+
+    os.environ['OPENAI_API_KEY'] = 'stub-openai-key'
+    os.environ['OPENWEATHER_API_KEY'] = 'stub-openweather-key'
+    StubOpenAI.latency = latency
+    StubOpenAI.completions = None
+    ai_analysis.OpenAI = StubOpenAI
+    weather_service.requests = StubRequests(latency)
+    return {'openai': StubOpenAI, 'weather': weather_service.requests}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path not in ('/data/2.5/weather', '/data/2.5/uvi'):
+            return self.reply(404, {'message': 'not found'})
+        self.server.count('weather')
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.reply(200, weather_payload(url.path, params))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if urlsplit(self.path).path != '/v1/chat/completions':
+            return self.reply(404, {'error': {'message': 'not found'}})
+        self.server.count('openai')
+        request = json.loads(body or b'{}')
+        self.reply(200, {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': completion_content(request.get('messages', []))}}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        })
+
+    def reply(self, status, payload):
+        time.sleep(self.server.latency)
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """Both backends on one local port, served from a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0, handler=StubHandler):
+        super().__init__((host, port), handler)
+        self.latency = latency
+        self.calls = {'openai': 0, 'weather': 0}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def weather_url(self):
+        return f'{self.base_url}/data/2.5'
+
+    @property
+    def openai_url(self):
+        return f'{self.base_url}/v1'
+
+    def count(self, backend):
+        with self._lock:
+            self.calls[backend] += 1
+
+    def environ(self):
+        """Environment variables that point the app (and the OpenAI SDK) at this server"""
+        return {
+            'OPENAI_API_KEY': 'stub-openai-key',
+            'OPENAI_BASE_URL': self.openai_url,
+            'OPENWEATHER_API_KEY': 'stub-openweather-key',
+            'OPENWEATHER_BASE_URL': self.weather_url
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='stub-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,391 @@
+"""Benchmark suite: ingestion, surveillance history and API endpoint latency.
+
+Run from the project root:
+
+    python -m benchmarks.suite [--districts 100 1000 10000] [--weeks 1 52]
+                               [--only ingest history endpoints] [--no-memory]
+                               [--save-baseline NAME] [--compare NAME] [--json]
+
+Every benchmark runs on synthetic weekly reports (benchmarks/synthetic_workbook.py)
+in a temporary directory; the real data/ and state/ folders are not touched.
+
+- ingest, for each ``--districts``: reading the workbook's rows (parse),
+  turning them into a published snapshot (process), the whole
+  ``HealthDataProcessor.load_workbook`` (pandas) and upload (streamed)
+  paths, freezing the snapshot and encoding the map (serialize), and
+  every ``get_*`` accessor the endpoints call.
+- history, for each ``--weeks``: ingesting that many weekly reports of
+  ``--history-districts`` districts into the database one by one, then
+  reading the history back (database, surveillance slices).
+- endpoints: Flask test-client latency of every dashboard endpoint on a
+  report of ``--endpoint-districts`` districts, first request and then
+  median/p95 of ``--requests`` more, with OpenAI and OpenWeatherMap
+  replaced by in-process stubs (benchmarks/stubs.py) that answer after
+  ``--backend-latency-ms``.
+
+Times are the best of ``--repeat`` runs (endpoints: median); peak memory
+is measured with tracemalloc in one extra run (``--no-memory`` skips it).
+
+``--save-baseline NAME`` writes the results to benchmarks/baselines/NAME.json;
+``--compare NAME`` checks them against that file and exits with status 1
+if any benchmark got slower or used more memory than ``--tolerance``
+allows. Compare baselines taken on the same machine, e.g. run with
+``--save-baseline main`` on the main branch and ``--compare main`` on a PR.
+"""
+import argparse
+import gc
+import itertools
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks import stubs  # noqa: E402
+from benchmarks.synthetic_workbook import write_report  # noqa: E402
+
+BASELINE_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'baselines')
+
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS_DIFF = 0.002
+MIN_BYTES_DIFF = 256 * 1024
+
+# Endpoints measured, as the dashboard calls them
+ENDPOINTS = (
+    '/api/dashboard-data', '/api/disease-trends', '/api/map-data', '/api/alerts', '/api/high-risk-areas',
+    '/api/disease-surveillance', '/api/surveillance?level=district&weeks=12', '/api/weather-data',
+    '/api/weather-alerts', '/api/climate-monitoring', '/api/ai-recommendations', '/api/scenario-simulation',
+    '/tiles/5/22/13.geojson', '/api/export?format=csv'
+)
+
+
+def result(name, params, seconds, peak_bytes=None, **extra):
+    return dict({'name': name, 'params': params, 'seconds': seconds, 'peak_bytes': peak_bytes}, **extra)
+
+
+def result_key(entry):
+    params = ','.join(f"{key}={value}" for key, value in sorted(entry['params'].items()))
+    return f"{entry['name']}[{params}]"
+
+
+def measure(fn, repeat, memory):
+    """(best time of ``repeat`` calls, tracemalloc peak of one more call or None)"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return min(times), peak
+
+
+@contextmanager
+def workdir(prefix):
+    """A temporary project-like directory (data/, state/) made current for the duration"""
+    directory = tempfile.mkdtemp(prefix=prefix)
+    os.makedirs(os.path.join(directory, 'data'))
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield directory
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def read_sheets(path):
+    """Every recognised sheet's rows, read into lists: the parse step alone"""
+    from sheet_schemas import registry
+    from workbook_stream import iter_sheets
+
+    sheets = []
+    for sheet_name, header, read_rows in iter_sheets(path):
+        compiled = registry.compile(header)
+        if compiled is not None:
+            sheets.append((sheet_name, compiled, list(read_rows(compiled.usecols))))
+    return sheets
+
+
+def bench_ingest(districts, repeat, memory):
+    from data_processor import HealthDataProcessor
+    from sheet_schemas import ReportBuilder, registry
+    from serialization import dumps
+
+    results = []
+    with workdir('bench-ingest-') as directory:
+        path = write_report(os.path.join(directory, 'data', 'IDSR week 30 2025.xlsx'), districts, '2025-W30')
+        params = {'districts': districts}
+        size = os.path.getsize(path)
+
+        # Builds and publishes the synthetic report, as at start-up
+        start = time.perf_counter()
+        processor = HealthDataProcessor()
+        results.append(result('ingest.first_load', params, time.perf_counter() - start, workbook_bytes=size))
+
+        seconds, peak = measure(lambda: read_sheets(path), repeat, memory)
+        results.append(result('ingest.parse', params, seconds, peak))
+
+        sheets = read_sheets(path)
+
+        def process():
+            builder = ReportBuilder()
+            for sheet_name, compiled, rows in sheets:
+                registry.process_sheet(builder, sheet_name, compiled, rows)
+            processor.report_week = '2025-W30'
+            if not processor.process_data(builder):
+                raise RuntimeError("Synthetic report was not published")
+
+        seconds, peak = measure(process, repeat, memory)
+        results.append(result('ingest.process', params, seconds, peak))
+
+        seconds, peak = measure(lambda: processor.load_workbook(path, force=True), repeat, memory)
+        results.append(result('ingest.load_workbook', params, seconds, peak))
+
+        uploads = itertools.count()
+
+        def upload():
+            # Uploads never replace a workbook, so each one needs a new name
+            with open(path, 'rb') as stream:
+                processor.ingest_upload(stream, f"upload {next(uploads)}.xlsx", week='2025-W30')
+
+        seconds, peak = measure(upload, repeat, memory)
+        results.append(result('ingest.upload', params, seconds, peak))
+
+        snapshot = processor.get_snapshot()
+        seconds, peak = measure(snapshot.frozen, repeat, memory)
+        results.append(result('serialize.snapshot', params, seconds, peak,
+                              bytes=snapshot.frozen().data.nbytes))
+        seconds, peak = measure(lambda: dumps(processor.get_map_data()), repeat, memory)
+        results.append(result('serialize.map_json', params, seconds, peak))
+
+        accessors = {
+            'get_dashboard_stats': processor.get_dashboard_stats,
+            'get_disease_trends': processor.get_disease_trends,
+            'get_map_data': processor.get_map_data,
+            'get_alerts': processor.get_alerts,
+            'get_high_risk_areas': processor.get_high_risk_areas,
+            'get_disease_surveillance': processor.get_disease_surveillance,
+            'get_surveillance': lambda: processor.get_surveillance(level='district'),
+            'get_surveillance_cube': lambda: processor.get_surveillance_cube(processor.get_snapshot()),
+        }
+        for name, accessor in accessors.items():
+            seconds, peak = measure(accessor, repeat, memory)
+            results.append(result(f"get.{name}", params, seconds, peak))
+    return results
+
+
+def bench_history(weeks, districts, repeat, memory):
+    from data_processor import HealthDataProcessor
+    from database import HealthDatabase
+
+    results = []
+    with workdir('bench-history-') as directory:
+        database = HealthDatabase(f"sqlite:///{os.path.join(directory, 'health.sqlite')}")
+        path = write_report(os.path.join(directory, 'report.xlsx'), districts, '2025-W01')
+        processor = HealthDataProcessor(database=database)
+        params = {'weeks': weeks, 'districts': districts}
+
+        week_seconds = []
+        for n in range(weeks):
+            week = f"{2000 + n // 52}-W{n % 52 + 1:02d}"
+            start = time.perf_counter()
+            with open(path, 'rb') as stream:
+                processor.ingest_upload(stream, f"week {n}.xlsx", week=week)
+            week_seconds.append(time.perf_counter() - start)
+        results.append(result('history.ingest_week', params, statistics.mean(week_seconds),
+                              last_week_seconds=week_seconds[-1]))
+
+        seconds, peak = measure(lambda: database.load_weeks(), repeat, memory)
+        results.append(result('history.db_load_weeks', params, seconds, peak))
+        seconds, peak = measure(lambda: sum(1 for _ in database.iter_case_counts(batch_size=5000)), repeat, memory)
+        results.append(result('history.db_iter_case_counts', params, seconds, peak))
+        seconds, peak = measure(lambda: processor.get_surveillance(level='district'), repeat, memory)
+        results.append(result('history.surveillance_slice', params, seconds, peak))
+        seconds, peak = measure(processor.get_snapshot().frozen, repeat, memory)
+        results.append(result('history.snapshot_freeze', params, seconds, peak))
+        database.dispose()
+    return results
+
+
+def bench_endpoints(districts, requests, backend_latency):
+    results = []
+    with workdir('bench-endpoints-') as directory:
+        write_report(os.path.join(directory, 'data', 'IDSR week 30 2025.xlsx'), districts, '2025-W30')
+        os.environ['STATE_DIR'] = os.path.join(directory, 'state')
+        os.environ.pop('DATABASE_URL', None)
+        backends = stubs.install(backend_latency)
+
+        import services
+        from app import app
+
+        params = {'districts': districts}
+        start = time.perf_counter()
+        # Everything the endpoints use; the scheduler is left out so no job runs during the measurements
+        for service in services.ALL_SERVICES:
+            if service is not services.scheduler:
+                service.get()
+        results.append(result('endpoints.warm_up', params, time.perf_counter() - start))
+
+        client = app.test_client()
+        for url in ENDPOINTS:
+            start = time.perf_counter()
+            response = client.get(url)
+            first = time.perf_counter() - start
+            size = len(response.get_data())
+            times = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                client.get(url).get_data()
+                times.append(time.perf_counter() - start)
+            times.sort()
+            results.append(result(f"endpoint {url}", params, statistics.median(times), first_seconds=first,
+                                  p95_seconds=times[min(len(times) - 1, int(len(times) * 0.95))],
+                                  status=response.status_code, bytes=size))
+        results.append(result('endpoints.backend_calls', params, None,
+                              openai=backends['openai'].completions.calls if backends['openai'].completions else 0,
+                              weather=backends['weather'].calls))
+        for service in services.ALL_SERVICES:
+            instance = service.get_if_built()
+            if hasattr(instance, 'dispose'):
+                instance.dispose()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """(rows of the comparison, number of regressions) against a baseline's results"""
+    previous = {result_key(entry): entry for entry in baseline['results']}
+    rows, regressions = [], 0
+    for entry in results:
+        old = previous.get(result_key(entry))
+        if old is None:
+            continue
+        for field, floor in (('seconds', MIN_SECONDS_DIFF), ('peak_bytes', MIN_BYTES_DIFF)):
+            new_value, old_value = entry.get(field), old.get(field)
+            if not new_value or not old_value:
+                continue
+            ratio = new_value / old_value
+            regressed = ratio > 1 + tolerance and new_value - old_value > floor
+            regressions += regressed
+            rows.append((result_key(entry), field, old_value, new_value, ratio, regressed))
+    return rows, regressions
+
+
+def format_value(field, value):
+    if field.endswith('bytes'):
+        return f"{value / 1024 / 1024:.1f} MB"
+    return f"{value * 1000:.2f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--districts', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--weeks', type=int, nargs='+', default=[1, 52])
+    parser.add_argument('--history-districts', type=int, default=100)
+    parser.add_argument('--endpoint-districts', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=20, help='requests per endpoint after the first')
+    parser.add_argument('--backend-latency-ms', type=float, default=0.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', choices=('ingest', 'history', 'endpoints'))
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown/growth (0.25 = 25%%)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    groups = args.only or ('ingest', 'history', 'endpoints')
+    memory = not args.no_memory
+    results = []
+    if 'ingest' in groups:
+        for districts in args.districts:
+            results.extend(bench_ingest(districts, args.repeat, memory))
+    if 'history' in groups:
+        for weeks in args.weeks:
+            results.extend(bench_history(weeks, args.history_districts, args.repeat, memory))
+    if 'endpoints' in groups:
+        results.extend(bench_endpoints(args.endpoint_districts, args.requests, args.backend_latency_ms / 1000))
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'results': results
+    }
+
+    status = 0
+    comparison = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.tolerance)
+        comparison = {'baseline': args.compare, 'baseline_commit': baseline.get('commit'),
+                      'regressions': regressions, 'rows': rows}
+        status = 1 if regressions else 0
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f"{args.save_baseline}.json"), 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(dict(report, comparison=comparison), indent=2))
+        return status
+
+    print(f"commit {report['commit']}, Python {report['python']}, max RSS {report['max_rss_kb'] / 1024:.0f} MB")
+    for entry in results:
+        line = f"  {result_key(entry):62s}"
+        if entry['seconds'] is not None:
+            line += f" {entry['seconds'] * 1000:10.2f} ms"
+        if entry.get('peak_bytes') is not None:
+            line += f" {entry['peak_bytes'] / 1024 / 1024:9.1f} MB peak"
+        if 'first_seconds' in entry:
+            line += (f"  (first {entry['first_seconds'] * 1000:.1f} ms, p95 {entry['p95_seconds'] * 1000:.1f} ms, "
+                     f"{entry['bytes']} B, {entry['status']})")
+        if 'openai' in entry:
+            line += f" OpenAI calls {entry['openai']}, weather calls {entry['weather']}"
+        print(line)
+    if comparison:
+        print(f"\nAgainst baseline '{args.compare}' (commit {comparison['baseline_commit']}), "
+              f"tolerance {args.tolerance:.0%}:")
+        for key, field, old_value, new_value, ratio, regressed in comparison['rows']:
+            if regressed or ratio < 1 - args.tolerance:
+                print(f"  {'REGRESSION' if regressed else 'improved  '} {key} {field}: "
+                      f"{format_value(field, old_value)} -> {format_value(field, new_value)} ({ratio:.2f}x)")
+        print(f"  {comparison['regressions']} regressions")
+    if args.save_baseline:
+        print(f"\nSaved baseline '{args.save_baseline}'")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
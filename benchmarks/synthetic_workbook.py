@@ -0,0 +1,108 @@
+"""Synthetic weekly IDSR report workbooks, laid out like the real ones.
+
+    python -m benchmarks.synthetic_workbook out.xlsx [--districts 1000] [--week 2025-W30]
+
+A workbook has the national summary (one column per province plus the
+total), one district table per province (with its "Total" row, as the
+reports have) and the lab confirmation table. The first districts of
+each province are real ones from the gazetteer; beyond those, names are
+numbered ("Tehsil 000123"). Case counts are deterministic for a given
+district, disease and week, so two runs write the same workbook.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from district_names import GAZETTEER  # noqa: E402
+
+# Provinces with district tables, and every column of the national summary
+DISTRICT_PROVINCES = ('Sindh', 'Balochistan', 'KP', 'Punjab')
+SUMMARY_PROVINCES = ('AJK', 'Balochistan', 'GB', 'ICT', 'KP', 'Punjab', 'Sindh')
+
+DISEASES = ('Malaria', 'AD (Non-Cholera)', 'ILI', 'TB', 'ALRI < 5 years', 'VH (B, C & D)', 'B. Diarrhea',
+            'Typhoid', 'SARI', 'Dog Bite')
+
+LAB_DISEASES = ('Malaria', 'Dengue', 'COVID-19', 'Influenza A')
+
+
+def district_names(province, count):
+    """``count`` district names for ``province``: real ones first, then numbered"""
+    real = [entry if isinstance(entry, str) else entry[0] for entry in GAZETTEER[province]]
+    names = real[:count]
+    names.extend(f"Tehsil {province[:2].upper()}{i:06d}" for i in range(count - len(names)))
+    return names
+
+
+def cases(district_number, disease_number, week_number):
+    return (district_number * 7919 + disease_number * 104729 + week_number * 31) % 5000
+
+
+def week_number(week):
+    year, number = week.split('-W')
+    return int(year) * 53 + int(number)
+
+
+def write_report(path, districts=1000, week='2025-W30'):
+    """Write a report of ``districts`` districts (spread over the district tables) for ``week``"""
+    import xlsxwriter
+
+    w = week_number(week)
+    per_province = {province: districts // len(DISTRICT_PROVINCES) + (i < districts % len(DISTRICT_PROVINCES))
+                    for i, province in enumerate(DISTRICT_PROVINCES)}
+    province_totals = {province: [0] * len(DISEASES) for province in SUMMARY_PROVINCES}
+
+    with xlsxwriter.Workbook(path, {'constant_memory': True}) as workbook:
+        # Written first in the file, but filled in last: the sheet order matches the reports
+        summary = workbook.add_worksheet('Table 1 Pakistan')
+
+        number = 0
+        for t, province in enumerate(DISTRICT_PROVINCES, start=2):
+            sheet = workbook.add_worksheet(f"Table {t} {province}")
+            sheet.write_row(0, 0, ['Districts '] + [f"{disease} " for disease in DISEASES])
+            totals = province_totals[province]
+            row = 1
+            for name in district_names(province, per_province[province]):
+                values = [cases(number, k, w) for k in range(len(DISEASES))]
+                sheet.write_row(row, 0, [f"{name} "] + values)
+                for k, value in enumerate(values):
+                    totals[k] += value
+                number += 1
+                row += 1
+            sheet.write_row(row, 0, ['Total '] + totals)
+
+        sheet = workbook.add_worksheet(f"Table {len(DISTRICT_PROVINCES) + 2} confirmed cases")
+        header = ['Diseases ', None]
+        for province in DISTRICT_PROVINCES:
+            header.extend([f"{province} ", None])
+        sheet.write_row(0, 0, header)
+        sheet.write_row(1, 0, [None, None] + ['Total Test ', 'Total Pos '] * len(DISTRICT_PROVINCES))
+        for k, disease in enumerate(LAB_DISEASES, start=2):
+            row = [f"{disease} ", None]
+            for p in range(len(DISTRICT_PROVINCES)):
+                tested = cases(p, k, w) + 100
+                row.extend([tested, tested // (k + 3)])
+            sheet.write_row(k, 0, row)
+
+        summary.write_row(0, 0, ['Diseases '] + [f"{province} " for province in SUMMARY_PROVINCES] + ['Total '])
+        for k, disease in enumerate(DISEASES):
+            values = [province_totals[province][k] or cases(p, k, w) for p, province in enumerate(SUMMARY_PROVINCES)]
+            summary.write_row(k + 1, 0, [f"{disease} "] + values + [sum(values)])
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--districts', type=int, default=1000)
+    parser.add_argument('--week', default='2025-W30')
+    args = parser.parse_args(argv)
+
+    write_report(args.path, args.districts, args.week)
+    print(f"Wrote {args.path} ({args.districts} districts, {os.path.getsize(args.path) / 1024:.1f} KB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# (min, base, max) refresh interval in seconds for each scheduled source
+DEFAULT_CADENCE_BOUNDS = {
+    'weather': (10 * 60, 30 * 60, 2 * 60 * 60),
+    'health_data': (30 * 60, 6 * 60 * 60, 24 * 60 * 60),
+    'ai_analysis': (60 * 60, 6 * 60 * 60, 24 * 60 * 60),
+}
+
+# Relative change per refresh above which data counts as volatile / below which as quiet
+HIGH_CHANGE_RATIO = 0.10
+LOW_CHANGE_RATIO = 0.01
+
+# Quiet refreshes in a row before the interval is lengthened
+QUIET_STREAK = 3
+
+
+def relative_change(old: Dict[str, float], new: Dict[str, float]) -> float:
+    """Sum of absolute differences relative to the old total, over the union of keys"""
+    keys = set(old) | set(new)
+    if not keys:
+        return 0.0
+    delta = sum(abs((new.get(key) or 0) - (old.get(key) or 0)) for key in keys)
+    baseline = sum(abs(value or 0) for value in old.values())
+    return delta / max(baseline, 1.0)
+
+
+class AdaptiveCadence:
+    """Chooses the refresh interval of one source from its recent behaviour.
+
+    Every completed refresh reports how much the data changed and which
+    alerts are active. New alerts or volatile data shorten the interval,
+    a run of quiet refreshes lengthens it, and anything in between drifts
+    back to the base interval. The interval always stays within bounds. An
+    alert that stays active shortens the interval only once, when raised.
+    """
+
+    def __init__(self, source: str, min_interval: int, base_interval: int, max_interval: int):
+        self.source = source
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.interval = base_interval
+        self.reasons = ['base interval']
+        self.history = deque(maxlen=10)
+        self.quiet_streak = 0
+        # Keys of the alerts active at the last refresh
+        self.alert_keys = set()
+        self.updated_at = None
+
+    def observe(self, change_ratio: float, alert_keys: Iterable[str] = ()) -> bool:
+        """Record one refresh and recompute the interval; True if it changed.
+
+        ``alert_keys`` identify the alerts active now; only those that were
+        not active at the previous refresh count as new.
+        """
+        self.history.append(round(change_ratio, 4))
+        previous = self.interval
+        reasons = []
+        alert_keys = set(alert_keys)
+        new_alerts = alert_keys - self.alert_keys
+        self.alert_keys = alert_keys
+
+        if new_alerts:
+            self.quiet_streak = 0
+            interval = self.interval // 2
+            reasons.append('new alerts raised')
+        elif change_ratio >= HIGH_CHANGE_RATIO:
+            self.quiet_streak = 0
+            interval = self.interval // 2
+            reasons.append(f'data changed {change_ratio:.0%} since last refresh')
+        elif change_ratio <= LOW_CHANGE_RATIO:
+            self.quiet_streak += 1
+            if self.quiet_streak >= QUIET_STREAK:
+                interval = int(self.interval * 1.5)
+                reasons.append(f'{self.quiet_streak} quiet refreshes in a row')
+            else:
+                interval = self.interval
+                reasons.append('quiet, holding interval')
+        else:
+            self.quiet_streak = 0
+            # Moderate change - drift halfway back towards the base interval
+            interval = (self.interval + self.base_interval) // 2
+            reasons.append('moderate change, returning to base interval')
+
+        if interval <= self.min_interval:
+            interval = self.min_interval
+            reasons.append('at minimum interval')
+        elif interval >= self.max_interval:
+            interval = self.max_interval
+            reasons.append('at maximum interval')
+
+        self.interval = interval
+        self.reasons = reasons
+        self.updated_at = datetime.now().isoformat()
+        if interval != previous:
+            logger.info(f"{self.source} refresh interval {previous}s -> {interval}s ({'; '.join(reasons)})")
+        return interval != previous
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'interval_seconds': self.interval,
+            'min_interval_seconds': self.min_interval,
+            'base_interval_seconds': self.base_interval,
+            'max_interval_seconds': self.max_interval,
+            'reasons': list(self.reasons),
+            'recent_change_ratios': list(self.history),
+            'quiet_streak': self.quiet_streak,
+            'active_alerts': sorted(self.alert_keys),
+            'updated_at': self.updated_at
+        }
+
+    def restore(self, state: Optional[Dict[str, Any]]):
+        """Resume from a persisted ``to_dict`` state, clamped to the current bounds"""
+        if not state:
+            return
+        interval = state.get('interval_seconds', self.base_interval)
+        self.interval = min(max(int(interval), self.min_interval), self.max_interval)
+        self.reasons = state.get('reasons') or self.reasons
+        self.history.clear()
+        self.history.extend(state.get('recent_change_ratios') or [])
+        self.quiet_streak = state.get('quiet_streak', 0)
+        self.alert_keys = set(state.get('active_alerts') or ())
+        self.updated_at = state.get('updated_at')
@@ -1,44 +1,241 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import logging
+"""Offline ingest and profiling of weekly IDSR workbooks.
 
-# Script to process the uploaded Excel file and create proper health data
-logger = logging.getLogger(__name__)
+Run from the project root:
 
-def process_excel_file(file_path):
-    """Process the uploaded Excel file and extract health data"""
+    python data/process_excel.py [WORKBOOK_OR_DIR ...] [--jobs 4] [--dry-run] [--json]
+
+Every workbook (default: all .xlsx files in data/) is streamed sheet by
+sheet through the sheet-schema registry, exactly as the upload endpoint
+does, and validated:
+
+- every sheet must match a registered sheet type
+- district sheets must name a known province
+- the national totals must equal the sum of the reported provinces
+
+Workbooks are parsed in parallel worker processes. Their case counts are
+then written, one transaction per week, into the database the app reads
+(DATABASE_URL, or SQLite in STATE_DIR). If a persisted health snapshot
+exists, its surveillance cube is rebuilt from the database, so the next
+start (or the running scheduler followers) serves the backfilled weeks
+without parsing a single workbook.
+
+For each sheet the report gives parse time, rows per second and the
+peak Python memory allocated while reading it (tracemalloc, which slows
+parsing down severalfold; pass --no-memory for untraced timings). Exit
+status is 1 if any workbook failed validation.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+# The app's modules live in the project root, one level up
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sheet_schemas import ReportBuilder, registry, sheet_province  # noqa: E402
+from surveillance_cube import MAX_WEEKS, SurveillanceCube, dimension_key, workbook_week  # noqa: E402
+from workbook_stream import iter_sheets  # noqa: E402
+
+
+def find_workbooks(paths):
+    """Workbook files named on the command line, expanding directories to their .xlsx files"""
+    workbooks = []
+    for path in paths:
+        if os.path.isdir(path):
+            workbooks.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith('.xlsx') and not name.startswith(('~$', '.'))
+            ))
+        else:
+            workbooks.append(path)
+    return workbooks
+
+
+def validate(builder):
+    """Problems with a parsed workbook; errors keep it out of the database"""
+    errors, warnings = [], []
+    kinds = [sheet['kind'] for sheet in builder.sheets]
+    if builder.is_empty:
+        errors.append('no national summary or district sheets')
+    elif 'national_summary' not in kinds:
+        warnings.append('no national summary sheet')
+
+    for sheet in builder.sheets:
+        if sheet['kind'] is None:
+            warnings.append(f"sheet '{sheet['name']}' matches no known sheet type")
+        elif sheet['kind'] == 'district_table' and sheet_province(sheet['name']) is None:
+            errors.append(f"district sheet '{sheet['name']}' names no known province")
+
+    reported = {}
+    for _, disease, value in builder.week_records['province']:
+        if value is not None:
+            key = dimension_key(disease)
+            reported[key] = reported.get(key, 0) + value
+    for disease, total in builder.week_records['national']:
+        provinces = reported.get(dimension_key(disease))
+        if provinces is not None and abs(provinces - total) >= 1:
+            warnings.append(f"{disease}: national total {total:,.0f} but provinces sum to {provinces:,.0f}")
+    return errors, warnings
+
+
+def profile_workbook(path, week=None, trace_memory=True):
+    """Parse and validate one workbook; runs in a worker process"""
+    import openpyxl  # noqa: F401 - imported before tracing, so it is not counted against the first sheet
+
+    start = time.perf_counter()
+    builder = ReportBuilder()
+    if trace_memory:
+        tracemalloc.start()
     try:
-        # Try to read the Excel file
-        print(f"Processing Excel file: {file_path}")
-        
-        # Read all sheets
-        xl_file = pd.ExcelFile(file_path, engine='openpyxl')
-        print(f"Available sheets: {xl_file.sheet_names}")
-        
-        # Process each sheet
-        for sheet_name in xl_file.sheet_names:
-            print(f"\nProcessing sheet: {sheet_name}")
-            df = pd.read_excel(xl_file, sheet_name=sheet_name, engine='openpyxl')
-            print(f"Sheet shape: {df.shape}")
-            print(f"Columns: {df.columns.tolist()}")
-            print(f"First few rows:")
-            print(df.head())
-            
-            # Check for health-related data
-            health_keywords = ['malaria', 'dengue', 'respiratory', 'disease', 'case', 'infection', 'patient']
-            for keyword in health_keywords:
-                matching_cols = [col for col in df.columns if keyword.lower() in str(col).lower()]
-                if matching_cols:
-                    print(f"Found health-related columns for '{keyword}': {matching_cols}")
-        
-        return True
-        
+        for sheet_name, header, read_rows in iter_sheets(path):
+            compiled = registry.compile(header)
+            if compiled is None:
+                builder.sheets.append({'name': sheet_name, 'kind': None, 'rows': 0, 'columns': len(header),
+                                       'seconds': 0.0})
+                continue
+            if trace_memory:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+            stats = registry.process_sheet(builder, sheet_name, compiled, read_rows(compiled.usecols))
+            stats['rows_per_second'] = round(stats['rows'] / stats['seconds']) if stats['seconds'] else None
+            if trace_memory:
+                # Peak allocated while reading this sheet, on top of what was held before it
+                stats['peak_bytes'] = tracemalloc.get_traced_memory()[1] - baseline
     except Exception as e:
-        print(f"Error processing Excel file: {e}")
-        return False
+        return {'file': path, 'week': week, 'errors': [f"cannot read workbook: {e}"], 'warnings': [],
+                'sheets': builder.sheets, 'seconds': round(time.perf_counter() - start, 3)}
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    errors, warnings = validate(builder)
+    week = week or workbook_week(path)
+    if week is None:
+        errors.append("no epi-week in the file name (e.g. 'Weekly_Report-21-2025.xlsx') or title; pass --week")
+    return {
+        'file': path,
+        'week': week,
+        'errors': errors,
+        'warnings': warnings,
+        'sheets': builder.sheets,
+        'seconds': round(time.perf_counter() - start, 3),
+        # ru_maxrss is in kB on Linux
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'week_records': builder.week_records
+    }
+
+
+def store_results(results, database_url=None, state_dir=None):
+    """Write every valid workbook's week into the database; refresh the persisted snapshot's cube"""
+    from database import HealthDatabase, database_url as default_database_url
+    from state_store import StateStore
+
+    database = HealthDatabase(database_url or default_database_url(state_dir))
+    # Oldest first, so a week found in several workbooks ends up with the newest one
+    for result in sorted(results, key=lambda r: os.path.getmtime(r['file'])):
+        if result['errors']:
+            continue
+        start = time.perf_counter()
+        database.store_report(result['week'], result['week_records'], source_file=os.path.basename(result['file']))
+        result['store_seconds'] = round(time.perf_counter() - start, 3)
+
+    store = StateStore(state_dir)
+    document = store.load('health')
+    if document and document.get('payload'):
+        cube = SurveillanceCube(database.load_weeks(limit=MAX_WEEKS))
+        document['payload']['surveillance'] = cube.to_dict()
+        meta = document.get('meta', {})
+        # A new version, allocated like the app's, makes running workers adopt the snapshot
+        version = store.next_version(meta.pop('version', 0))
+        store.save_versioned('health', document['payload'], version, **meta)
+    return database.get_status()
+
+
+def print_report(results):
+    print(f"{'workbook / sheet':<40}{'kind':<18}{'rows':>7}{'seconds':>9}{'rows/s':>9}{'peak KB':>9}")
+    for result in results:
+        status = 'FAILED' if result['errors'] else 'ok'
+        print(f"{os.path.basename(result['file'])[:30]:<31}{result['week'] or '':<9}{status:<18}"
+              f"{'':>7}{result['seconds']:>9.3f}")
+        for sheet in result['sheets']:
+            peak = sheet.get('peak_bytes')
+            print(f"  {sheet['name'][:36]:<38}{sheet['kind'] or 'unknown':<18}{sheet['rows']:>7}"
+                  f"{sheet['seconds']:>9.3f}{sheet.get('rows_per_second') or '-':>9}"
+                  f"{'-' if peak is None else f'{peak / 1024:.0f}':>9}")
+        for error in result['errors']:
+            print(f"  error: {error}")
+        for warning in result['warnings']:
+            print(f"  warning: {warning}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=[os.path.join(PROJECT_ROOT, 'data')],
+                        help='workbooks or directories of workbooks (default: data/)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='parallel worker processes')
+    parser.add_argument('--week', help='epi-week (YYYY-Www) of a single workbook, instead of its file name')
+    parser.add_argument('--dry-run', action='store_true', help='parse and validate only, write nothing')
+    parser.add_argument('--database-url', help='database to write to (default: DATABASE_URL or SQLite in STATE_DIR)')
+    parser.add_argument('--state-dir', help='state directory (default: STATE_DIR or state/)')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc peak memory (faster parsing)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    workbooks = find_workbooks(args.paths)
+    if not workbooks:
+        print('No workbooks found', file=sys.stderr)
+        return 2
+    if args.week and len(workbooks) > 1:
+        print('--week needs a single workbook', file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    jobs = max(1, min(args.jobs, len(workbooks)))
+    if jobs == 1:
+        results = [profile_workbook(path, args.week, not args.no_memory) for path in workbooks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(profile_workbook, workbooks, [args.week] * len(workbooks),
+                                        [not args.no_memory] * len(workbooks)))
+    parse_seconds = time.perf_counter() - start
+
+    weeks = {}
+    for result in results:
+        if not result['errors']:
+            weeks.setdefault(result['week'], []).append(os.path.basename(result['file']))
+    for week, files in weeks.items():
+        if len(files) > 1:
+            print(f"warning: {week} is in {', '.join(files)}; the newest file wins", file=sys.stderr)
+
+    database = None
+    if not args.dry_run:
+        database = store_results(results, args.database_url, args.state_dir)
+
+    summary = {
+        'workbooks': len(results),
+        'failed': sum(1 for result in results if result['errors']),
+        'jobs': jobs,
+        'parse_seconds': round(parse_seconds, 3),
+        'database': database
+    }
+    if args.json:
+        for result in results:
+            result.pop('week_records', None)
+        print(json.dumps({'summary': summary, 'workbooks': results}, indent=2, default=str))
+    else:
+        print_report(results)
+        print(f"\n{summary['workbooks']} workbook(s), {summary['failed']} failed, parsed in "
+              f"{summary['parse_seconds']:.2f}s with {jobs} process(es)")
+        if database:
+            print(f"Database ({database['backend']}): {len(database['weeks'])} week(s), "
+                  f"{database['weeks'][0] if database['weeks'] else '-'} .. {database['weeks'][-1] if database['weeks'] else '-'}")
+    return 1 if summary['failed'] else 0
+
 
-if __name__ == "__main__":
-    # Process the uploaded health data file
-    file_path = "health_data.xlsx"
-    process_excel_file(file_path)
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
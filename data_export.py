@@ -0,0 +1,240 @@
+import io
+import os
+import csv
+import uuid
+import atexit
+import shutil
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from map_tiles import clean_process_dirs
+from surveillance_cube import LEVELS, dimension_key, province_key
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+COLUMNS = ('week', 'level', 'province', 'district', 'disease', 'cases')
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Rows per CSV chunk sent to the client, and per Parquet row group
+CHUNK_ROWS = 5000
+
+
+class ExportQuery(NamedTuple):
+    """One export: its format and filters (weeks are inclusive epi-week labels such as 2025-W30)"""
+    format: str = 'csv'
+    from_week: Optional[str] = None
+    to_week: Optional[str] = None
+    province: Optional[str] = None
+    disease: Optional[str] = None
+
+    @property
+    def mimetype(self) -> str:
+        return MIMETYPES[self.format]
+
+    @property
+    def filename(self) -> str:
+        weeks = f"{self.from_week or 'start'}_{self.to_week or 'latest'}"
+        return f"surveillance_{weeks}.{self.format}"
+
+    def key(self, version: int) -> str:
+        """Name of this export at data ``version``, used for its ETag and spool file"""
+        filters = '|'.join(str(value or '') for value in (
+            self.from_week, self.to_week,
+            province_key(self.province) if self.province else None,
+            dimension_key(self.disease) if self.disease else None))
+        digest = hashlib.blake2b(filters.encode('utf-8'), digest_size=8).hexdigest()
+        return f"export-v{version}-{digest}.{self.format}"
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def cube_rows(cube, query: ExportQuery) -> Iterator[tuple]:
+    """Export rows from the surveillance cube's weekly records, in the database's row order"""
+    province = province_key(query.province) if query.province else None
+    disease = dimension_key(query.disease) if query.disease else None
+    for week, week_records in cube.records.items():
+        if (query.from_week and week < query.from_week) or (query.to_week and week > query.to_week):
+            continue
+        for level in LEVELS:
+            for record in week_records.get(level, []):
+                if level == 'national':
+                    row = (week, level, None, None, record[0], record[1])
+                elif level == 'province':
+                    row = (week, level, record[0], None, record[1], record[2])
+                else:
+                    row = (week, level, *record)
+                if province and (row[2] is None or province_key(row[2]) != province):
+                    continue
+                if disease and dimension_key(row[4]) != disease:
+                    continue
+                yield row[:5] + (None if row[5] is None else int(round(row[5])),)
+
+
+def csv_chunks(rows: Iterable[tuple]) -> Iterator[bytes]:
+    """UTF-8 CSV of ``rows`` under a header line, ``CHUNK_ROWS`` rows per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def write_parquet(rows: Iterable[tuple], path: str):
+    """Write ``rows`` to a Parquet file at ``path``, one row group per ``CHUNK_ROWS`` rows"""
+    schema = pa.schema([(column, pa.string()) for column in COLUMNS[:-1]] + [('cases', pa.int64())])
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        batch: List[tuple] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == CHUNK_ROWS:
+                writer.write_table(_arrow_table(batch, schema))
+                batch = []
+        if batch:
+            writer.write_table(_arrow_table(batch, schema))
+
+
+def _arrow_table(batch: List[tuple], schema):
+    return pa.Table.from_arrays([pa.array([row[i] for row in batch], type=field.type)
+                                 for i, field in enumerate(schema)], schema=schema)
+
+
+class DataExporter:
+    """Exports of the weekly case counts as CSV or Parquet, streamed in bounded memory.
+
+    Rows come from the database, which holds every ingested week, or from
+    the current snapshot's surveillance cube when there is no database.
+    They are the same counts the map and the surveillance endpoints serve.
+
+    Every export is also written to ``spool_dir`` under a name derived from
+    the data version and the filters. A CSV is streamed to the client as it
+    is produced and kept once complete; a Parquet file (whose footer comes
+    last) is written there before it is sent. Byte ranges, and so resumed
+    downloads, are served from the spooled file. Only the latest
+    ``max_files`` spooled exports are kept, and none of an older version.
+    ``spool_dir`` is this process's alone (one directory per process, like
+    the map tile spill), so pruning never removes a file that another
+    worker, on an older or newer version, is still writing or serving.
+    """
+
+    def __init__(self, data_processor, database=None, spool_dir: Optional[str] = None,
+                 max_files: Optional[int] = None):
+        self.data_processor = data_processor
+        self.database = database
+        self.spool_dir = spool_dir
+        self.max_files = max_files or int(os.environ.get("EXPORT_CACHE_FILES", "16"))
+        if spool_dir:
+            clean_process_dirs(spool_dir)
+            atexit.register(shutil.rmtree, spool_dir, True)
+
+    def rows(self, query: ExportQuery) -> Iterator[tuple]:
+        if self.database is not None:
+            try:
+                if self.database.get_status()['weeks']:
+                    return self.database.iter_case_counts(query.from_week, query.to_week,
+                                                          query.province, query.disease, batch_size=CHUNK_ROWS)
+            except Exception as e:
+                logger.error(f"Error reading case counts from the database, exporting the snapshot: {e}")
+        return cube_rows(self.data_processor.get_surveillance_cube(), query)
+
+    def spooled(self, version: int, query: ExportQuery) -> Optional[str]:
+        """Path of the complete spooled export, or None if it has not been written yet"""
+        if not self.spool_dir:
+            return None
+        path = os.path.join(self.spool_dir, query.key(version))
+        return path if os.path.exists(path) else None
+
+    def build(self, version: int, query: ExportQuery) -> str:
+        """Write the export to the spool directory (if not there already) and return its path"""
+        path = self.spooled(version, query)
+        if path:
+            return path
+        path, tmp_path = self._spool_paths(version, query)
+        try:
+            if query.format == 'parquet':
+                write_parquet(self.rows(query), tmp_path)
+            else:
+                with open(tmp_path, 'wb') as f:
+                    for chunk in csv_chunks(self.rows(query)):
+                        f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            _unlink(tmp_path)
+            raise
+        self._prune(version)
+        return path
+
+    def stream(self, version: int, query: ExportQuery) -> Iterator[bytes]:
+        """CSV chunks of the export, spooled to disk on the way; an interrupted stream leaves no file"""
+        if not self.spool_dir:
+            yield from csv_chunks(self.rows(query))
+            return
+        path, tmp_path = self._spool_paths(version, query)
+        complete = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in csv_chunks(self.rows(query)):
+                    f.write(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if complete:
+                os.replace(tmp_path, path)
+                self._prune(version)
+            else:
+                _unlink(tmp_path)
+
+    def _spool_paths(self, version: int, query: ExportQuery):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, query.key(version))
+        # Unique per writer, so concurrent builds of one export never share a file
+        return path, f"{path}.{uuid.uuid4().hex}.tmp"
+
+    def _prune(self, version: int):
+        """Drop this process's spooled exports of older versions, then the oldest beyond ``max_files``"""
+        current = []
+        for name in os.listdir(self.spool_dir):
+            path = os.path.join(self.spool_dir, name)
+            if name.endswith('.tmp'):
+                continue
+            if not name.startswith(f"export-v{version}-"):
+                _unlink(path)
+            else:
+                current.append(path)
+        current.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in current[:-self.max_files]:
+            _unlink(path)
+
+    def get_status(self) -> Dict[str, Any]:
+        files = os.listdir(self.spool_dir) if self.spool_dir and os.path.isdir(self.spool_dir) else []
+        return {
+            'formats': [name for name in MIMETYPES if name != 'parquet' or parquet_available()],
+            'spooled': len([name for name in files if not name.endswith('.tmp')]),
+            'in_progress': len([name for name in files if name.endswith('.tmp')])
+        }
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
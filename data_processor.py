@@ -4,77 +4,440 @@ import os
 import logging
 from datetime import datetime, timedelta
 import json
+import time
+import queue
+import threading
 from typing import Dict, List, Any
+from snapshot import DataSnapshot, FrozenData, empty_snapshot
+from workbook_stream import iter_sheets, publish_file, save_stream
+from surveillance_cube import MAX_WEEKS, SurveillanceCube, dimension_key, report_week, workbook_week
+from sheet_schemas import NA_VALUES, ReportBuilder, registry
+from location_table import LocationTable
+from district_names import district_index
 
 logger = logging.getLogger(__name__)
 
+# Districts named in the malaria hotspot alert, with their current case counts
+HOTSPOT_DISTRICTS = [('Larkana', 'Sindh'), ('Khairpur', 'Sindh'), ('Sanghar', 'Sindh')]
+
 class HealthDataProcessor:
     """Processes health data from Excel files and provides analytics"""
     
-    def __init__(self):
+    def __init__(self, state_store=None, database=None, history=None):
         self.data_dir = "data"
-        self.current_data = {}
-        self.load_data()
+        self.state_store = state_store
+        self.database = database
+        # Every published version, for point-in-time (as_of) reads. Versions
+        # are written by a background thread, and only while this process
+        # records the history (the scheduler leader, or a lone process)
+        self.history = history
+        self.records_history = True
+        self._history_queue = queue.Queue()
+        self._history_thread = None
+        self._history_thread_lock = threading.Lock()
+        # Latest stored version checked by record_stored_snapshot
+        self._stored_history_version = 0
+        self._snapshot = empty_snapshot()
+        self._refresh_lock = threading.Lock()
+        # (path, mtime_ns, size) of the workbook behind the current snapshot
+        self.loaded_workbook = None
+        # Epi-week and path of the workbook being processed
+        self.report_week = None
+        self.report_file = None
+        # (version, cube) built for the current snapshot
+        self._surveillance_cube = None
+        # (version, table) converted from a snapshot that holds no LocationTable
+        self._location_table = None
+        
+        # Warm restart: serve the persisted snapshot and only re-parse if the workbook changed
+        if not self.restore_snapshot():
+            self.load_data()
+    
+    @property
+    def current_data(self):
+        """Data of the currently published snapshot (read-only)"""
+        return self._snapshot.data
+    
+    @property
+    def data_version(self):
+        """Version of the currently published snapshot, usable as a cache key"""
+        return self._snapshot.version
+    
+    def get_snapshot(self):
+        """Get the currently published snapshot.
+        
+        Callers that read several sections should take the snapshot once and
+        read from it, so every section comes from the same version.
+        """
+        return self._snapshot
+    
+    def get_snapshot_as_of(self, as_of):
+        """Snapshot that was current at ``as_of`` (a data version, or an ISO date or date/time).
+        
+        Raises ValueError for a malformed ``as_of`` and LookupError when no
+        version that old is kept (see SnapshotHistory.resolve).
+        """
+        current = self._snapshot
+        if self.history is None:
+            raise LookupError("No data snapshot history is kept")
+        version = self.history.resolve(as_of)
+        if version == current.version:
+            return current
+        return self.history.get(version)
+    
+    def _record_history(self, snapshot):
+        """Queue ``snapshot`` for the history; it is written after the swap, off the refresh lock"""
+        if not self.history or not self.records_history:
+            return
+        self._history_queue.put(snapshot)
+        with self._history_thread_lock:
+            # A thread started before a fork (gunicorn --preload) does not run in the worker
+            if self._history_thread is None or not self._history_thread.is_alive():
+                self._history_thread = threading.Thread(target=self._write_history, name='snapshot-history',
+                                                        daemon=True)
+                self._history_thread.start()
+    
+    def _write_history(self):
+        while True:
+            snapshot = self._history_queue.get()
+            try:
+                # Skipped if this process stopped recording (became a follower) meanwhile
+                if self.records_history:
+                    self.history.record(snapshot)
+            except Exception as e:
+                logger.error(f"Error recording data snapshot v{snapshot.version} in history: {e}")
+            finally:
+                self._history_queue.task_done()
+    
+    def wait_for_history(self):
+        """Block until every queued version is written to the history"""
+        self._history_queue.join()
+    
+    def record_stored_snapshot(self):
+        """Queue the snapshot another process persisted (e.g. an upload to a follower) for the history.
+        
+        Called by the process that records the history; a version already
+        queued here, or checked before, is skipped.
+        """
+        if not self.history or not self.records_history or not self.state_store:
+            return
+        version = self.state_store.version('health')
+        if version is None or version <= self._stored_history_version:
+            return
+        self._stored_history_version = version
+        if version == self._snapshot.version:
+            return
+        document = self.state_store.load('health')
+        if not document or not document.get('payload'):
+            return
+        version = document.get('meta', {}).get('version', 0)
+        self._record_history(DataSnapshot(document['payload'], source='synced', version=version))
+    
+    def get_surveillance_cube(self, snapshot=None):
+        """Surveillance cube of ``snapshot`` (default: the current one), built once per current version"""
+        snapshot = snapshot or self._snapshot
+        cached = self._surveillance_cube
+        if cached is not None and cached[0] == snapshot.version:
+            return cached[1]
+        document = snapshot.get('surveillance')
+        if document is None and self.database and snapshot.source != 'history':
+            # No cube in this snapshot (sample data, or state lost) - rebuild from the database
+            cube = SurveillanceCube(self._load_weeks())
+        else:
+            cube = SurveillanceCube.from_dict(document)
+        # Older snapshots (as_of reads) are not cached, so they never evict the current cube
+        if snapshot.version == self._snapshot.version:
+            self._surveillance_cube = (snapshot.version, cube)
+        return cube
+    
+    def _load_weeks(self):
+        try:
+            return self.database.load_weeks(limit=MAX_WEEKS)
+        except Exception as e:
+            logger.error(f"Error loading surveillance history from the database: {e}")
+            return {}
+    
+    def _store_report(self, week, week_records, source_file=None):
+        """Persist one week's case counts; the snapshot is published even if this fails"""
+        if not self.database:
+            return
+        try:
+            self.database.store_report(week, week_records, source_file=source_file or self.report_file)
+        except Exception as e:
+            logger.error(f"Error storing report {week} in the database: {e}")
+    
+    def _publish_report(self, data, week, week_records):
+        """Add ``week`` to the surveillance cube, store it and publish ``data`` as the new snapshot.
+        
+        A report of unknown week (None) is published, but kept out of the
+        cube and the database rather than filed under a guessed week.
+        """
+        cube = self.get_surveillance_cube()
+        if week is None:
+            logger.warning(f"No epi-week in the name or title of {self.report_file}; not adding it to the surveillance "
+                           f"history (name it like 'Weekly_Report-21-2025.xlsx' or upload it with a week)")
+        else:
+            cube = cube.with_week(week, week_records)
+            self._store_report(week, week_records)
+        data['surveillance'] = cube.to_dict()
+        snapshot = self._publish(data)
+        self._surveillance_cube = (snapshot.version, cube)
+        return snapshot
+    
+    def _publish(self, data, source='excel'):
+        """Publish a fully built data dict as the new snapshot"""
+        # Versions come from the store, so a version names the same data in every
+        # worker; a processor without one (tests, benchmarks) numbers its own
+        if self.state_store:
+            version = self.state_store.next_version(self._snapshot.version)
+        else:
+            version = self._snapshot.version + 1
+        snapshot = DataSnapshot(data, source=source, version=version)
+        # Single reference assignment - readers see either the old or the new snapshot
+        self._snapshot = snapshot
+        logger.info(f"Published data snapshot v{snapshot.version} ({source})")
+        self._record_history(snapshot)
+        return snapshot
+    
+    def _publish_fallback(self):
+        """Keep serving the last good snapshot, or publish sample data if there is none"""
+        if self._snapshot.version > 0:
+            logger.warning(f"Refresh failed, keeping data snapshot v{self._snapshot.version}")
+            return self._snapshot
+        return self._publish(self.create_realistic_sample_data(), source='sample')
+    
+    def restore_snapshot(self):
+        """Publish the persisted snapshot, if any.
+        
+        Returns True only when the workbook behind it is unchanged, i.e. the
+        restored data is current and no parse is needed.
+        """
+        if not self.state_store:
+            return False
+        
+        document = self.state_store.load('health')
+        if not document or not document.get('payload'):
+            return False
+        
+        try:
+            meta = document.get('meta', {})
+            self._snapshot = DataSnapshot(document['payload'], source='restored', version=meta['version'])
+            
+            fingerprint = tuple(meta.get('workbook') or ())
+            latest = self.find_latest_workbook()
+            is_current = latest is not None and self._workbook_fingerprint(latest) == fingerprint
+            if is_current:
+                self.loaded_workbook = fingerprint
+            logger.info(f"Restored data snapshot v{self._snapshot.version} from {document.get('saved_at')}"
+                        f" ({'current' if is_current else 'stale'})")
+            self._record_history(self._snapshot)
+            return is_current
+        except Exception as e:
+            logger.error(f"Error restoring data snapshot: {e}")
+            return False
+    
+    def sync_from_store(self):
+        """Adopt the snapshot persisted by another process (the scheduler leader, or an upload).
+        
+        The stored snapshot is adopted whenever its version differs from the
+        published one: stored versions never go backwards, and a version
+        this process published but did not store (sample or fallback data)
+        gives way to the real data. Returns True if a snapshot was adopted.
+        """
+        if not self.state_store:
+            return False
+        version = self.state_store.version('health')
+        if version is None or version == self._snapshot.version:
+            return False
+        
+        document = self.state_store.load('health')
+        if not document or not document.get('payload'):
+            return False
+        meta = document.get('meta', {})
+        version = meta.get('version', 0)
+        
+        with self._refresh_lock:
+            # A publish of this process may have stored a newer version meanwhile
+            if version == self._snapshot.version or version < (self.state_store.version('health') or 0):
+                return False
+            self._snapshot = DataSnapshot(document['payload'], source='synced', version=version)
+            self.loaded_workbook = tuple(meta.get('workbook') or ()) or None
+        logger.info(f"Adopted data snapshot v{version} from the state store")
+        self._record_history(self._snapshot)
+        return True
+    
+    def freeze(self):
+        """Pack the published snapshot into compact bytes.
+        
+        Called in the gunicorn master under --preload, so that forked workers
+        share the parsed data copy-on-write instead of each holding a copy.
+        """
+        with self._refresh_lock:
+            self._snapshot = self._snapshot.frozen()
+        logger.info(f"Froze data snapshot v{self._snapshot.version} ({self._snapshot.data.nbytes} bytes)")
+    
+    def _mark_loaded(self, fingerprint):
+        """Record the workbook behind the published snapshot and persist the snapshot"""
+        self.loaded_workbook = fingerprint
+        if self.state_store:
+            snapshot = self._snapshot
+            self.state_store.save_versioned('health', snapshot.data, snapshot.version, workbook=fingerprint)
     
     def load_data(self):
         """Load data from Excel files"""
+        # Writers are serialized; readers never take this lock
+        with self._refresh_lock:
+            self._load_data()
+    
+    def load_workbook(self, excel_file, force=False):
+        """Load a specific workbook, skipping it if it is unchanged since the last load"""
+        with self._refresh_lock:
+            if not force and self._workbook_fingerprint(excel_file) == self.loaded_workbook:
+                logger.info(f"{excel_file} unchanged since last load, skipping")
+                return False
+            self._load_data(excel_file)
+            return True
+    
+    def find_latest_workbook(self):
+        """Path of the workbook of the latest epi-week in the data directory, or None.
+        
+        Reports are ordered by their week (see workbook_week), so copying
+        in an older report does not make it current; the modification time
+        only breaks ties, and a workbook that gives no week ranks below any
+        that does.
+        """
+        if not os.path.exists(self.data_dir):
+            return None
+        excel_files = [
+            os.path.join(self.data_dir, f) for f in os.listdir(self.data_dir)
+            if f.endswith('.xlsx') and not f.startswith(('~$', '.'))
+        ]
+        if not excel_files:
+            return None
+        return max(excel_files, key=lambda path: (workbook_week(path) or '', os.path.getmtime(path)))
+    
+    def add_history_workbook(self, excel_file):
+        """Add the week of an older (backfilled) report to the surveillance history.
+        
+        The current report stays published: only the surveillance cube and
+        the database gain the week, in a new version of the current data.
+        Returns False if the workbook gives no epi-week or cannot be read.
+        """
+        week = workbook_week(excel_file)
+        if week is None:
+            logger.warning(f"No epi-week in the name or title of {excel_file}; not adding it to the surveillance history")
+            return False
+        try:
+            builder = self._stream_workbook(excel_file)
+        except Exception as e:
+            logger.error(f"Error reading {excel_file}: {e}")
+            return False
+        
+        with self._refresh_lock:
+            self._publish_history_week(week, builder.week_records, os.path.basename(excel_file))
+        return True
+    
+    def _publish_history_week(self, week, week_records, source_file):
+        """Add an older week to the cube and the database, republishing the current data with it (lock held)"""
+        data = self._snapshot.data
+        data = data.thaw() if isinstance(data, FrozenData) else dict(data)
+        cube = self.get_surveillance_cube().with_week(week, week_records)
+        self._store_report(week, week_records, source_file=source_file)
+        data['surveillance'] = cube.to_dict()
+        snapshot = self._publish(data, source='backfill')
+        self._surveillance_cube = (snapshot.version, cube)
+        # Sample data is never persisted
+        if self.loaded_workbook:
+            self._mark_loaded(self.loaded_workbook)
+        logger.info(f"Added {week} from {source_file} to the surveillance history")
+        return snapshot
+    
+    def _workbook_fingerprint(self, excel_file):
+        try:
+            stat = os.stat(excel_file)
+            return (os.path.abspath(excel_file), stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+    
+    def _load_data(self, excel_file=None):
         try:
             # Look for Excel files in data directory
             if not os.path.exists(self.data_dir):
                 os.makedirs(self.data_dir)
             
-            excel_files = [f for f in os.listdir(self.data_dir) if f.endswith('.xlsx')]
+            if excel_file is None:
+                excel_file = self.find_latest_workbook()
             
-            if not excel_files:
+            if not excel_file:
                 logger.warning("No Excel files found, creating sample data")
-                self.create_sample_data()
+                self._publish(self.create_sample_data(), source='sample')
                 return
             
-            # Load the first Excel file found
-            excel_file = os.path.join(self.data_dir, excel_files[0])
+            # The newest weekly report is the current one
             logger.info(f"Loading data from {excel_file}")
+            fingerprint = self._workbook_fingerprint(excel_file)
+            self.report_week = workbook_week(excel_file)
+            self.report_file = os.path.basename(excel_file)
             
             try:
-                # Try different engines for Excel files
-                self.data_sheets = {}
-                
                 # First try with openpyxl engine
-                xl_file = pd.ExcelFile(excel_file, engine='openpyxl')
-                
-                for sheet_name in xl_file.sheet_names:
-                    self.data_sheets[sheet_name] = pd.read_excel(xl_file, sheet_name=sheet_name, engine='openpyxl')
-                    logger.info(f"Loaded sheet '{sheet_name}' with {len(self.data_sheets[sheet_name])} rows")
-                
-                self.process_data()
+                builder = self.read_workbook(excel_file, engine='openpyxl')
+                if self.process_data(builder):
+                    self._mark_loaded(fingerprint)
                 
             except Exception as engine_error:
                 logger.error(f"Error with openpyxl engine: {engine_error}")
                 # Try with xlrd engine for older Excel files
                 try:
-                    xl_file = pd.ExcelFile(excel_file, engine='xlrd')
-                    self.data_sheets = {}
-                    
-                    for sheet_name in xl_file.sheet_names:
-                        self.data_sheets[sheet_name] = pd.read_excel(xl_file, sheet_name=sheet_name, engine='xlrd')
-                        logger.info(f"Loaded sheet '{sheet_name}' with {len(self.data_sheets[sheet_name])} rows")
-                    
-                    self.process_data()
+                    builder = self.read_workbook(excel_file, engine='xlrd')
+                    if self.process_data(builder):
+                        self._mark_loaded(fingerprint)
                     
                 except Exception as xlrd_error:
                     logger.error(f"Error with xlrd engine: {xlrd_error}")
-                    # Create sample data with realistic values
-                    self.create_realistic_sample_data()
+                    # Keep the previous snapshot, or fall back to realistic sample values
+                    self._publish_fallback()
             
         except Exception as e:
             logger.error(f"Error loading data: {e}")
-            self.create_realistic_sample_data()
+            self._publish_fallback()
+    
+    def read_workbook(self, excel_file, engine='openpyxl'):
+        """Parse every sheet a registered sheet schema recognises.
+        
+        Each sheet's header is read first and compiled against the schema
+        registry; the sheet itself is then read with only the columns its
+        schema needs, at the schema's dtypes. Unrecognised sheets are not
+        read at all.
+        """
+        builder = ReportBuilder()
+        xl_file = pd.ExcelFile(excel_file, engine=engine)
+        
+        for sheet_name in xl_file.sheet_names:
+            header = list(pd.read_excel(xl_file, sheet_name=sheet_name, nrows=0).columns)
+            compiled = registry.compile(header)
+            if compiled is None:
+                logger.warning(f"Skipping sheet '{sheet_name}': header matches no known sheet type")
+                continue
+            try:
+                df = pd.read_excel(xl_file, sheet_name=sheet_name, usecols=compiled.usecols,
+                                   dtype=compiled.dtype, na_values=NA_VALUES)
+            except (ValueError, TypeError) as e:
+                # A stray note in a value column; read it as is, the processors skip non-numeric cells
+                logger.warning(f"Sheet '{sheet_name}' does not match its column types ({e}), reading without them")
+                df = pd.read_excel(xl_file, sheet_name=sheet_name, usecols=compiled.usecols, na_values=NA_VALUES)
+            
+            stats = registry.process_sheet(builder, sheet_name, compiled, df.itertuples(index=False, name=None))
+            logger.info(f"Loaded sheet '{sheet_name}' ({stats['kind']}): {stats['rows']} rows, {stats['columns']} columns")
+        
+        return builder
     
     def create_sample_data(self):
         """Create minimal sample data structure for demonstration"""
         logger.info("Creating sample data structure")
         
         # Create basic data structure
-        self.current_data = {
+        return {
             'last_updated': datetime.now().isoformat(),
             'dashboard_stats': {
                 'malaria_cases': 0,
@@ -117,7 +480,7 @@ class HealthDataProcessor:
             respiratory_cases.append(8500 + int(np.random.normal(0, 800))) # Around 8,500 cases
         
         # Create current data structure with realistic values
-        self.current_data = {
+        return {
             'last_updated': datetime.now().isoformat(),
             'dashboard_stats': {
                 'malaria_cases': malaria_cases[-1],
@@ -219,41 +582,33 @@ class HealthDataProcessor:
             ]
         }
     
-    def process_data(self):
-        """Process loaded Excel data into usable format"""
+    def process_data(self, builder):
+        """Turn a parsed workbook into a new snapshot and publish it"""
         try:
-            # Initialize processed data structure
-            self.current_data = {
-                'last_updated': datetime.now().isoformat(),
-                'dashboard_stats': {},
-                'disease_trends': {},
-                'map_data': [],
-                'alerts': []
-            }
-            
-            # Process each sheet based on the actual structure
-            for sheet_name, df in self.data_sheets.items():
-                logger.info(f"Processing sheet: {sheet_name}")
-                
-                if 'Pakistan' in sheet_name:
-                    self.process_pakistan_summary(df)
-                elif 'Sindh' in sheet_name:
-                    self.process_province_data(df, 'Sindh')
-                elif 'Balochistan' in sheet_name:
-                    self.process_province_data(df, 'Balochistan')
-                elif 'KP' in sheet_name:
-                    self.process_province_data(df, 'KP')
-                elif 'confirmed' in sheet_name:
-                    self.process_confirmed_cases(df)
-            
-            # Generate dashboard stats from processed data
-            self.generate_dashboard_stats_from_real_data()
+            self._publish_workbook(builder, self.report_week)
+            return True
             
         except Exception as e:
             logger.error(f"Error processing data: {e}")
-            self.create_realistic_sample_data()
+            self._publish_fallback()
+            return False
     
-    def process_disease_data(self, df):
+    def _publish_workbook(self, builder, week):
+        """Generate the dashboard sections from a parsed workbook and publish it as ``week``"""
+        data = self._build_report(builder)
+        return self._publish_report(data, week, builder.week_records)
+    
+    def _build_report(self, builder):
+        """Dashboard data of a parsed workbook; raises ValueError if it holds no report tables"""
+        if builder.is_empty:
+            raise ValueError("Workbook has no national summary or district sheets")
+        
+        data = builder.build()
+        # Generate dashboard stats from processed data
+        self.generate_dashboard_stats_from_real_data(data)
+        return data
+    
+    def process_disease_data(self, df, data):
         """Process disease-related data"""
         try:
             # Look for common column names
@@ -272,13 +627,13 @@ class HealthDataProcessor:
                     for disease in df[disease_cols[0]].unique():
                         disease_data = df[df[disease_cols[0]] == disease]
                         if not disease_data.empty:
-                            self.current_data['disease_trends'][disease.lower()] = {
+                            data['disease_trends'][disease.lower()] = {
                                 'dates': disease_data[date_cols[0]].dt.strftime('%Y-%m-%d').tolist(),
                                 'cases': disease_data[case_cols[0]].tolist()
                             }
                 else:
                     # Use first case column as general trend
-                    self.current_data['disease_trends']['general'] = {
+                    data['disease_trends']['general'] = {
                         'dates': df[date_cols[0]].dt.strftime('%Y-%m-%d').tolist(),
                         'cases': df[case_cols[0]].tolist()
                     }
@@ -286,7 +641,7 @@ class HealthDataProcessor:
         except Exception as e:
             logger.error(f"Error processing disease data: {e}")
     
-    def process_location_data(self, df):
+    def process_location_data(self, df, data):
         """Process location-based data for map visualization"""
         try:
             # Look for location and coordinate columns
@@ -298,7 +653,7 @@ class HealthDataProcessor:
             if location_cols and lat_cols and lon_cols and case_cols:
                 for _, row in df.iterrows():
                     if pd.notna(row[lat_cols[0]]) and pd.notna(row[lon_cols[0]]):
-                        self.current_data['map_data'].append({
+                        data['map_data'].append({
                             'location': str(row[location_cols[0]]),
                             'lat': float(row[lat_cols[0]]),
                             'lng': float(row[lon_cols[0]]),
@@ -308,7 +663,7 @@ class HealthDataProcessor:
         except Exception as e:
             logger.error(f"Error processing location data: {e}")
     
-    def process_alert_data(self, df):
+    def process_alert_data(self, df, data):
         """Process alert data"""
         try:
             # Look for alert-related columns
@@ -323,12 +678,12 @@ class HealthDataProcessor:
                         'priority': str(row[priority_cols[0]]) if priority_cols else 'medium',
                         'date': str(row[date_cols[0]]) if date_cols else datetime.now().strftime('%Y-%m-%d')
                     }
-                    self.current_data['alerts'].append(alert)
+                    data['alerts'].append(alert)
                     
         except Exception as e:
             logger.error(f"Error processing alert data: {e}")
     
-    def generate_dashboard_stats(self):
+    def generate_dashboard_stats(self, data):
         """Generate dashboard statistics from processed data"""
         try:
             stats = {
@@ -343,7 +698,7 @@ class HealthDataProcessor:
             }
             
             # Calculate current cases from trend data
-            for disease, trend_data in self.current_data['disease_trends'].items():
+            for disease, trend_data in data['disease_trends'].items():
                 if trend_data and 'cases' in trend_data and trend_data['cases']:
                     current_cases = trend_data['cases'][-1] if trend_data['cases'] else 0
                     
@@ -361,34 +716,49 @@ class HealthDataProcessor:
                             stats['respiratory_trend'] = ((current_cases - trend_data['cases'][-2]) / trend_data['cases'][-2]) * 100
             
             # Calculate vaccination coverage (placeholder logic)
-            if self.current_data['map_data']:
-                total_population = sum([loc.get('population', 1000) for loc in self.current_data['map_data']])
-                vaccinated = sum([loc.get('vaccinated', 750) for loc in self.current_data['map_data']])
+            if data['map_data']:
+                total_population = sum([loc.get('population', 1000) for loc in data['map_data']])
+                vaccinated = sum([loc.get('vaccinated', 750) for loc in data['map_data']])
                 stats['vaccination_coverage'] = (vaccinated / total_population) * 100 if total_population > 0 else 0
             
-            self.current_data['dashboard_stats'] = stats
+            data['dashboard_stats'] = stats
             
         except Exception as e:
             logger.error(f"Error generating dashboard stats: {e}")
     
-    def get_dashboard_stats(self):
+    def get_dashboard_stats(self, snapshot=None):
         """Get current dashboard statistics"""
-        return self.current_data.get('dashboard_stats', {})
+        return (snapshot or self._snapshot).get('dashboard_stats', {})
     
-    def get_disease_trends(self):
+    def get_disease_trends(self, snapshot=None):
         """Get disease trend data"""
-        return self.current_data.get('disease_trends', {})
+        return (snapshot or self._snapshot).get('disease_trends', {})
     
-    def get_map_data(self):
+    def get_map_data(self, snapshot=None):
         """Get map data"""
-        return self.current_data.get('map_data', [])
+        return self.get_location_table(snapshot).to_records()
+    
+    def get_location_table(self, snapshot=None):
+        """Map locations of ``snapshot`` (default: the current one) as a LocationTable"""
+        snapshot = snapshot or self._snapshot
+        map_data = snapshot.get('map_data')
+        if isinstance(map_data, LocationTable):
+            return map_data
+        # Sample data, restored and frozen snapshots hold plain lists/dicts - convert once per version
+        cached = self._location_table
+        if cached is not None and cached[0] == snapshot.version:
+            return cached[1]
+        table = LocationTable.coerce(map_data)
+        if snapshot.version == self._snapshot.version:
+            self._location_table = (snapshot.version, table)
+        return table
     
-    def get_alerts(self):
+    def get_alerts(self, snapshot=None):
         """Get current alerts with area-specific information"""
         # Generate alerts based on current data
         alerts = []
         
-        stats = self.get_dashboard_stats()
+        stats = self.get_dashboard_stats(snapshot)
         
         if stats.get('malaria_cases', 0) > 50000:
             alerts.append({
@@ -416,14 +786,21 @@ class HealthDataProcessor:
                 'date': datetime.now().strftime('%Y-%m-%d %H:%M')
             })
         
-        # Add area-specific alert for high-case districts
-        alerts.append({
-            'priority': 'high',
-            'message': 'Critical malaria hotspots identified requiring immediate attention',
-            'location': 'Larkana (5,620 cases), Khairpur (5,151 cases), Sanghar (4,489 cases)',
-            'case_count': 15260,
-            'date': datetime.now().strftime('%Y-%m-%d %H:%M')
-        })
+        # Add area-specific alert for high-case districts, joined to the map's counts on district ids
+        cases = district_index.table_cases(self.get_location_table(snapshot))
+        hotspots = []
+        for name, province in HOTSPOT_DISTRICTS:
+            district_id = district_index.resolve(name, province)
+            if district_id in cases:
+                hotspots.append((district_index.name(district_id), cases[district_id]))
+        if hotspots:
+            alerts.append({
+                'priority': 'high',
+                'message': 'Critical malaria hotspots identified requiring immediate attention',
+                'location': ', '.join(f"{name} ({count:,} cases)" for name, count in hotspots),
+                'case_count': sum(count for _, count in hotspots),
+                'date': datetime.now().strftime('%Y-%m-%d %H:%M')
+            })
         
         return alerts
     
@@ -431,96 +808,7 @@ class HealthDataProcessor:
         """Get all current data"""
         return self.current_data
     
-    def process_pakistan_summary(self, df):
-        """Process Pakistan national summary data"""
-        try:
-            logger.info("Processing Pakistan national summary")
-            
-            # Clean the data
-            df = df.dropna(subset=['Diseases '])
-            
-            # Extract key disease data
-            diseases_data = {}
-            for _, row in df.iterrows():
-                disease = str(row['Diseases ']).strip()
-                total_cases = row.get('Total ', 0)
-                
-                if pd.notna(total_cases) and total_cases != 'NaN':
-                    diseases_data[disease.lower()] = int(float(total_cases))
-            
-            # Store national summary
-            self.current_data['national_summary'] = diseases_data
-            logger.info(f"Processed national summary with {len(diseases_data)} diseases")
-            
-        except Exception as e:
-            logger.error(f"Error processing Pakistan summary: {e}")
-    
-    def process_province_data(self, df, province_name):
-        """Process province-specific data for map visualization"""
-        try:
-            logger.info(f"Processing {province_name} province data")
-            
-            # Clean the data
-            df = df.dropna(subset=['Districts '])
-            
-            # Province coordinates mapping
-            province_coords = {
-                'Sindh': {'base_lat': 25.8943, 'base_lng': 68.5247},
-                'Balochistan': {'base_lat': 28.3917, 'base_lng': 65.0456},
-                'KP': {'base_lat': 33.9425, 'base_lng': 71.5197}
-            }
-            
-            coords = province_coords.get(province_name, {'base_lat': 30.0, 'base_lng': 70.0})
-            
-            # Process district data
-            for _, row in df.iterrows():
-                district = str(row['Districts ']).strip()
-                
-                # Get malaria cases (main disease to track)
-                malaria_cases = 0
-                if 'Malaria ' in row:
-                    malaria_cases = row['Malaria ']
-                    if pd.notna(malaria_cases) and str(malaria_cases).strip() != 'NaN':
-                        try:
-                            malaria_cases = int(float(malaria_cases))
-                        except (ValueError, TypeError):
-                            malaria_cases = 0
-                    else:
-                        malaria_cases = 0
-                
-                # Generate approximate coordinates for districts
-                import random
-                lat_offset = random.uniform(-2, 2)
-                lng_offset = random.uniform(-2, 2)
-                
-                # Ensure no NaN values in final data
-                location_data = {
-                    'location': f"{district}, {province_name}",
-                    'lat': float(coords['base_lat'] + lat_offset),
-                    'lng': float(coords['base_lng'] + lng_offset),
-                    'cases': int(malaria_cases) if malaria_cases and not pd.isna(malaria_cases) else 0,
-                    'province': province_name
-                }
-                
-                self.current_data['map_data'].append(location_data)
-            
-            logger.info(f"Processed {len(df)} districts for {province_name}")
-            
-        except Exception as e:
-            logger.error(f"Error processing {province_name} data: {e}")
-    
-    def process_confirmed_cases(self, df):
-        """Process confirmed cases data"""
-        try:
-            logger.info("Processing confirmed cases data")
-            # This sheet seems to have a different structure
-            # Will implement if needed based on actual data structure
-            pass
-            
-        except Exception as e:
-            logger.error(f"Error processing confirmed cases: {e}")
-    
-    def generate_dashboard_stats_from_real_data(self):
+    def generate_dashboard_stats_from_real_data(self, data):
         """Generate dashboard statistics from real Excel data"""
         try:
             stats = {
@@ -535,23 +823,24 @@ class HealthDataProcessor:
             }
             
             # Get data from national summary
-            national_data = self.current_data.get('national_summary', {})
+            national_data = data.get('national_summary', {})
             
-            # Map diseases to dashboard stats
+            # Map diseases to dashboard stats (by exact name: 'ili' is also in 'syphilis')
             for disease, cases in national_data.items():
-                if 'malaria' in disease:
+                key = dimension_key(disease)
+                if key == 'malaria':
                     stats['malaria_cases'] = cases
                     stats['malaria_trend'] = np.random.uniform(-5, 10)  # Random trend for demo
-                elif 'ili' in disease:  # Influenza-like illness as respiratory
+                elif key == 'ili':  # Influenza-like illness as respiratory
                     stats['respiratory_cases'] = cases
                     stats['respiratory_trend'] = np.random.uniform(-3, 5)
-                elif 'dengue' in disease:
+                elif key == 'dengue':
                     stats['dengue_cases'] = cases
                     stats['dengue_trend'] = np.random.uniform(-8, 3)
             
             # Calculate vaccination coverage based on map data
-            if self.current_data['map_data']:
-                total_districts = len(self.current_data['map_data'])
+            if data['map_data']:
+                total_districts = len(data['map_data'])
                 # Assume higher coverage in areas with better health infrastructure
                 stats['vaccination_coverage'] = min(90, 60 + (total_districts * 0.5))
             
@@ -572,7 +861,7 @@ class HealthDataProcessor:
                 malaria_trend.append(max(0, int(base_malaria + np.random.normal(0, base_malaria * 0.05))))
                 respiratory_trend.append(max(0, int(base_respiratory + np.random.normal(0, base_respiratory * 0.03))))
             
-            self.current_data['disease_trends'] = {
+            data['disease_trends'] = {
                 'malaria': {'dates': dates, 'cases': malaria_trend},
                 'respiratory': {'dates': dates, 'cases': respiratory_trend},
                 'ili': {'dates': dates, 'cases': respiratory_trend}  # ILI as respiratory
@@ -601,38 +890,33 @@ class HealthDataProcessor:
                     'date': datetime.now().strftime('%Y-%m-%d')
                 })
             
-            self.current_data['alerts'] = alerts
-            self.current_data['dashboard_stats'] = stats
+            data['alerts'] = alerts
+            data['dashboard_stats'] = stats
             
             logger.info(f"Generated dashboard stats from real data: {stats}")
             
         except Exception as e:
             logger.error(f"Error generating dashboard stats from real data: {e}")
-            # Fallback to realistic sample data
-            self.create_realistic_sample_data()
+            # Let process_data decide whether to keep the previous snapshot
+            raise
     
-    def get_high_risk_areas(self):
+    def get_high_risk_areas(self, snapshot=None):
         """Get top 5 high-risk areas for health alerts"""
         try:
-            map_data = self.get_map_data()
-            if not map_data:
-                return []
+            table = self.get_location_table(snapshot)
             
-            # Sort by case count to get high-risk areas
-            sorted_areas = sorted(map_data, key=lambda x: x.get('cases', 0), reverse=True)
-            top_5 = sorted_areas[:5]
-            
-            # Format for alert display
+            # Only the top 5 rows by case count become dicts
             high_risk_areas = []
-            for area in top_5:
-                if area.get('cases', 0) > 0:
+            for i in table.top(5):
+                cases = int(table.cases[i])
+                if cases > 0:
                     high_risk_areas.append({
-                        'location': area.get('location', 'Unknown'),
-                        'cases': area.get('cases', 0),
-                        'province': area.get('province', 'Unknown'),
-                        'lat': area.get('lat', 0),
-                        'lng': area.get('lng', 0),
-                        'risk_level': 'High' if area.get('cases', 0) > 2000 else 'Medium' if area.get('cases', 0) > 1000 else 'Low'
+                        'location': table.label(i),
+                        'cases': cases,
+                        'province': table.province_of(i) or 'Unknown',
+                        'lat': float(table.lat[i]),
+                        'lng': float(table.lng[i]),
+                        'risk_level': 'High' if cases > 2000 else 'Medium' if cases > 1000 else 'Low'
                     })
             
             return high_risk_areas
@@ -641,26 +925,30 @@ class HealthDataProcessor:
             logger.error(f"Error getting high-risk areas: {e}")
             return []
     
-    def get_disease_surveillance(self):
+    def get_disease_surveillance(self, snapshot=None):
         """Get disease surveillance data"""
         try:
-            national_data = self.current_data.get('national_summary', {})
+            snapshot = snapshot or self._snapshot
+            data = snapshot.data
+            national_data = data.get('national_summary', {})
+            total_cases = sum(national_data.values())
             surveillance_data = {
-                'total_cases': sum(national_data.values()),
+                'total_cases': total_cases,
                 'active_diseases': len(national_data),
                 'surveillance_status': 'Active',
-                'last_updated': self.current_data.get('last_updated', ''),
+                'last_updated': data.get('last_updated', ''),
                 'disease_breakdown': [
                     {
                         'disease': disease.title(),
                         'cases': cases,
-                        'percentage': (cases / sum(national_data.values()) * 100) if sum(national_data.values()) > 0 else 0
+                        'percentage': (cases / total_cases * 100) if total_cases > 0 else 0
                     }
                     for disease, cases in sorted(national_data.items(), key=lambda x: x[1], reverse=True)
                     if cases > 0
                 ],
-                'monitoring_districts': len(self.current_data.get('map_data', [])),
-                'coverage_percentage': 95.5  # Surveillance coverage
+                'monitoring_districts': len(self.get_location_table(snapshot)),
+                'coverage_percentage': 95.5,  # Surveillance coverage
+                'lab_confirmation': self._lab_confirmation(data.get('confirmed_cases', []))
             }
             
             return surveillance_data
@@ -669,7 +957,131 @@ class HealthDataProcessor:
             logger.error(f"Error getting disease surveillance: {e}")
             return {}
     
-    def refresh_data(self):
-        """Refresh data from Excel files"""
+    def _lab_confirmation(self, confirmed_cases):
+        """Tested and positive samples per disease, summed over provinces"""
+        totals = {}
+        for entry in confirmed_cases:
+            disease = totals.setdefault(entry['disease'], {'disease': entry['disease'], 'tested': 0, 'positive': 0})
+            disease['tested'] += entry['tested']
+            disease['positive'] += entry['positive']
+        for disease in totals.values():
+            disease['positivity'] = round(disease['positive'] / disease['tested'] * 100, 1) if disease['tested'] else 0
+        return sorted(totals.values(), key=lambda x: x['positive'], reverse=True)
+    
+    def get_surveillance(self, level='national', province=None, disease=None, weeks=None, snapshot=None):
+        """Slice of the surveillance cube (see SurveillanceCube.slice); raises ValueError on bad arguments"""
+        snapshot = snapshot or self._snapshot
+        result = self.get_surveillance_cube(snapshot).slice(level=level, province=province, disease=disease, weeks=weeks)
+        result['data_version'] = snapshot.version
+        return result
+    
+    def ingest_upload(self, stream, filename, week=None):
+        """Save an uploaded workbook into the data directory and ingest it right away.
+        
+        The upload is streamed to a hidden temporary file and parsed from
+        there without the refresh lock, so a slow upload never holds up the
+        scheduler or the directory watcher. Only a workbook that was read
+        successfully is moved into place and published, under the lock, so
+        they find it already loaded and skip it. A report older than the
+        latest one only adds its week to the surveillance history. The
+        epi-week is ``week``, else the one the file name gives, else the one
+        the workbook's title gives (see workbook_week); a week not in the
+        file name is added to the stored name, which orders the reports.
+        Raises FileExistsError if a workbook of that name is already in the
+        data directory and ValueError if the upload is not a readable
+        report, or gives no epi-week, or ``week`` and the file name disagree.
+        The upload is removed again only if it fails before its snapshot is
+        published; a failure after that (persisting it) is logged.
+        """
+        named_week = report_week(filename)
+        if week and named_week and week != named_week:
+            raise ValueError(f"week {week} does not match the week {named_week} in the file name {filename}")
+        week = week or named_week
+        if week is not None:
+            # Rejected before the upload is read
+            filename = self._upload_filename(filename, week, named_week)
+        
+        start = time.perf_counter()
+        tmp_path = save_stream(stream, self.data_dir)
+        saved_seconds = time.perf_counter() - start
+        path = None
+        try:
+            if week is None:
+                week = workbook_week(tmp_path)
+                if week is None:
+                    raise ValueError(f"No epi-week in the file name or title of {filename}; pass week (e.g. 2025-W30)")
+                filename = self._upload_filename(filename, week, named_week)
+            start = time.perf_counter()
+            builder = self._stream_workbook(tmp_path)
+            data = self._build_report(builder)
+            
+            with self._refresh_lock:
+                path = publish_file(tmp_path, self.data_dir, filename)
+                previous, report_file = self._snapshot, self.report_file
+                try:
+                    if os.path.abspath(path) == os.path.abspath(self.find_latest_workbook()):
+                        self.report_file = filename
+                        snapshot = self._publish_report(data, week, builder.week_records)
+                        self._mark_loaded(self._workbook_fingerprint(path))
+                    else:
+                        # An older report only fills in the history
+                        snapshot = self._publish_history_week(week, builder.week_records, filename)
+                except Exception as e:
+                    if self._snapshot is previous:
+                        self.report_file = report_file
+                        raise
+                    # The upload is live: removing its workbook now would roll the data back on the
+                    # next refresh, so it stays, and that refresh loads and persists it again
+                    snapshot = self._snapshot
+                    logger.error(f"Published {filename} as v{snapshot.version}, but failed after publishing: {e}")
+        except Exception:
+            # Remove only the upload (never published): the temp file, or the copy publish_file placed
+            for leftover in (tmp_path, path):
+                if leftover and os.path.exists(leftover):
+                    os.unlink(leftover)
+            raise
+        
+        return {
+            'file': filename,
+            'week': week,
+            'version': snapshot.version,
+            'sheets': builder.sheets,
+            'bytes': os.path.getsize(path),
+            'save_seconds': round(saved_seconds, 3),
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+    
+    def _upload_filename(self, filename, week, named_week):
+        """Name an upload of ``week`` is stored under; raises FileExistsError if it is taken"""
+        if named_week is None:
+            root, ext = os.path.splitext(filename)
+            filename = f"{root}_{week}{ext}"
+        if os.path.exists(os.path.join(self.data_dir, filename)):
+            raise FileExistsError(f"A report named {filename} already exists")
+        return filename
+    
+    def _stream_workbook(self, excel_file):
+        """Parse a workbook row by row (openpyxl read-only) into a ReportBuilder.
+        
+        Rows go straight into the surveillance records and map entries;
+        no sheet is ever held in memory as a whole.
+        """
+        builder = ReportBuilder()
+        for sheet_name, header, read_rows in iter_sheets(excel_file):
+            compiled = registry.compile(header)
+            if compiled is None:
+                logger.warning(f"Skipping sheet '{sheet_name}': header matches no known sheet type")
+                continue
+            stats = registry.process_sheet(builder, sheet_name, compiled, read_rows(compiled.usecols))
+            logger.info(f"Streamed sheet '{sheet_name}' ({stats['kind']}): {stats['rows']} rows")
+        return builder
+    
+    def refresh_data(self, force=False):
+        """Refresh data from Excel files, skipping the parse if the latest workbook is unchanged"""
         logger.info("Refreshing data from Excel files")
-        self.load_data()
+        excel_file = self.find_latest_workbook()
+        if excel_file is None:
+            self.load_data()
+            return True
+        return self.load_workbook(excel_file, force=force)
+
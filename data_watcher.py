@@ -0,0 +1,189 @@
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
+
+
+def is_workbook(path: str) -> bool:
+    """True for Excel workbooks, ignoring Office lock/temp files like '~$report.xlsx'"""
+    name = os.path.basename(path)
+    return name.endswith('.xlsx') and not name.startswith(('~$', '.'))
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+class _WorkbookEventHandler(FileSystemEventHandler):
+    """Forwards watchdog events for workbooks to the watcher"""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        # Moves report the final name in dest_path (editors save via rename)
+        path = getattr(event, 'dest_path', None) or event.src_path
+        if is_workbook(path):
+            self.watcher.notify(path)
+
+
+class DataDirectoryWatcher:
+    """Watches the data directory and reports new or changed workbooks.
+
+    Uses watchdog (inotify/FSEvents/ReadDirectoryChangesW) when it is
+    installed and falls back to a cheap stat poll otherwise. Either way a
+    file is only reported once its size and mtime have been stable for
+    ``settle_seconds``, so a workbook that is still being copied or saved is
+    never parsed half-written.
+    """
+
+    def __init__(self, data_dir: str, on_change: Callable[[str], None],
+                 settle_seconds: float = 3.0, poll_interval: float = 5.0):
+        self.data_dir = data_dir
+        self.on_change = on_change
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.backend = None
+        self.is_running = False
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._pending: Dict[str, Tuple[float, Optional[Tuple[int, int]]]] = {}
+        self._known: Dict[str, Tuple[int, int]] = {}
+        self._observer = None
+        self._thread = None
+
+    def start(self):
+        """Start watching the data directory"""
+        if self.is_running:
+            return
+        os.makedirs(self.data_dir, exist_ok=True)
+        # Files present at start-up are loaded by the processor itself
+        self._known = self._scan()
+        self._stop_event.clear()
+
+        if WATCHDOG_AVAILABLE:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_WorkbookEventHandler(self), self.data_dir, recursive=False)
+                self._observer.daemon = True
+                self._observer.start()
+                self.backend = 'watchdog'
+            except Exception as e:
+                logger.warning(f"Filesystem events unavailable, falling back to polling: {e}")
+                self._observer = None
+        if self._observer is None:
+            self.backend = 'polling'
+
+        self._thread = threading.Thread(target=self._run, name='data-watcher', daemon=True)
+        self._thread.start()
+        self.is_running = True
+        logger.info(f"Watching {self.data_dir} for workbook changes ({self.backend})")
+
+    def stop(self):
+        """Stop watching"""
+        if not self.is_running:
+            return
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.is_running = False
+        logger.info("Data directory watcher stopped")
+
+    def notify(self, path: str):
+        """Record activity on a workbook; it is reported once it settles"""
+        with self._lock:
+            self._pending[os.path.abspath(path)] = (time.monotonic(), file_signature(path))
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        signatures = {}
+        try:
+            with os.scandir(self.data_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and is_workbook(entry.name):
+                        stat = entry.stat()
+                        signatures[os.path.abspath(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            logger.error(f"Error scanning {self.data_dir}: {e}")
+        return signatures
+
+    def _run(self):
+        # With events the loop only has to settle pending files, so it can tick fast
+        tick = 1.0 if self.backend == 'watchdog' else self.poll_interval
+        tick = min(tick, self.settle_seconds)
+        last_scan = 0.0
+        while not self._stop_event.wait(tick):
+            try:
+                if self.backend == 'polling' and time.monotonic() - last_scan >= self.poll_interval:
+                    last_scan = time.monotonic()
+                    for path, signature in self._scan().items():
+                        if self._known.get(path) != signature:
+                            with self._lock:
+                                pending = self._pending.get(path)
+                                if pending is None or pending[1] != signature:
+                                    self._pending[path] = (time.monotonic(), signature)
+                self._flush_settled()
+            except Exception as e:
+                logger.error(f"Error in data directory watcher: {e}")
+
+    def _flush_settled(self):
+        """Report pending workbooks whose size and mtime stopped changing"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, (seen_at, signature) in list(self._pending.items()):
+                current = file_signature(path)
+                if current is None:
+                    # Deleted or renamed away before it settled
+                    del self._pending[path]
+                elif current != signature:
+                    # Still being written - restart the settle window
+                    self._pending[path] = (now, current)
+                elif now - seen_at >= self.settle_seconds:
+                    del self._pending[path]
+                    if self._known.get(path) != current:
+                        self._known[path] = current
+                        ready.append(path)
+
+        for path in ready:
+            logger.info(f"Workbook changed: {path}")
+            try:
+                self.on_change(path)
+            except Exception as e:
+                logger.error(f"Error ingesting {path}: {e}")
+
+    def get_status(self):
+        """Get watcher status"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'running': self.is_running,
+            'backend': self.backend,
+            'data_dir': self.data_dir,
+            'known_workbooks': len(self._known),
+            'pending_changes': pending
+        }
@@ -0,0 +1,291 @@
+import os
+import io
+import csv
+import logging
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from sqlalchemy import (Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table,
+                        UniqueConstraint, create_engine, select)
+
+from surveillance_cube import dimension_key, province_key
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+reports = Table(
+    'reports', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('week', String(8), nullable=False, unique=True),
+    Column('source_file', String(255)),
+    Column('ingested_at', DateTime, nullable=False),
+)
+
+diseases = Table(
+    'diseases', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('key', String(64), nullable=False, unique=True),
+    Column('name', String(128), nullable=False),
+)
+
+provinces = Table(
+    'provinces', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('key', String(64), nullable=False, unique=True),
+    Column('name', String(128), nullable=False),
+)
+
+districts = Table(
+    'districts', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('province_id', Integer, ForeignKey('provinces.id'), nullable=False),
+    Column('key', String(64), nullable=False),
+    Column('name', String(128), nullable=False),
+    UniqueConstraint('province_id', 'key', name='uq_districts_province_key'),
+)
+
+# One row per reported cell. National rows have no province or district,
+# province rows no district. A NULL count means "not reported".
+case_counts = Table(
+    'case_counts', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('report_id', Integer, ForeignKey('reports.id', ondelete='CASCADE'), nullable=False),
+    Column('level', String(8), nullable=False),
+    Column('disease_id', Integer, ForeignKey('diseases.id'), nullable=False),
+    Column('province_id', Integer, ForeignKey('provinces.id')),
+    Column('district_id', Integer, ForeignKey('districts.id')),
+    Column('cases', Integer),
+    # Disease trend over weeks at one level (dashboard trends, national series)
+    Index('ix_case_counts_disease_level_report', 'disease_id', 'level', 'report_id'),
+    # Every district of one week (map, high-risk areas)
+    Index('ix_case_counts_report_district', 'report_id', 'district_id'),
+    # Province drill-down by disease and week
+    Index('ix_case_counts_province_disease_report', 'province_id', 'disease_id', 'report_id'),
+)
+
+weather_observations = Table(
+    'weather_observations', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('city', String(64), nullable=False),
+    Column('observed_at', DateTime, nullable=False),
+    Column('temperature', Float),
+    Column('humidity', Float),
+    Column('pressure', Float),
+    Column('wind_speed', Float),
+    Column('description', String(128)),
+    # Recent observations of one city, and of all cities by time
+    Index('ix_weather_observations_city_observed', 'city', 'observed_at'),
+    Index('ix_weather_observations_observed', 'observed_at'),
+)
+
+# Rows above which PostgreSQL ingestion switches from executemany to COPY
+COPY_THRESHOLD = 500
+
+
+def database_url(state_dir: Optional[str] = None) -> str:
+    """DATABASE_URL if set (Render/Heroku style URLs accepted), else SQLite in the state directory"""
+    url = os.environ.get("DATABASE_URL")
+    if url:
+        if url.startswith('postgres://'):
+            url = 'postgresql://' + url[len('postgres://'):]
+        return url
+    state_dir = state_dir or os.environ.get("STATE_DIR", "state")
+    os.makedirs(state_dir, exist_ok=True)
+    return f"sqlite:///{os.path.abspath(os.path.join(state_dir, 'health.sqlite'))}"
+
+
+class HealthDatabase:
+    """Relational store of weekly reports, case counts and weather observations.
+
+    Works with any SQLAlchemy URL; SQLite (the default, under the state
+    directory) for local runs and tests, PostgreSQL via DATABASE_URL in
+    production. Ingestion is one transaction per report and uses
+    executemany, or COPY on PostgreSQL for large batches.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or database_url()
+        connect_args = {'timeout': 30} if self.url.startswith('sqlite') else {}
+        self.engine = create_engine(self.url, pool_pre_ping=True, connect_args=connect_args)
+        metadata.create_all(self.engine)
+
+    def dispose(self):
+        """Drop pooled connections inherited from a parent process (call after fork)"""
+        self.engine.dispose(close=False)
+
+    def _bulk_insert(self, conn, table: Table, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        if conn.dialect.name == 'postgresql' and len(rows) >= COPY_THRESHOLD:
+            columns = list(rows[0])
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(['' if row[column] is None else row[column] for column in columns])
+            buffer.seek(0)
+            cursor = conn.connection.cursor()
+            try:
+                cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            finally:
+                cursor.close()
+        else:
+            conn.execute(table.insert(), rows)
+
+    def _dimension_ids(self, conn, table: Table, names: Dict[Any, str]) -> Dict[Any, int]:
+        """Ids for every key in ``names`` ({key: display name}), inserting missing ones in bulk.
+        
+        Keys are the surveillance cube's, so names spelled differently across sheets match.
+        """
+        if table is districts:
+            existing = {(row.province_id, row.key): row.id
+                        for row in conn.execute(select(districts.c.id, districts.c.province_id, districts.c.key))}
+            missing = [{'province_id': key[0], 'key': key[1], 'name': name}
+                       for key, name in names.items() if key not in existing]
+        else:
+            existing = {row.key: row.id for row in conn.execute(select(table.c.id, table.c.key))}
+            missing = [{'key': key, 'name': name} for key, name in names.items() if key not in existing]
+        if missing:
+            conn.execute(table.insert(), missing)
+            return self._dimension_ids(conn, table, names)
+        return existing
+
+    def store_report(self, week: str, week_records: Dict[str, List[list]], source_file: Optional[str] = None) -> int:
+        """Replace the case counts of ``week`` with ``week_records`` (the surveillance cube's record form)"""
+        national = week_records.get('national', [])
+        province_rows = week_records.get('province', [])
+        district_rows = week_records.get('district', [])
+
+        disease_names = {}
+        for record in national + province_rows + district_rows:
+            disease_names.setdefault(dimension_key(record[-2]), record[-2])
+        province_names = {}
+        for record in province_rows + district_rows:
+            province_names.setdefault(province_key(record[0]), record[0])
+
+        with self.engine.begin() as conn:
+            disease_ids = self._dimension_ids(conn, diseases, disease_names)
+            province_ids = self._dimension_ids(conn, provinces, province_names)
+            district_names = {}
+            for province, district, *_ in district_rows:
+                district_names.setdefault((province_ids[province_key(province)], dimension_key(district)), district)
+            district_ids = self._dimension_ids(conn, districts, district_names)
+
+            # Re-ingesting a week replaces it; its counts go with the report row
+            existing = conn.execute(select(reports.c.id).where(reports.c.week == week)).scalar()
+            if existing is not None:
+                conn.execute(case_counts.delete().where(case_counts.c.report_id == existing))
+                conn.execute(reports.delete().where(reports.c.id == existing))
+            report_id = conn.execute(reports.insert().values(
+                week=week, source_file=source_file, ingested_at=datetime.now()
+            )).inserted_primary_key[0]
+
+            rows = []
+            for disease, value in national:
+                rows.append({'report_id': report_id, 'level': 'national', 'disease_id': disease_ids[dimension_key(disease)],
+                             'province_id': None, 'district_id': None, 'cases': _count(value)})
+            for province, disease, value in province_rows:
+                rows.append({'report_id': report_id, 'level': 'province', 'disease_id': disease_ids[dimension_key(disease)],
+                             'province_id': province_ids[province_key(province)], 'district_id': None,
+                             'cases': _count(value)})
+            for province, district, disease, value in district_rows:
+                province_id = province_ids[province_key(province)]
+                rows.append({'report_id': report_id, 'level': 'district', 'disease_id': disease_ids[dimension_key(disease)],
+                             'province_id': province_id,
+                             'district_id': district_ids[(province_id, dimension_key(district))],
+                             'cases': _count(value)})
+            self._bulk_insert(conn, case_counts, rows)
+
+        logger.info(f"Stored report {week} with {len(rows)} case counts")
+        return report_id
+
+    def load_weeks(self, limit: Optional[int] = None) -> Dict[str, Dict[str, List[list]]]:
+        """Case counts of the most recent ``limit`` weeks in the surveillance cube's record form"""
+        query = select(reports.c.id, reports.c.week).order_by(reports.c.week.desc())
+        if limit:
+            query = query.limit(limit)
+        with self.engine.connect() as conn:
+            report_weeks = {row.id: row.week for row in conn.execute(query)}
+            if not report_weeks:
+                return {}
+            disease_names = {row.id: row.name for row in conn.execute(select(diseases.c.id, diseases.c.name))}
+            province_names = {row.id: row.name for row in conn.execute(select(provinces.c.id, provinces.c.name))}
+            district_names = {row.id: row.name for row in conn.execute(select(districts.c.id, districts.c.name))}
+
+            weeks = {week: {'national': [], 'province': [], 'district': []} for week in sorted(report_weeks.values())}
+            rows = conn.execute(
+                select(case_counts.c.report_id, case_counts.c.level, case_counts.c.disease_id,
+                       case_counts.c.province_id, case_counts.c.district_id, case_counts.c.cases)
+                .where(case_counts.c.report_id.in_(list(report_weeks)))
+                .order_by(case_counts.c.id)
+            )
+            for row in rows:
+                records = weeks[report_weeks[row.report_id]]
+                disease = disease_names[row.disease_id]
+                if row.level == 'national':
+                    records['national'].append([disease, row.cases])
+                elif row.level == 'province':
+                    records['province'].append([province_names[row.province_id], disease, row.cases])
+                else:
+                    records['district'].append([province_names[row.province_id], district_names[row.district_id],
+                                                disease, row.cases])
+        return weeks
+
+    def iter_case_counts(self, from_week: Optional[str] = None, to_week: Optional[str] = None,
+                         province: Optional[str] = None, disease: Optional[str] = None,
+                         batch_size: int = 5000) -> Iterator[tuple]:
+        """(week, level, province, district, disease, cases) of every stored count, oldest week first.
+
+        Rows are fetched ``batch_size`` at a time from a server-side cursor,
+        so any number of weeks can be read in bounded memory. The filters
+        match names the way the surveillance cube does.
+        """
+        query = (
+            select(reports.c.week, case_counts.c.level, provinces.c.name, districts.c.name,
+                   diseases.c.name, case_counts.c.cases)
+            .select_from(case_counts
+                         .join(reports, case_counts.c.report_id == reports.c.id)
+                         .join(diseases, case_counts.c.disease_id == diseases.c.id)
+                         .outerjoin(provinces, case_counts.c.province_id == provinces.c.id)
+                         .outerjoin(districts, case_counts.c.district_id == districts.c.id))
+            .order_by(reports.c.week, case_counts.c.id)
+        )
+        if from_week:
+            query = query.where(reports.c.week >= from_week)
+        if to_week:
+            query = query.where(reports.c.week <= to_week)
+        if province:
+            query = query.where(provinces.c.key == province_key(province))
+        if disease:
+            query = query.where(diseases.c.key == dimension_key(disease))
+        with self.engine.connect() as conn:
+            result = conn.execution_options(yield_per=batch_size).execute(query)
+            for row in result:
+                yield tuple(row)
+
+    def record_weather(self, cities: Iterable[Dict[str, Any]], observed_at: Optional[datetime] = None):
+        """Store one observation per city from a weather fetch"""
+        observed_at = observed_at or datetime.now()
+        rows = [{
+            'city': city.get('city'),
+            'observed_at': observed_at,
+            'temperature': city.get('temperature'),
+            'humidity': city.get('humidity'),
+            'pressure': city.get('pressure'),
+            'wind_speed': city.get('wind_speed'),
+            'description': city.get('description')
+        } for city in cities if city.get('city')]
+        with self.engine.begin() as conn:
+            self._bulk_insert(conn, weather_observations, rows)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.engine.connect() as conn:
+            weeks = [row.week for row in conn.execute(select(reports.c.week).order_by(reports.c.week))]
+        return {
+            'backend': self.engine.dialect.name,
+            'weeks': weeks
+        }
+
+
+def _count(value) -> Optional[int]:
+    return None if value is None else int(round(value))
@@ -0,0 +1,101 @@
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def diff_items(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Added, changed and removed entries between two keyed payloads"""
+    return {
+        'added': {key: value for key, value in new.items() if key not in old},
+        'changed': {key: value for key, value in new.items() if key in old and old[key] != value},
+        'removed': [key for key in old if key not in new],
+        'reordered': list(old) != list(new)
+    }
+
+
+class DeltaHistory:
+    """Bounded ring of version-to-version diffs for one endpoint's payload.
+
+    The payload is viewed as a mapping from a stable key (a district, a
+    disease) to its entry. Every recorded version is diffed against the
+    previous one; a client holding any version still in the ring gets the
+    composed diff up to the current version instead of the full payload.
+    Older versions (or versions this process never recorded) fall back to
+    the full payload.
+    """
+
+    def __init__(self, key: Optional[Callable[[Any], str]] = None, max_versions: int = 20):
+        # Lists are keyed with ``key``; dicts use their own keys
+        self.key = key
+        self._diffs = deque(maxlen=max_versions)
+        self._version = None
+        self._items: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _keyed(self, payload: Any) -> Dict[str, Any]:
+        if isinstance(payload, dict):
+            return dict(payload)
+        return {self.key(entry): entry for entry in payload}
+
+    def record(self, version: int, payload: Any):
+        """Remember the payload of ``version``, diffing it against the last one recorded"""
+        items = self._keyed(payload)
+        with self._lock:
+            if self._version is not None and version <= self._version:
+                return
+            if self._version is not None:
+                self._diffs.append((self._version, version, diff_items(self._items, items)))
+            self._version = version
+            self._items = items
+
+    def delta(self, since: int, version: int) -> Optional[Dict[str, Any]]:
+        """Changes from ``since`` to ``version``, or None if they cannot be composed"""
+        with self._lock:
+            if self._version != version:
+                return None
+            items = self._items
+            if since == version:
+                steps = []
+            else:
+                steps = [step for step in self._diffs if step[0] >= since]
+                if not steps or steps[0][0] != since:
+                    return None
+
+        # Compose the steps: track each touched key's final state and whether it existed at ``since``
+        final: Dict[str, Any] = {}
+        existed: Dict[str, bool] = {}
+        removed = object()
+        for _, _, diff in steps:
+            for key, value in diff['added'].items():
+                existed.setdefault(key, False)
+                final[key] = value
+            for key, value in diff['changed'].items():
+                existed.setdefault(key, True)
+                final[key] = value
+            for key in diff['removed']:
+                existed.setdefault(key, True)
+                final[key] = removed
+
+        delta = {'added': {}, 'changed': {}, 'removed': []}
+        if self.key is not None and any(diff['reordered'] for _, _, diff in steps):
+            # Lists are ordered (alerts by priority), so send the new order of keys
+            delta['order'] = list(items)
+        for key, value in final.items():
+            if value is removed:
+                if existed[key]:
+                    delta['removed'].append(key)
+            elif existed[key]:
+                delta['changed'][key] = value
+            else:
+                delta['added'][key] = value
+        return delta
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'version': self._version,
+            'oldest_version': self._diffs[0][0] if self._diffs else self._version,
+            'entries': len(self._items)
+        }
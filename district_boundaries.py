@@ -0,0 +1,233 @@
+import os
+import json
+import math
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from district_names import district_index
+
+logger = logging.getLogger(__name__)
+
+# District polygons (GeoJSON FeatureCollection), e.g. an ADM2 export from HDX or GADM
+BOUNDARIES_PATH = os.path.join('data', 'boundaries', 'pakistan_districts.geojson')
+
+# Property names tried, in order, for a feature's district and province
+DISTRICT_PROPERTIES = ('district', 'DISTRICT', 'ADM2_EN', 'NAME_3', 'NAME_2', 'name')
+PROVINCE_PROPERTIES = ('province', 'PROVINCE', 'ADM1_EN', 'NAME_1')
+
+# Simplification levels: (highest zoom served, tolerance). A level's tolerance
+# is one screen pixel at its highest zoom, so simplification is invisible;
+# zooms beyond the last simplified level get the full-resolution shapes.
+LEVEL_MAX_ZOOMS = (5, 7, 9)
+
+
+def pixel_degrees(zoom: int) -> float:
+    """Width of one 256px-tile pixel at ``zoom``, in degrees of longitude"""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def simplify_ring(points: np.ndarray, tolerance: float) -> Optional[np.ndarray]:
+    """Douglas-Peucker simplification of a closed ring (first point equals last).
+
+    Returns None if the ring collapses below a triangle.
+    """
+    n = len(points)
+    if tolerance <= 0 or n <= 4:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    # Split the ring at the point farthest from its start, so both halves are open polylines
+    far = int(np.argmax(((points - points[0]) ** 2).sum(axis=1)))
+    keep[far] = True
+    stack = [(0, far), (far, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        inner = points[start + 1:end]
+        chord = b - a
+        length = math.hypot(chord[0], chord[1])
+        if length == 0:
+            distances = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            distances = np.abs(chord[0] * (inner[:, 1] - a[1]) - chord[1] * (inner[:, 0] - a[0])) / length
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    if keep.sum() < 4:
+        return None
+    return points[keep]
+
+
+def simplify_geometry(geometry: Dict[str, Any], tolerance: float, decimals: int) -> Optional[Dict[str, Any]]:
+    """Simplified (Multi)Polygon, dropping holes and parts that collapse; None if nothing is left"""
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        return None
+
+    parts = []
+    for rings in polygons:
+        exterior = simplify_ring(np.asarray(rings[0], dtype=np.float64)[:, :2], tolerance)
+        if exterior is None:
+            continue
+        holes = [simplify_ring(np.asarray(ring, dtype=np.float64)[:, :2], tolerance) for ring in rings[1:]]
+        parts.append([np.round(ring, decimals).tolist() for ring in [exterior] + [h for h in holes if h is not None]])
+    if not parts:
+        # Keep a district smaller than the tolerance visible, as the quadrilateral of its extreme points
+        ring = np.asarray(max(polygons, key=lambda rings: len(rings[0]))[0], dtype=np.float64)[:, :2]
+        corners = sorted({int(ring[:, 0].argmin()), int(ring[:, 1].argmin()),
+                          int(ring[:, 0].argmax()), int(ring[:, 1].argmax())})
+        if len(corners) < 3:
+            return None
+        parts = [[np.round(ring[corners + corners[:1]], decimals).tolist()]]
+    if len(parts) == 1:
+        return {'type': 'Polygon', 'coordinates': parts[0]}
+    return {'type': 'MultiPolygon', 'coordinates': parts}
+
+
+def _property(properties: Dict[str, Any], names: Tuple[str, ...]) -> Optional[str]:
+    for name in names:
+        value = properties.get(name)
+        if value:
+            return str(value)
+    return None
+
+
+def _vertices(geometry: Dict[str, Any]) -> int:
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    return sum(len(ring) for rings in polygons for ring in rings)
+
+
+class DistrictBoundaries:
+    """District polygons, simplified once per zoom level and joined to case counts on demand.
+
+    The boundaries come from a local GeoJSON file (``DISTRICT_BOUNDARIES``
+    or data/boundaries/pakistan_districts.geojson). Every level is
+    simplified with Douglas-Peucker when the file is first loaded and
+    cached in the state store, keyed by the file's size and mtime, so a
+    restart reuses them instead of simplifying again.
+    """
+
+    def __init__(self, path: Optional[str] = None, state_store=None):
+        self.path = path or os.environ.get("DISTRICT_BOUNDARIES", BOUNDARIES_PATH)
+        self.state_store = state_store
+        # [(max_zoom or None, tolerance, features)] from coarsest to full resolution
+        self.levels: List[Tuple[Optional[int], float, List[Dict[str, Any]]]] = []
+        self.error = None
+        self._load()
+
+    @property
+    def available(self) -> bool:
+        return bool(self.levels)
+
+    def _fingerprint(self) -> Optional[List[Any]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return [os.path.abspath(self.path), stat.st_mtime_ns, stat.st_size]
+
+    def _load(self):
+        fingerprint = self._fingerprint()
+        if fingerprint is None:
+            self.error = f"No district boundaries at {self.path}"
+            logger.info(self.error)
+            return
+
+        if self.state_store:
+            document = self.state_store.load('boundaries')
+            if document and document.get('meta', {}).get('source') == fingerprint:
+                self.levels = [tuple(level) for level in document['payload']]
+                logger.info(f"Loaded simplified district boundaries from the state store ({len(self.levels)} levels)")
+                return
+
+        try:
+            with open(self.path) as f:
+                collection = json.load(f)
+            self.levels = self._simplify(collection.get('features', []))
+        except Exception as e:
+            self.error = f"Error loading district boundaries: {e}"
+            logger.error(self.error)
+            return
+        if self.state_store:
+            self.state_store.save('boundaries', self.levels, source=fingerprint)
+
+    def _simplify(self, source: List[Dict[str, Any]]) -> List[Tuple[Optional[int], float, List[Dict[str, Any]]]]:
+        districts = []
+        for feature in source:
+            properties = feature.get('properties') or {}
+            district = _property(properties, DISTRICT_PROPERTIES)
+            geometry = feature.get('geometry')
+            if not district or not geometry or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+                continue
+            districts.append((district, _property(properties, PROVINCE_PROPERTIES), geometry))
+
+        levels = []
+        for max_zoom in LEVEL_MAX_ZOOMS + (None,):
+            tolerance = pixel_degrees(max_zoom) if max_zoom is not None else 0.0
+            # Enough decimals to keep a tenth of the tolerance; full resolution keeps ~1 m
+            decimals = min(6, max(1, math.ceil(-math.log10(tolerance)) + 1)) if tolerance else 6
+            features = []
+            for district, province, geometry in districts:
+                simplified = simplify_geometry(geometry, tolerance, decimals)
+                if simplified is not None:
+                    features.append({'district': district, 'province': province, 'geometry': simplified})
+            levels.append((max_zoom, tolerance, features))
+            logger.info(f"Simplified {len(features)} district boundaries for zoom <= {max_zoom or 'max'}: "
+                        f"{sum(_vertices(feature['geometry']) for feature in features)} vertices")
+        return levels
+
+    def level_for_zoom(self, zoom: int) -> int:
+        """Index of the coarsest level whose geometry is still exact to a pixel at ``zoom``"""
+        for i, (max_zoom, _, _) in enumerate(self.levels):
+            if max_zoom is None or zoom <= max_zoom:
+                return i
+        return len(self.levels) - 1
+
+    def choropleth(self, level: int, table) -> Dict[str, Any]:
+        """GeoJSON of ``level``'s district shapes with the case counts of location ``table`` joined on"""
+        max_zoom, tolerance, features = self.levels[level]
+        # Both sides resolve to canonical district ids, so "D.I. Khan" meets "Dera Ismail Khan"
+        cases = district_index.table_cases(table)
+
+        joined = []
+        matched = set()
+        for feature in features:
+            district, province = feature['district'], feature['province']
+            district_id = district_index.resolve(district, province)
+            value = cases.get(district_id)
+            if value is not None:
+                matched.add(district_id)
+            joined.append({
+                'type': 'Feature',
+                'geometry': feature['geometry'],
+                'properties': {'district': district, 'province': province, 'cases': value}
+            })
+
+        return {
+            'type': 'FeatureCollection',
+            'features': joined,
+            'level': {'max_zoom': max_zoom, 'tolerance': tolerance},
+            'unmatched_districts': sorted(table.label(i) for i in range(len(table))
+                                          if district_index.resolve(table.districts[i], table.province_of(i))
+                                          not in matched)
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'available': self.available,
+            'error': self.error,
+            'levels': [{'max_zoom': max_zoom, 'tolerance': tolerance, 'districts': len(features),
+                        'vertices': sum(_vertices(feature['geometry']) for feature in features)}
+                       for max_zoom, tolerance, features in self.levels]
+        }
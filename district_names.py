@@ -0,0 +1,304 @@
+import re
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from surveillance_cube import clean_label, dimension_key, province_key
+
+logger = logging.getLogger(__name__)
+
+# Canonical districts per province (names as in PROVINCE_COORDS). An entry is
+# the canonical name, or a tuple of it and the other spellings the reports,
+# boundary files and weather feeds use for the same district.
+GAZETTEER = {
+    'Sindh': [
+        'Badin', 'Dadu', 'Ghotki', 'Hyderabad', 'Jacobabad', 'Jamshoro',
+        ('Kambar Shahdadkot', 'Kamber', 'Qambar', 'Qambar Shahdadkot', 'Kamber Shahdadkot', 'Kambar Shahdad Kot'),
+        'Karachi Central', 'Karachi East',
+        ('Karachi Keamari', 'Keamari', 'Kemari', 'Karachi Kemari'),
+        ('Karachi Korangi', 'Korangi'),
+        ('Karachi Malir', 'Malir'),
+        'Karachi South', 'Karachi West',
+        ('Kashmore', 'Kandhkot', 'Kashmore Kandhkot'),
+        ('Khairpur', 'Khairpur Mirs'),
+        'Larkana', 'Matiari',
+        ('Mirpur Khas', 'Mirpurkhas'),
+        ('Naushahro Feroze', 'Naushero Feroze', 'Nausheroferoze', 'Naushahro Firoz'),
+        'Sanghar',
+        ('Shaheed Benazirabad', 'Shaheed Benazir Abad', 'Nawabshah'),
+        'Shikarpur', 'Sujawal', 'Sukkur', 'Tando Allahyar',
+        ('Tando Muhammad Khan', 'Tando Mohammad Khan', 'T.M. Khan'),
+        ('Tharparkar', 'Thar'),
+        'Thatta',
+        ('Umerkot', 'Umarkot'),
+    ],
+    'Balochistan': [
+        'Awaran', 'Barkhan', 'Chagai', 'Chaman', 'Dera Bugti', 'Duki', 'Gwadar', 'Harnai',
+        ('Hub', 'Hub Chowki'),
+        ('Jaffarabad', 'Jafarabad'),
+        'Jhal Magsi',
+        ('Kachhi', 'Kachhi (Bolan)', 'Bolan', 'Kachi'),
+        'Kalat',
+        ('Kech', 'Turbat'),
+        'Kharan', 'Khuzdar',
+        ('Killa Abdullah', 'Qila Abdullah', 'Qilla Abdullah'),
+        ('Killa Saifullah', 'Qila Saifullah', 'Qilla Saifullah'),
+        'Kohlu',
+        ('Lasbela', 'Lasbella'),
+        'Loralai', 'Mastung',
+        ('Musakhel', 'Musa Khel'),
+        ('Naseerabad', 'Nasirabad'),
+        ('Nushki', 'Noshki'),
+        'Panjgur', 'Pishin', 'Quetta', 'Sherani', 'Sibi',
+        ('Sohbatpur', 'Sohbat Pur'),
+        'Surab', 'Usta Muhammad', 'Washuk', 'Zhob', 'Ziarat',
+    ],
+    'KP': [
+        'Abbottabad', 'Bajaur', 'Bannu', 'Battagram', 'Buner', 'Charsadda',
+        ('Chitral Lower', 'Lower Chitral'),
+        ('Chitral Upper', 'Upper Chitral'),
+        ('Dera Ismail Khan', 'D.I. Khan', 'DI Khan', 'D I Khan'),
+        ('Dir Lower', 'Lower Dir'),
+        ('Dir Upper', 'Upper Dir'),
+        'Hangu', 'Haripur', 'Karak', 'Khyber', 'Kohat',
+        ('Kohistan Lower', 'Lower Kohistan'),
+        ('Kohistan Upper', 'Upper Kohistan'),
+        ('Kolai Palas', 'Kolai Pallas'),
+        ('Lower Kurram', 'L & C Kurram', 'Lower and Central Kurram', 'Central Kurram'),
+        'Lakki Marwat', 'Malakand', 'Mansehra', 'Mardan', 'Mohmand', 'North Waziristan', 'Nowshera',
+        'Orakzai', 'Peshawar', 'Shangla',
+        ('South Waziristan Lower', 'South Waziristan (Lower)', 'Lower South Waziristan', 'SWL'),
+        ('South Waziristan Upper', 'South Waziristan (Upper)', 'Upper South Waziristan', 'SWU'),
+        'Swabi', 'Swat', 'Tank',
+        ('Tor Ghar', 'Torghar'),
+        ('Upper Kurram', 'Kurram Upper'),
+    ],
+    'Punjab': [
+        'Attock', 'Bahawalnagar', 'Bahawalpur', 'Bhakkar', 'Chakwal', 'Chiniot',
+        ('Dera Ghazi Khan', 'D.G. Khan', 'DG Khan', 'D G Khan'),
+        'Faisalabad', 'Gujranwala', 'Gujrat', 'Hafizabad', 'Jhang', 'Jhelum', 'Kasur', 'Khanewal', 'Khushab',
+        'Kot Addu', 'Lahore', 'Layyah', 'Lodhran',
+        ('Mandi Bahauddin', 'M.B. Din'),
+        'Mianwali', 'Multan', 'Murree', 'Muzaffargarh', 'Nankana Sahib', 'Narowal', 'Okara', 'Pakpattan',
+        ('Rahim Yar Khan', 'R.Y. Khan', 'RY Khan'),
+        'Rajanpur', 'Rawalpindi', 'Sahiwal', 'Sargodha', 'Sheikhupura', 'Sialkot', 'Talagang', 'Taunsa',
+        ('Toba Tek Singh', 'T.T. Singh', 'TT Singh'),
+        'Vehari', 'Wazirabad',
+    ],
+    'ICT': [
+        ('Islamabad', 'ICT', 'Islamabad Capital Territory'),
+    ],
+    'GB': [
+        'Astore', 'Darel', 'Diamer', 'Ghanche', 'Ghizer', 'Gilgit',
+        ('Gupis Yasin', 'Gupis-Yasin'),
+        'Hunza', 'Kharmang', 'Nagar', 'Roundu', 'Shigar', 'Skardu', 'Tangir',
+    ],
+    'AJK': [
+        'Bagh', 'Bhimber',
+        ('Hattian Bala', 'Jhelum Valley'),
+        'Haveli', 'Kotli', 'Mirpur', 'Muzaffarabad',
+        ('Neelum', 'Neelum Valley'),
+        ('Poonch', 'Rawalakot'),
+        'Sudhnoti',
+    ],
+}
+
+# Cities (as named by the weather feed) that span several districts
+CITY_DISTRICTS = {
+    'Karachi': ('Sindh', ['Karachi Central', 'Karachi East', 'Karachi Keamari', 'Karachi Korangi',
+                          'Karachi Malir', 'Karachi South', 'Karachi West']),
+}
+
+# Report rows that are not districts: province totals and lab rows ("Total", "Sindh Labs")
+NOT_A_DISTRICT = re.compile(r'^(grand)?total|labs?$')
+
+# Trigram similarity (Dice coefficient) a spelling needs to match a district it is not listed under
+FUZZY_THRESHOLD = 0.7
+
+# Resolved raw names kept in memory; the cache is cleared when it grows past this
+MEMO_SIZE = 65536
+
+_NOT_A_DISTRICT_ID = -1
+
+
+def trigrams(key: str) -> frozenset:
+    """Character trigrams of a dimension key, padded so its first and last letters count"""
+    padded = f"${key}$"
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class DistrictIndex:
+    """Canonical districts with a precomputed trigram index for resolving raw district names.
+
+    Every district of the gazetteer gets a small integer id, and so does
+    every name that resolves to no known district (registered as a new
+    district on first sight, matched only exactly afterwards), so joins between sheets, weeks, boundary
+    files and weather locations are joins on ids. A name resolves, in
+    order, through the memo of names already seen, an exact match of its
+    dimension key against every listed spelling, and a trigram match
+    scored by Dice coefficient, which must reach ``threshold`` and be
+    unambiguous. A province narrows every step to that province's
+    districts.
+
+    Ids of gazetteer districts are stable (the gazetteer's order); ids of
+    registered names are per process, so they are never persisted.
+    """
+
+    def __init__(self, gazetteer: Optional[Dict[str, List[Any]]] = None, threshold: float = FUZZY_THRESHOLD):
+        self.threshold = threshold
+        self.names: List[str] = []
+        self.provinces: List[Optional[str]] = []
+        self.known = 0
+        # (province key, name key) -> id, and name key -> ids across provinces
+        self._exact: Dict[Tuple[str, str], int] = {}
+        self._by_key: Dict[str, set] = {}
+        # Spellings, their trigram sets and province keys, and trigram -> spelling postings
+        self._spellings: List[Tuple[int, str, frozenset]] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._memo: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+        # (table, counts by id) of the last table_cases call
+        self._table_cases = None
+
+        for province, entries in (GAZETTEER if gazetteer is None else gazetteer).items():
+            for entry in entries:
+                names = (entry,) if isinstance(entry, str) else entry
+                self._add(names[0], province, names[1:])
+        self.known = len(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _add(self, name: str, province: Optional[str], aliases: Iterable[str] = (), fuzzy: bool = True) -> int:
+        district_id = len(self.names)
+        self.names.append(name)
+        self.provinces.append(province)
+        pkey = province_key(province) if province else ''
+        for spelling in (name, *aliases):
+            key = dimension_key(spelling)
+            self._exact.setdefault((pkey, key), district_id)
+            self._by_key.setdefault(key, set()).add(district_id)
+            if not fuzzy:
+                continue
+            position = len(self._spellings)
+            grams = trigrams(key)
+            self._spellings.append((district_id, pkey, grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(position)
+        return district_id
+
+    def resolve(self, name: str, province: Optional[str] = None) -> Optional[int]:
+        """Id of the district ``name`` refers to, or None for a total or lab row.
+
+        A name that matches no district is registered as a new one (in
+        ``province``), so it keeps one id for the life of the process.
+        """
+        memo_key = (str(name), str(province or ''))
+        district_id = self._memo.get(memo_key)
+        if district_id is None:
+            with self._lock:
+                district_id = self._memo.get(memo_key)
+                if district_id is None:
+                    district_id = self._resolve(str(name), province)
+                    if len(self._memo) >= MEMO_SIZE:
+                        self._memo.clear()
+                    self._memo[memo_key] = district_id
+        else:
+            self.stats['memo_hits'] += 1
+        return None if district_id == _NOT_A_DISTRICT_ID else district_id
+
+    def _resolve(self, name: str, province: Optional[str]) -> int:
+        key = dimension_key(name)
+        pkey = province_key(province) if province else ''
+        if not key or NOT_A_DISTRICT.search(key):
+            self.stats['not_a_district'] += 1
+            return _NOT_A_DISTRICT_ID
+
+        district_id = self._exact.get((pkey, key))
+        if district_id is None and not pkey and len(self._by_key.get(key, ())) == 1:
+            district_id = next(iter(self._by_key[key]))
+        if district_id is not None:
+            self.stats['exact'] += 1
+            return district_id
+
+        district_id = self._fuzzy(key, pkey)
+        if district_id is not None:
+            self.stats['fuzzy'] += 1
+            logger.debug(f"District '{name}' ({province}) matched '{self.names[district_id]}'")
+            return district_id
+
+        self.stats['registered'] += 1
+        logger.info(f"District '{name}' ({province}) matches no known district, registered as a new one")
+        # Matched exactly from now on, but never fuzzily: numbered names such as "Tehsil 12" and
+        # "Tehsil 13" are different places, and the trigram postings stay the gazetteer's size
+        return self._add(clean_label(name), province, fuzzy=False)
+
+    def _fuzzy(self, key: str, pkey: str) -> Optional[int]:
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            for position in self._postings.get(gram, ()):
+                shared[position] += 1
+
+        best: Dict[int, float] = {}
+        for position, count in shared.items():
+            district_id, spelling_pkey, spelling_grams = self._spellings[position]
+            if pkey and spelling_pkey and spelling_pkey != pkey:
+                continue
+            score = 2 * count / (len(grams) + len(spelling_grams))
+            if score > best.get(district_id, 0):
+                best[district_id] = score
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < self.threshold:
+            return None
+        if len(ranked) > 1 and ranked[1][1] == ranked[0][1]:
+            # Equally close to two districts: no guess
+            return None
+        return ranked[0][0]
+
+    def name(self, district_id: int) -> str:
+        return self.names[district_id]
+
+    def province(self, district_id: int) -> Optional[str]:
+        return self.provinces[district_id]
+
+    def city(self, name: str) -> List[int]:
+        """Ids of the districts a city covers (one for most cities, several for Karachi)"""
+        if name in CITY_DISTRICTS:
+            province, districts = CITY_DISTRICTS[name]
+            return [self.resolve(district, province) for district in districts]
+        district_id = self.resolve(name)
+        return [] if district_id is None else [district_id]
+
+    def table_cases(self, table) -> Dict[int, int]:
+        """Case counts of a LocationTable keyed by district id (total and lab rows left out).
+
+        Tables are immutable, so the counts of the last table asked for are
+        kept and reused until another table comes along.
+        """
+        cached = self._table_cases
+        if cached is not None and cached[0] is table:
+            return cached[1]
+        cases: Dict[int, int] = {}
+        for i in range(len(table)):
+            district_id = self.resolve(table.districts[i], table.province_of(i))
+            if district_id is not None:
+                cases[district_id] = cases.get(district_id, 0) + int(table.cases[i])
+        self._table_cases = (table, cases)
+        return cases
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'districts': self.known,
+            'registered': len(self.names) - self.known,
+            'spellings': len(self._spellings),
+            'trigrams': len(self._postings),
+            'memo': len(self._memo),
+            'resolved': dict(self.stats)
+        }
+
+
+# Built once at import and shared by every module that joins on district ids
+district_index = DistrictIndex()
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Dashboard sections (API endpoint names) that depend on each data source
+SOURCE_SECTIONS = {
+    'health': ['dashboard-data', 'disease-trends', 'map-data', 'alerts', 'high-risk-areas',
+               'disease-surveillance', 'ai-recommendations', 'scenario-simulation'],
+    'weather': ['weather-data', 'weather-alerts', 'climate-monitoring'],
+}
+
+# Seconds between checks of the source versions
+POLL_INTERVAL = 2.0
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15.0
+
+# Streams are closed after this long; the browser reconnects on its own,
+# which frees threads held by clients that vanished without closing
+MAX_STREAM_SECONDS = 10 * 60
+
+# Milliseconds the browser waits before reconnecting
+RETRY_MS = 5000
+
+# Share of a worker's request threads that event streams may hold; every
+# stream holds one for its whole life, so the rest stay free for API requests
+STREAM_THREAD_SHARE = 0.25
+
+
+def stream_limit(threads: int) -> int:
+    """Most event streams a worker with ``threads`` request threads keeps open.
+
+    SSE_MAX_STREAMS can lower the limit but not raise it above
+    STREAM_THREAD_SHARE of the threads; a worker with fewer than four
+    threads (e.g. the sync worker) serves no streams at all.
+    """
+    limit = int(threads * STREAM_THREAD_SHARE)
+    requested = os.environ.get("SSE_MAX_STREAMS")
+    return min(int(requested), limit) if requested else limit
+
+
+def format_event(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """One server-sent event in wire format"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventBroker:
+    """Announces new data versions to server-sent-event streams.
+
+    A single watcher thread compares the version of every source each
+    POLL_INTERVAL seconds and, when one changes, publishes an ``update``
+    event naming the affected dashboard sections. Streams only block on a
+    shared condition and wake for events and heartbeats, not for the
+    version checks; still, each one holds a request thread, so at most
+    ``max_streams`` are open at once (see stream_limit). Every process
+    watches its own services, which also covers followers that pick up
+    the leader's data from the state store.
+    """
+
+    def __init__(self, get_versions: Callable[[], Dict[str, Any]], max_streams: Optional[int] = None,
+                 history_size: int = 50):
+        self._get_versions = get_versions
+        if max_streams is None:
+            max_streams = int(os.environ.get("SSE_MAX_STREAMS", "100"))
+        self.max_streams = max_streams
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=history_size)
+        self._sequence = 0
+        self._versions: Dict[str, Any] = {}
+        self._streams = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def versions(self) -> Dict[str, Any]:
+        return dict(self._versions)
+
+    def start(self):
+        """Start the version watcher; safe to call repeatedly"""
+        if self._thread is not None:
+            return
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._versions = self._read_versions() or {}
+            self._thread = threading.Thread(target=self._watch, name='event-broker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def _read_versions(self) -> Optional[Dict[str, Any]]:
+        try:
+            return self._get_versions()
+        except Exception as e:
+            logger.error(f"Error reading data versions: {e}")
+            return None
+
+    def _watch(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            versions = self._read_versions()
+            if versions is None:
+                continue
+            changed = [source for source, version in versions.items()
+                       if version is not None and version != self._versions.get(source)]
+            if changed:
+                self.publish(versions, changed)
+            else:
+                self._versions = versions
+
+    def publish(self, versions: Dict[str, Any], changed_sources: List[str]):
+        """Announce new versions of ``changed_sources`` to every open stream"""
+        sections = []
+        for source in changed_sources:
+            sections.extend(SOURCE_SECTIONS.get(source, []))
+        with self._condition:
+            self._sequence += 1
+            self._versions = dict(versions)
+            self._events.append((self._sequence, {
+                'versions': dict(versions),
+                'sources': changed_sources,
+                'sections': sections
+            }))
+            self._condition.notify_all()
+        logger.info(f"Announced new {', '.join(changed_sources)} data to {self._streams} stream(s)")
+
+    def try_open(self) -> bool:
+        """Reserve a stream slot; False when the process is at its stream limit"""
+        with self._condition:
+            if self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+    
+    def release(self):
+        """Free a slot reserved by ``try_open`` once its response is closed"""
+        with self._condition:
+            self._streams -= 1
+
+    def stream(self) -> Iterator[str]:
+        """Events for one client, until the stream reaches MAX_STREAM_SECONDS"""
+        yield f"retry: {RETRY_MS}\n\n"
+        with self._condition:
+            sequence = self._sequence
+            versions = dict(self._versions)
+        # Every stream starts with the current versions, so a reconnecting
+        # client can tell which sections it missed - even when another worker
+        # served its previous stream and event ids mean nothing here
+        yield format_event('versions', {'versions': versions, 'sections': SOURCE_SECTIONS},
+                           event_id=sequence)
+
+        started = time.monotonic()
+        while not self._stop.is_set() and time.monotonic() - started < MAX_STREAM_SECONDS:
+            with self._condition:
+                if self._sequence == sequence:
+                    self._condition.wait(HEARTBEAT_INTERVAL)
+                pending = [event for event in self._events if event[0] > sequence]
+                sequence = self._sequence
+            if pending:
+                for event_id, data in pending:
+                    yield format_event('update', data, event_id=event_id)
+            else:
+                yield ": keep-alive\n\n"
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'open_streams': self._streams,
+            'max_streams': self.max_streams,
+            'last_event_id': self._sequence,
+            'versions': self.versions
+        }
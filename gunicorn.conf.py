@@ -0,0 +1,33 @@
+# Gunicorn settings, picked up automatically when gunicorn runs from the project root
+#
+# With --preload (or PRELOAD=1) the master parses the workbook once and
+# freezes it before forking, so every worker shares the same data pages
+# copy-on-write instead of parsing and holding its own copy.
+import os
+
+preload_app = os.environ.get("PRELOAD", "").lower() in ("1", "true", "yes")
+
+# Every open /api/events stream holds a thread while it waits, so each
+# worker gives streams at most a quarter of its threads (32 of the default
+# 128; SSE_MAX_STREAMS can lower that) and keeps the rest for API requests
+worker_class = os.environ.get("WORKER_CLASS", "gthread")
+threads = int(os.environ.get("THREADS", "128"))
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported and before workers are forked"""
+    if server.cfg.preload_app:
+        import services
+        services.preload()
+
+
+def post_worker_init(worker):
+    """Start loading data and caches as soon as a worker boots, not on its first request"""
+    import services
+    # The thread count in effect, which command-line options may have changed
+    services.worker_threads = worker.cfg.threads
+    # Connections pooled in the master (under --preload) must not be shared with workers
+    database = services.database.get_if_built()
+    if database is not None:
+        database.dispose()
+    services.start_warm_up()
@@ -0,0 +1,128 @@
+import sys
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LocationTable:
+    """Map locations (district, province, coordinates, cases) as parallel NumPy columns.
+
+    A list of per-district dicts costs a dict, a formatted "District,
+    Province" string and boxed floats for every row. Here a row is a
+    slot in each column, and district and province names are interned
+    strings referenced by index, so the same name is held once however
+    many tables (weeks) use it. The table is immutable once built; the
+    per-location dicts the API returns are built only at the edge, by
+    ``to_records``.
+
+    Persisted (state store, frozen snapshots) in the columnar form of
+    ``to_dict``.
+    """
+
+    __slots__ = ('districts', 'provinces', 'province', 'lat', 'lng', 'cases')
+
+    def __init__(self, districts: List[str], provinces: List[str], province: np.ndarray,
+                 lat: np.ndarray, lng: np.ndarray, cases: np.ndarray):
+        # One name per row; province codes index ``provinces`` (-1 for none)
+        self.districts = [sys.intern(name) for name in districts]
+        self.provinces = [sys.intern(name) for name in provinces]
+        self.province = np.asarray(province, dtype=np.int16)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.cases = np.asarray(cases, dtype=np.int64)
+        for column in (self.province, self.lat, self.lng, self.cases):
+            column.setflags(write=False)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, Optional[str], float, float, int]]) -> 'LocationTable':
+        """Build from (district, province, lat, lng, cases) tuples"""
+        districts, province_codes, lat, lng, cases = [], [], [], [], []
+        province_index: Dict[str, int] = {}
+        for district, province, row_lat, row_lng, row_cases in rows:
+            districts.append(district)
+            province_codes.append(-1 if province is None else province_index.setdefault(province, len(province_index)))
+            lat.append(row_lat)
+            lng.append(row_lng)
+            cases.append(row_cases)
+        return cls(districts, list(province_index), province_codes, lat, lng, cases)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> 'LocationTable':
+        """Build from the per-location dicts of older snapshots and sample data"""
+        rows = []
+        for record in records:
+            province = record.get('province')
+            district = record.get('location', '')
+            suffix = f", {province}"
+            if province and district.endswith(suffix):
+                district = district[:-len(suffix)]
+            rows.append((district, province, record.get('lat', 0.0), record.get('lng', 0.0), record.get('cases', 0)))
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_dict(cls, document: Dict[str, Any]) -> 'LocationTable':
+        return cls(document['districts'], document['provinces'], document['province'],
+                   document['lat'], document['lng'], document['cases'])
+
+    @classmethod
+    def coerce(cls, value: Any) -> 'LocationTable':
+        """A LocationTable from any stored form of map data (table, columnar dict or list of dicts)"""
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            return cls.from_dict(value)
+        return cls.from_records(value or [])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'districts': list(self.districts),
+            'provinces': list(self.provinces),
+            'province': self.province.tolist(),
+            'lat': self.lat.tolist(),
+            'lng': self.lng.tolist(),
+            'cases': self.cases.tolist()
+        }
+
+    def __len__(self) -> int:
+        return len(self.districts)
+
+    def __repr__(self):
+        return f"LocationTable({len(self)} locations, {len(self.provinces)} provinces)"
+
+    def province_of(self, i: int) -> Optional[str]:
+        code = self.province[i]
+        return None if code < 0 else self.provinces[code]
+
+    def label(self, i: int) -> str:
+        """Display name of row ``i`` ("Badin, Sindh")"""
+        province = self.province_of(i)
+        return self.districts[i] if province is None else f"{self.districts[i]}, {province}"
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """The API's dict for row ``i``"""
+        record = {
+            'location': self.label(i),
+            'lat': float(self.lat[i]),
+            'lng': float(self.lng[i]),
+            'cases': int(self.cases[i])
+        }
+        province = self.province_of(i)
+        if province is not None:
+            record['province'] = province
+        return record
+
+    def to_records(self, rows: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Per-location dicts, for all rows or the given row indexes"""
+        return [self.record(i) for i in (range(len(self)) if rows is None else rows)]
+
+    def top(self, n: int) -> np.ndarray:
+        """Indexes of the ``n`` rows with the most cases (ties in table order)"""
+        return np.argsort(-self.cases, kind='stable')[:n]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the NumPy columns (names are shared, interned strings)"""
+        return int(self.province.nbytes + self.lat.nbytes + self.lng.nbytes + self.cases.nbytes)
@@ -0,0 +1,245 @@
+import os
+import math
+import shutil
+import atexit
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+import numpy as np
+
+from serialization import Payload, dumps
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+MAX_ZOOM = 18
+
+# Points this close (in pixels) outside a tile are included in it, so a
+# marker drawn near the edge is not cut in half by the tile boundary
+BUFFER_PIXELS = 16
+
+GEOJSON_MIMETYPE = 'application/geo+json'
+
+
+def tile_coordinates(lat: np.ndarray, lng: np.ndarray, z: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Fractional Web Mercator (slippy map) tile coordinates of points at zoom ``z``"""
+    n = 2 ** z
+    lat_rad = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (np.asarray(lng) + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+class MapTiles:
+    """GeoJSON tiles of the map's district locations, built lazily and cached.
+
+    Tiles are kept across data versions: when a new version arrives, only
+    the cached tiles containing a location that was added, removed, moved
+    or whose case count changed are dropped. The rest keep their body and
+    ETag, so clients revalidating them get a 304.
+
+    The most recently used ``max_tiles`` tiles are held in memory; older
+    ones are spilled to ``spill_dir`` (one directory per process) and read
+    back on their next request, up to ``max_spilled`` files.
+    """
+
+    def __init__(self, max_tiles: Optional[int] = None, spill_dir: Optional[str] = None,
+                 max_spilled: Optional[int] = None):
+        self.max_tiles = max_tiles or int(os.environ.get("TILE_CACHE_SIZE", "1024"))
+        self.max_spilled = max_spilled or self.max_tiles * 16
+        self.spill_dir = spill_dir
+        self._tiles: 'OrderedDict[Tuple[int, int, int], Payload]' = OrderedDict()
+        self._spilled: 'OrderedDict[Tuple[int, int, int], str]' = OrderedDict()
+        self._version = None
+        self._table = None
+        self._lock = threading.Lock()
+        self.hits = self.spill_hits = self.misses = self.invalidated = 0
+        if spill_dir:
+            clean_process_dirs(spill_dir)
+            atexit.register(shutil.rmtree, spill_dir, True)
+
+    def get(self, version: int, table, z: int, x: int, y: int) -> Payload:
+        """Tile (z, x, y) of ``table``, the location table of data ``version``"""
+        key = (z, x, y)
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._update(version, table)
+            if version != self._version:
+                # A request still holding an older version - serve it uncached
+                return self._build(table, z, x, y)
+            payload = self._tiles.get(key)
+            if payload is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return payload
+            path = self._spilled.get(key)
+
+        if path is not None:
+            payload = self._read_spilled(key, path)
+            if payload is not None:
+                self.spill_hits += 1
+                return self._store(version, key, payload)
+
+        self.misses += 1
+        payload = self._build(table, z, x, y)
+        return self._store(version, key, payload)
+
+    def _store(self, version: int, key: Tuple[int, int, int], payload: Payload) -> Payload:
+        with self._lock:
+            # Don't cache a tile built from a table that was replaced meanwhile
+            if version == self._version:
+                self._tiles[key] = payload
+                self._tiles.move_to_end(key)
+                while len(self._tiles) > self.max_tiles:
+                    self._spill(*self._tiles.popitem(last=False))
+        return payload
+
+    def _build(self, table, z: int, x: int, y: int) -> Payload:
+        buffer = BUFFER_PIXELS / TILE_SIZE
+        features = []
+        if len(table):
+            tx, ty = tile_coordinates(table.lat, table.lng, z)
+            rows = np.flatnonzero((tx >= x - buffer) & (tx < x + 1 + buffer) &
+                                  (ty >= y - buffer) & (ty < y + 1 + buffer))
+            for i in rows.tolist():
+                properties = {'location': table.label(i), 'cases': int(table.cases[i])}
+                province = table.province_of(i)
+                if province is not None:
+                    properties['province'] = province
+                features.append({
+                    'type': 'Feature',
+                    'geometry': {'type': 'Point', 'coordinates': [float(table.lng[i]), float(table.lat[i])]},
+                    'properties': properties
+                })
+        return _tile_payload((z, x, y), dumps({'type': 'FeatureCollection', 'features': features}))
+
+    def _update(self, version: int, table):
+        """Switch to a new data version, dropping only the tiles it changes"""
+        if self._table is None:
+            self._drop_all()
+        else:
+            points = _changed_points(self._table, table)
+            if points is None:
+                self._drop_all()
+            elif points[0].size:
+                self._drop_tiles(points)
+        self._version = version
+        self._table = table
+
+    def _drop_tiles(self, points: Tuple[np.ndarray, np.ndarray]):
+        """Drop every cached tile containing (or buffering) one of ``points`` (lat, lng arrays)"""
+        buffer = BUFFER_PIXELS / TILE_SIZE
+        keys = set(self._tiles) | set(self._spilled)
+        for z in {key[0] for key in keys}:
+            tx, ty = tile_coordinates(points[0], points[1], z)
+            touched: Set[Tuple[int, int, int]] = set()
+            for x_low, x_high, y_low, y_high in zip(np.floor(tx - buffer).astype(int).tolist(),
+                                                    np.floor(tx + buffer).astype(int).tolist(),
+                                                    np.floor(ty - buffer).astype(int).tolist(),
+                                                    np.floor(ty + buffer).astype(int).tolist()):
+                for x in range(x_low, x_high + 1):
+                    for y in range(y_low, y_high + 1):
+                        touched.add((z, x, y))
+            for key in touched & keys:
+                self._tiles.pop(key, None)
+                path = self._spilled.pop(key, None)
+                if path:
+                    _unlink(path)
+                self.invalidated += 1
+
+    def _drop_all(self):
+        self.invalidated += len(self._tiles) + len(self._spilled)
+        self._tiles.clear()
+        for path in self._spilled.values():
+            _unlink(path)
+        self._spilled.clear()
+
+    def _spill(self, key: Tuple[int, int, int], payload: Payload):
+        if not self.spill_dir:
+            return
+        path = os.path.join(self.spill_dir, '%d-%d-%d.json' % key)
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(payload.body)
+        except OSError as e:
+            logger.warning(f"Could not spill map tile {key} to disk: {e}")
+            return
+        self._spilled[key] = path
+        self._spilled.move_to_end(key)
+        while len(self._spilled) > self.max_spilled:
+            _unlink(self._spilled.popitem(last=False)[1])
+
+    def _read_spilled(self, key: Tuple[int, int, int], path: str) -> Optional[Payload]:
+        try:
+            with open(path, 'rb') as f:
+                return _tile_payload(key, f.read())
+        except OSError:
+            return None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'version': self._version,
+            'tiles': len(self._tiles),
+            'spilled': len(self._spilled),
+            'hits': self.hits,
+            'spill_hits': self.spill_hits,
+            'misses': self.misses,
+            'invalidated': self.invalidated
+        }
+
+
+def _tile_payload(key: Tuple[int, int, int], body: bytes) -> Payload:
+    # Content-addressed ETag, so a tile that survives a new data version keeps it
+    return Payload(body, etag='tile-%d-%d-%d-' % key + hashlib.blake2b(body, digest_size=8).hexdigest())
+
+
+def _changed_points(old, new) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(lat, lng) of every location added, removed or changed between two tables; None if all changed"""
+    old_rows = {old.label(i): i for i in range(len(old))}
+    new_rows = {new.label(i): i for i in range(len(new))}
+    if not old_rows.keys() & new_rows.keys():
+        return None
+
+    old_changed, new_changed = [], []
+    for label, i in old_rows.items():
+        j = new_rows.get(label)
+        if j is None:
+            old_changed.append(i)
+        elif (old.lat[i], old.lng[i], old.cases[i]) != (new.lat[j], new.lng[j], new.cases[j]):
+            old_changed.append(i)
+            new_changed.append(j)
+    new_changed.extend(j for label, j in new_rows.items() if label not in old_rows)
+    return (np.concatenate([old.lat[old_changed], new.lat[new_changed]]),
+            np.concatenate([old.lng[old_changed], new.lng[new_changed]]))
+
+
+def clean_process_dirs(process_dir: str):
+    """Empty this process's directory (``<parent>/<pid>``) and remove those of processes that are gone"""
+    shutil.rmtree(process_dir, ignore_errors=True)
+    parent = os.path.dirname(process_dir)
+    if not os.path.isdir(parent):
+        return
+    for name in os.listdir(parent):
+        if not name.isdigit():
+            continue
+        try:
+            os.kill(int(name), 0)
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+        except OSError:
+            pass
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -1,76 +1,334 @@
 import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
+from data_watcher import DataDirectoryWatcher
+from cadence import AdaptiveCadence, DEFAULT_CADENCE_BOUNDS, relative_change
 
 logger = logging.getLogger(__name__)
 
+# Stages of a comprehensive refresh, in execution order
+REFRESH_STAGES = ('health_data', 'weather', 'ai_analysis')
+
+# Interval job behind each adaptively scheduled source
+SOURCE_JOB_IDS = {
+    'weather': 'weather_update',
+    'health_data': 'health_data_update',
+    'ai_analysis': 'ai_analysis_update'
+}
+
+# The started DataScheduler, used by persisted jobs to find their target
+_active_scheduler = None
+
+# State store section holding the refresh jobs of every worker, keyed by job id
+REFRESH_JOBS_SECTION = 'refresh_jobs'
+
+# An active refresh job not updated for this long is taken to have died with its process
+ABANDONED_JOB_SECONDS = 15 * 60
+
+# How often the leader checks the state store for refreshes requested, and data versions published, by other workers
+REFRESH_QUEUE_POLL_SECONDS = 1.0
+
+
+def run_scheduled_task(task):
+    """Entry point of every scheduled job.
+    
+    Jobs in a persistent job store are serialized by reference, so they call
+    this module-level function, which dispatches to the running scheduler.
+    """
+    if _active_scheduler is None:
+        logger.warning(f"No active scheduler for task '{task}'")
+        return
+    if task == 'daily':
+        _active_scheduler.request_refresh(trigger='daily')
+        return
+    if task == 'sync':
+        _active_scheduler._sync_from_leader()
+        return
+    if task == 'weekly_report':
+        _active_scheduler._build_weekly_report()
+        return
+    handlers = {
+        'weather': _active_scheduler._update_weather,
+        'health_data': _active_scheduler._update_health_data,
+        'ai_analysis': _active_scheduler._update_ai_analysis
+    }
+    handler = handlers.get(task)
+    if handler is None:
+        logger.warning(f"Unknown scheduled task '{task}'")
+        return
+    handler()
+
+
+class RefreshJob:
+    """Progress record for one comprehensive data refresh"""
+    
+    def __init__(self, trigger='manual'):
+        self.id = uuid.uuid4().hex
+        self.trigger = trigger
+        self.status = 'queued'
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.updated_at = self.created_at
+        self.coalesced_requests = 0
+        self.stages = OrderedDict(
+            (stage, {'status': 'pending', 'started_at': None, 'duration_ms': None, 'error': None})
+            for stage in REFRESH_STAGES
+        )
+    
+    @classmethod
+    def from_dict(cls, document):
+        job = cls(document['trigger'])
+        job.id = document['job_id']
+        for name in ('status', 'created_at', 'started_at', 'finished_at', 'updated_at', 'coalesced_requests'):
+            setattr(job, name, document.get(name, getattr(job, name)))
+        job.stages.update((stage, dict(info)) for stage, info in document.get('stages', {}).items())
+        return job
+    
+    @property
+    def is_active(self):
+        return self.status in ('queued', 'running')
+    
+    @property
+    def is_abandoned(self):
+        """Active, but not updated for so long that the process running it must be gone"""
+        updated = datetime.fromisoformat(self.updated_at)
+        return self.is_active and datetime.now() - updated > timedelta(seconds=ABANDONED_JOB_SECONDS)
+    
+    def run_stage(self, stage, func, on_update=None):
+        """Run one stage, recording its status and timing; ``on_update`` is called as the status changes"""
+        info = self.stages[stage]
+        info['status'] = 'running'
+        info['started_at'] = datetime.now().isoformat()
+        if on_update:
+            on_update()
+        start = time.perf_counter()
+        try:
+            if func() is False:
+                info['status'] = 'failed'
+                info['error'] = 'Update reported failure, see logs'
+            else:
+                info['status'] = 'completed'
+        except Exception as e:
+            info['status'] = 'failed'
+            info['error'] = str(e)
+            logger.error(f"Refresh job {self.id} stage '{stage}' failed: {e}")
+        finally:
+            info['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            if on_update:
+                on_update()
+    
+    def to_dict(self):
+        completed = sum(1 for info in self.stages.values() if info['status'] in ('completed', 'failed'))
+        return {
+            'job_id': self.id,
+            'trigger': self.trigger,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'updated_at': self.updated_at,
+            'coalesced_requests': self.coalesced_requests,
+            'progress': round(completed / len(self.stages) * 100),
+            'stages': {stage: dict(info) for stage, info in self.stages.items()}
+        }
+
+
 class DataScheduler:
     """Scheduler for automatic data updates"""
     
-    def __init__(self, data_processor, ai_analyzer, weather_service):
+    def __init__(self, data_processor, ai_analyzer, weather_service, state_store=None, cadence_bounds=None,
+                 weekly_reports=None):
         self.data_processor = data_processor
         self.ai_analyzer = ai_analyzer
         self.weather_service = weather_service
-        self.scheduler = BackgroundScheduler()
+        self.state_store = state_store
+        self.weekly_reports = weekly_reports
+        self.scheduler = self._create_scheduler()
         self.is_running = False
+        
+        # Leader election between gunicorn workers sharing the state directory
+        self.leader_lock = state_store.leader_lock() if state_store else None
+        self.role = None
+        self.sync_interval = 30
+        
+        # Refresh intervals adapt to how much each source changes and to alert state
+        bounds = dict(DEFAULT_CADENCE_BOUNDS, **(cadence_bounds or {}))
+        self.cadences = {source: AdaptiveCadence(source, *bounds[source]) for source in SOURCE_JOB_IDS}
+        self._last_metrics = {}
+        self._last_ai_version = None
+        self._cadence_mtime = None
+        self._restore_cadences()
+        
+        # Background refresh jobs; at most one is active at a time. Any worker
+        # queues them in the state store, and only the leader runs them
+        self._jobs_lock = threading.Lock()
+        self._local_jobs = {}
+        self._runner_lock = threading.Lock()
+        self.max_job_history = 50
+        
+        # New or changed workbooks are ingested as soon as they land in data/
+        self.data_watcher = None
+        if data_processor is not None:
+            self.data_watcher = DataDirectoryWatcher(data_processor.data_dir, self._on_workbook_changed)
+    
+    def _create_scheduler(self):
+        """Create the APScheduler instance, with a SQLite job store when state is persisted"""
+        # A run missed during a restart fires once on start-up instead of being
+        # dropped or replayed several times
+        job_defaults = {
+            'coalesce': True,
+            'misfire_grace_time': 60 * 60,
+            'max_instances': 1
+        }
+        jobstores = {}
+        if self.state_store:
+            try:
+                from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+                jobstores['default'] = SQLAlchemyJobStore(url=self.state_store.jobstore_url)
+            except Exception as e:
+                logger.warning(f"Persistent job store unavailable, using in-memory jobs: {e}")
+        return BackgroundScheduler(jobstores=jobstores, job_defaults=job_defaults)
+    
+    def _add_job(self, job_id, name, trigger, task):
+        """Add or update a job, keeping the next run time of a persisted job"""
+        existing = self.scheduler.get_job(job_id)
+        kwargs = {}
+        if existing is not None and existing.next_run_time and str(existing.trigger) == str(trigger):
+            kwargs['next_run_time'] = existing.next_run_time
+        
+        # Persisted jobs must reference a module-level function, not a bound method
+        self.scheduler.add_job(
+            func=run_scheduled_task,
+            args=[task],
+            trigger=trigger,
+            id=job_id,
+            name=name,
+            replace_existing=True,
+            **kwargs
+        )
     
     def start(self):
         """Start the scheduler"""
+        global _active_scheduler
         try:
             if not self.is_running:
-                # Schedule different update intervals for different data types
-                
-                # Update weather data every 30 minutes
-                self.scheduler.add_job(
-                    func=self._update_weather,
-                    trigger=IntervalTrigger(minutes=30),
-                    id='weather_update',
-                    name='Update Weather Data',
-                    replace_existing=True
-                )
-                
-                # Update health data every 2 hours
-                self.scheduler.add_job(
-                    func=self._update_health_data,
-                    trigger=IntervalTrigger(hours=2),
-                    id='health_data_update',
-                    name='Update Health Data',
-                    replace_existing=True
-                )
+                _active_scheduler = self
                 
-                # Generate AI analysis every 6 hours
-                self.scheduler.add_job(
-                    func=self._update_ai_analysis,
-                    trigger=IntervalTrigger(hours=6),
-                    id='ai_analysis_update',
-                    name='Update AI Analysis',
-                    replace_existing=True
-                )
+                # One process runs the refresh jobs; other workers follow its persisted state
+                if self.leader_lock is None or self.leader_lock.try_acquire():
+                    self._start_leader()
+                else:
+                    self._start_follower()
                 
-                # Daily comprehensive update at 6 AM
-                self.scheduler.add_job(
-                    func=self.update_all_data,
-                    trigger=CronTrigger(hour=6, minute=0),
-                    id='daily_update',
-                    name='Daily Data Update',
-                    replace_existing=True
-                )
-                
-                self.scheduler.start()
                 self.is_running = True
-                logger.info("Data scheduler started successfully")
+                logger.info(f"Data scheduler started successfully ({self.role})")
                 
         except Exception as e:
             logger.error(f"Error starting scheduler: {e}")
     
+    def _start_leader(self):
+        """Schedule the refresh jobs and watch the data directory"""
+        self.role = 'leader'
+        # The leader alone writes the data snapshot history
+        if self.data_processor:
+            self.data_processor.records_history = True
+        
+        # Start paused so persisted jobs are visible before they are updated
+        self.scheduler.start(paused=True)
+        
+        # Schedule different update intervals for different data types
+        
+        # Interval jobs start at their adaptive cadence (30 minutes for weather,
+        # 6 hours for health and AI by default) and are rescheduled as it changes
+        
+        # Update weather data
+        self._add_job('weather_update', 'Update Weather Data', self._cadence_trigger('weather'), 'weather')
+        
+        # Health data is event driven; this poll is only a safety net
+        # for missed filesystem events and skips unchanged workbooks
+        self._add_job('health_data_update', 'Update Health Data', self._cadence_trigger('health_data'), 'health_data')
+        
+        # Generate AI analysis
+        self._add_job('ai_analysis_update', 'Update AI Analysis', self._cadence_trigger('ai_analysis'), 'ai_analysis')
+        
+        # Daily comprehensive update at 6 AM
+        self._add_job('daily_update', 'Daily Data Update', CronTrigger(hour=6, minute=0), 'daily')
+        
+        # Weekly Excel report on Monday morning, after the daily update
+        if self.weekly_reports:
+            self._add_job('weekly_report', 'Build Weekly Report', CronTrigger(day_of_week='mon', hour=7, minute=0),
+                          'weekly_report')
+        
+        self.scheduler.resume()
+        if self.data_watcher:
+            self.data_watcher.start()
+        
+        # Run refreshes requested through any worker, including those queued before a takeover
+        threading.Thread(target=self._watch_refresh_queue, name='refresh-queue', daemon=True).start()
+        
+        # Bring stale sources up to date without blocking start-up
+        threading.Thread(target=self._refresh_stale_sources, name='warm-start', daemon=True).start()
+    
+    def _start_follower(self):
+        """Only follow the state persisted by the leader, and take over if it goes away"""
+        self.role = 'follower'
+        if self.data_processor:
+            self.data_processor.records_history = False
+        
+        # Followers must not touch the shared persistent job store
+        self.scheduler = BackgroundScheduler(job_defaults={'coalesce': True, 'max_instances': 1})
+        self.scheduler.add_job(
+            func=run_scheduled_task,
+            args=['sync'],
+            trigger=IntervalTrigger(seconds=self.sync_interval),
+            id='leader_sync',
+            name='Sync From Scheduler Leader',
+            replace_existing=True
+        )
+        self.scheduler.start()
+    
+    def _sync_from_leader(self):
+        """Adopt the leader's latest state, or become the leader if its lock is free"""
+        try:
+            if self.leader_lock.try_acquire():
+                logger.info("Scheduler leader lock acquired, taking over refresh jobs")
+                self.scheduler.shutdown(wait=False)
+                self.scheduler = self._create_scheduler()
+                self._start_leader()
+                return
+            
+            self._restore_cadences()
+            if self.data_processor:
+                self.data_processor.sync_from_store()
+            if self.weather_service:
+                self.weather_service.sync_from_store()
+            if self.ai_analyzer:
+                self.ai_analyzer.sync_from_store()
+        except Exception as e:
+            logger.error(f"Error syncing from scheduler leader: {e}")
+    
     def stop(self):
         """Stop the scheduler"""
+        global _active_scheduler
         try:
             if self.is_running:
+                if self.data_watcher:
+                    self.data_watcher.stop()
                 self.scheduler.shutdown()
+                if self.leader_lock:
+                    self.leader_lock.release()
                 self.is_running = False
+                self.role = None
+                if _active_scheduler is self:
+                    _active_scheduler = None
                 logger.info("Data scheduler stopped")
         except Exception as e:
             logger.error(f"Error stopping scheduler: {e}")
@@ -80,10 +338,13 @@ class DataScheduler:
         try:
             logger.info("Updating weather data...")
             if self.weather_service:
-                weather_data = self.weather_service.get_current_weather()
+                weather_data = self.weather_service.get_current_weather(max_age=0)
                 logger.info(f"Weather data updated: {len(weather_data.get('cities', []))} cities")
+                self._observe_weather(weather_data)
+            return True
         except Exception as e:
             logger.error(f"Error updating weather data: {e}")
+            return False
     
     def _update_health_data(self):
         """Update health data"""
@@ -92,20 +353,155 @@ class DataScheduler:
             if self.data_processor:
                 self.data_processor.refresh_data()
                 logger.info("Health data updated successfully")
+                self._observe_health()
+            return True
         except Exception as e:
             logger.error(f"Error updating health data: {e}")
+            return False
+    
+    def _cadence_trigger(self, source):
+        return IntervalTrigger(seconds=self.cadences[source].interval)
+    
+    def _restore_cadences(self):
+        """Adopt the cadences persisted by the leader (or before a restart), if they changed"""
+        if self.state_store:
+            mtime = self.state_store.mtime('cadence')
+            if mtime is not None and mtime != self._cadence_mtime:
+                self._cadence_mtime = mtime
+                document = self.state_store.load('cadence')
+                for source, state in ((document or {}).get('payload') or {}).items():
+                    if source in self.cadences:
+                        self.cadences[source].restore(state)
+        self._apply_weather_cadence()
+    
+    def _apply_weather_cadence(self):
+        """Keep cached weather until the scheduled refresh replaces it.
+        
+        Requests fetch weather themselves only once the cache is older than
+        the service's TTL, so the TTL follows the weather cadence, plus one
+        sync interval for followers to adopt the leader's result.
+        """
+        if self.weather_service:
+            self.weather_service.cache_ttl = self.cadences['weather'].interval + self.sync_interval
+    
+    def _change_since_last(self, source, metrics):
+        """Relative change of a source's metrics since its previous refresh"""
+        previous = self._last_metrics.get(source)
+        self._last_metrics[source] = metrics
+        return relative_change(previous, metrics) if previous is not None else 0.0
+    
+    def _observe(self, source, change_ratio, alert_keys):
+        """Feed one refresh of a source (and its active high-priority alerts) into its cadence and reschedule its job if needed"""
+        cadence = self.cadences[source]
+        if cadence.observe(change_ratio, alert_keys) and self.is_running:
+            try:
+                self.scheduler.reschedule_job(SOURCE_JOB_IDS[source], trigger=self._cadence_trigger(source))
+            except Exception as e:
+                logger.error(f"Error rescheduling {source} job: {e}")
+        if source == 'weather':
+            self._apply_weather_cadence()
+        
+        if self.state_store:
+            self.state_store.save('cadence', {name: c.to_dict() for name, c in self.cadences.items()})
+            self._cadence_mtime = self.state_store.mtime('cadence')
+    
+    def _observe_weather(self, weather_data):
+        metrics = {}
+        for city in weather_data.get('cities', []):
+            metrics[f"{city['city']}:temperature"] = city.get('temperature', 0)
+            metrics[f"{city['city']}:humidity"] = city.get('humidity', 0)
+        alerts = self.weather_service.evaluate_alerts(weather_data)
+        alert_keys = {f"{alert['city']}:{alert['type']}" for alert in alerts if alert['severity'] == 'high'}
+        self._observe('weather', self._change_since_last('weather', metrics), alert_keys)
+    
+    def _observe_health(self):
+        data = self.data_processor.get_current_data()
+        metrics = {f"national:{disease}": cases for disease, cases in data.get('national_summary', {}).items()}
+        table = self.data_processor.get_location_table()
+        for i, cases in enumerate(table.cases.tolist()):
+            metrics[f"district:{table.label(i)}"] = cases
+        # An alert is named by its message up to the colon; the counts after it change every report
+        alert_keys = {alert.get('message', '').split(':')[0] for alert in data.get('alerts', [])
+                      if alert.get('priority') == 'high'}
+        self._observe('health_data', self._change_since_last('health_data', metrics), alert_keys)
+    
+    def _observe_ai(self, data_version):
+        # AI output follows the health data, so its "change" is a new data version
+        changed = self._last_ai_version is not None and data_version != self._last_ai_version
+        self._last_ai_version = data_version
+        # The alerts of its inputs
+        alert_keys = self.cadences['health_data'].alert_keys | self.cadences['weather'].alert_keys
+        self._observe('ai_analysis', 1.0 if changed else 0.0, alert_keys)
+    
+    def get_stale_sources(self):
+        """Names of the sources whose restored or cached state is out of date"""
+        stale = []
+        if self.weather_service:
+            age = self.weather_service.cache_age
+            if self.weather_service.api_key and (age is None or age >= self.weather_service.cache_ttl):
+                stale.append('weather')
+        if self.ai_analyzer and self.ai_analyzer.client and self.data_processor:
+            version = self.data_processor.data_version
+            if (self.ai_analyzer.get_cached_result('recommendations', version) is None
+                    or self.ai_analyzer.get_cached_result('scenarios', version) is None):
+                stale.append('ai_analysis')
+        return stale
+    
+    def _refresh_stale_sources(self):
+        """Refresh only the sources that are stale after a (warm) start"""
+        stale = self.get_stale_sources()
+        if not stale:
+            logger.info("All data sources are current, no start-up refresh needed")
+            return
+        logger.info(f"Refreshing stale sources: {', '.join(stale)}")
+        if 'weather' in stale:
+            self._update_weather()
+        if 'ai_analysis' in stale:
+            self._update_ai_analysis()
+    
+    def _on_workbook_changed(self, path):
+        """Ingest a workbook reported by the data directory watcher.
+        
+        Only the latest report is published; an older one (a backfill) just
+        adds its week to the surveillance history.
+        """
+        if not self.data_processor:
+            return
+        latest = self.data_processor.find_latest_workbook()
+        if latest is None or os.path.abspath(path) != os.path.abspath(latest):
+            logger.info(f"Adding older workbook {path} to the surveillance history")
+            self.data_processor.add_history_workbook(path)
+            return
+        logger.info(f"Ingesting changed workbook {path}")
+        self.data_processor.load_workbook(path)
+        self._observe_health()
     
     def _update_ai_analysis(self):
         """Update AI analysis"""
         try:
             logger.info("Updating AI analysis...")
             if self.ai_analyzer and self.data_processor:
-                current_data = self.data_processor.get_current_data()
-                recommendations = self.ai_analyzer.generate_recommendations(current_data)
-                scenarios = self.ai_analyzer.simulate_scenarios(current_data)
+                # Generated once per data version; an unchanged version is a cache hit
+                snapshot = self.data_processor.get_snapshot()
+                self.ai_analyzer.generate_recommendations(snapshot.data, data_version=snapshot.version)
+                self.ai_analyzer.simulate_scenarios(snapshot.data, data_version=snapshot.version)
                 logger.info("AI analysis updated successfully")
+                self._observe_ai(snapshot.version)
+            return True
         except Exception as e:
             logger.error(f"Error updating AI analysis: {e}")
+            return False
+    
+    def _build_weekly_report(self):
+        """Build the weekly Excel report of the current data version"""
+        try:
+            if self.weekly_reports:
+                path = self.weekly_reports.build()
+                logger.info(f"Weekly report ready at {path}" if path else "Weekly report build failed")
+            return True
+        except Exception as e:
+            logger.error(f"Error building weekly report: {e}")
+            return False
     
     def update_all_data(self):
         """Update all data sources"""
@@ -122,6 +518,146 @@ class DataScheduler:
         except Exception as e:
             logger.error(f"Error during comprehensive update: {e}")
     
+    def _update_jobs(self, update):
+        """Apply ``update`` to the {job_id: job dict} mapping shared by all workers; returns the new mapping"""
+        def apply(payload):
+            jobs = dict((payload or {}).get('jobs') or {})
+            update(jobs)
+            # Oldest first; keep the most recent ones
+            for job_id in list(jobs)[:max(0, len(jobs) - self.max_job_history)]:
+                del jobs[job_id]
+            return {'jobs': jobs}
+        
+        if self.state_store:
+            return self.state_store.update(REFRESH_JOBS_SECTION, apply)['jobs']
+        with self._jobs_lock:
+            self._local_jobs = apply({'jobs': self._local_jobs})['jobs']
+            return self._local_jobs
+    
+    def _load_jobs(self):
+        if not self.state_store:
+            return self._local_jobs
+        document = self.state_store.load(REFRESH_JOBS_SECTION)
+        return ((document or {}).get('payload') or {}).get('jobs') or {}
+    
+    def request_refresh(self, trigger='manual'):
+        """Queue a comprehensive refresh, to be run in the background by the scheduler leader.
+        
+        Returns ``(job, created)`` with the job's status dict. While a refresh
+        is queued or running in any worker, new requests coalesce onto it
+        instead of starting another one.
+        """
+        result = {}
+        
+        def enqueue(jobs):
+            for job_id, document in jobs.items():
+                job = RefreshJob.from_dict(document)
+                if job.is_abandoned:
+                    job.status = 'failed'
+                    job.finished_at = datetime.now().isoformat()
+                    jobs[job_id] = job.to_dict()
+                elif job.is_active:
+                    document['coalesced_requests'] = document.get('coalesced_requests', 0) + 1
+                    result['job'], result['created'] = document, False
+                    return
+            job = RefreshJob(trigger=trigger)
+            jobs[job.id] = job.to_dict()
+            result['job'], result['created'] = jobs[job.id], True
+        
+        self._update_jobs(enqueue)
+        job = result['job']
+        if result['created']:
+            logger.info(f"Refresh job {job['job_id']} queued ({trigger})")
+            if self.role == 'leader' or self.leader_lock is None:
+                self._start_runner()
+        return job, result['created']
+    
+    def get_refresh_job(self, job_id):
+        """Get the status of a refresh job queued through any worker, or None if unknown"""
+        job = self._load_jobs().get(job_id)
+        return dict(job) if job else None
+    
+    def _watch_refresh_queue(self):
+        """Leader only: start a runner whenever the shared jobs change, and record versions other workers publish"""
+        last_mtime = None
+        while self.role == 'leader':
+            mtime = self.state_store.mtime(REFRESH_JOBS_SECTION) if self.state_store else None
+            if mtime is None or mtime != last_mtime:
+                last_mtime = mtime
+                if any(job['status'] == 'queued' for job in self._load_jobs().values()):
+                    self._start_runner()
+            if self.data_processor:
+                try:
+                    self.data_processor.record_stored_snapshot()
+                except Exception as e:
+                    logger.error(f"Error recording a stored data snapshot in history: {e}")
+            time.sleep(REFRESH_QUEUE_POLL_SECONDS)
+    
+    def _start_runner(self):
+        if not self._runner_lock.acquire(blocking=False):
+            return
+        
+        def run():
+            try:
+                while self._run_next_job():
+                    pass
+            finally:
+                self._runner_lock.release()
+        
+        threading.Thread(target=run, name='refresh-runner', daemon=True).start()
+    
+    def _run_next_job(self):
+        """Claim the oldest queued job and run it; False if none was queued"""
+        claimed = {}
+        
+        def claim(jobs):
+            for job_id, document in jobs.items():
+                if document['status'] == 'queued':
+                    job = RefreshJob.from_dict(document)
+                    job.status = 'running'
+                    job.started_at = job.updated_at = datetime.now().isoformat()
+                    jobs[job_id] = job.to_dict()
+                    claimed['job'] = job
+                    return
+        
+        self._update_jobs(claim)
+        job = claimed.get('job')
+        if job is None:
+            return False
+        self._run_refresh_job(job)
+        return True
+    
+    def _save_job(self, job):
+        """Write a running job's progress to the shared jobs, keeping requests coalesced onto it meanwhile"""
+        job.updated_at = datetime.now().isoformat()
+        
+        def save(jobs):
+            coalesced = (jobs.get(job.id) or {}).get('coalesced_requests', 0)
+            jobs[job.id] = dict(job.to_dict(), coalesced_requests=coalesced)
+        
+        self._update_jobs(save)
+    
+    def _run_refresh_job(self, job):
+        """Execute a refresh job stage by stage"""
+        stage_funcs = {
+            'health_data': self._update_health_data,
+            'weather': self._update_weather,
+            'ai_analysis': self._update_ai_analysis
+        }
+        logger.info(f"Refresh job {job.id} started ({job.trigger})")
+        try:
+            for stage in REFRESH_STAGES:
+                job.run_stage(stage, stage_funcs[stage], on_update=lambda: self._save_job(job))
+            failed = [stage for stage, info in job.stages.items() if info['status'] == 'failed']
+            job.status = 'failed' if failed else 'completed'
+        except Exception as e:
+            logger.error(f"Refresh job {job.id} failed: {e}")
+            job.status = 'failed'
+        finally:
+            job.finished_at = datetime.now().isoformat()
+            self._save_job(job)
+            logger.info(f"Refresh job {job.id} {job.status}")
+    
     def get_scheduler_status(self):
         """Get scheduler status"""
         try:
@@ -134,9 +670,17 @@ class DataScheduler:
                     'trigger': str(job.trigger)
                 })
             
+            # The latest job of any worker, so followers report the leader's refresh too
+            recent_jobs = list(self._load_jobs().values())
+            active_job = recent_jobs[-1] if recent_jobs else None
             return {
                 'running': self.is_running,
+                'role': self.role,
                 'jobs': jobs,
+                'refresh_job': active_job,
+                'data_watcher': self.data_watcher.get_status() if self.data_watcher else None,
+                'last_refreshed': self.state_store.get_status() if self.state_store else None,
+                'cadence': {source: cadence.to_dict() for source, cadence in self.cadences.items()},
                 'status': 'active' if self.is_running else 'stopped'
             }
             
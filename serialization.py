@@ -0,0 +1,126 @@
+import gzip
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from flask import Response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+
+def _default(value):
+    """Convert NumPy scalars/arrays and other non-JSON values"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode ``obj`` as compact UTF-8 JSON, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def preferred_encoding(accept_encodings) -> Optional[str]:
+    """Best content coding we can produce for a request's Accept-Encoding"""
+    if brotli is not None and accept_encodings.quality('br') > 0:
+        return 'br'
+    if accept_encodings.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+class Payload:
+    """One encoded JSON body, with its compressed forms built on first demand"""
+
+    __slots__ = ('body', 'etag', '_encoded', '_lock')
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        """Body compressed with ``encoding`` ('gzip' or 'br'); compressed only once"""
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    if encoding == 'br':
+                        data = brotli.compress(self.body, quality=5)
+                    else:
+                        data = gzip.compress(self.body, compresslevel=6, mtime=0)
+                    self._encoded[encoding] = data
+        return data
+
+    def to_response(self, request, status: int = 200, mimetype: str = 'application/json') -> Response:
+        """Response for ``request``, compressed when the client accepts it"""
+        # Weak ETags, since the same version is served in several content codings
+        if self.etag and status == 200 and request.if_none_match.contains_weak(self.etag):
+            response = Response(status=304)
+            response.set_etag(self.etag, weak=True)
+            response.vary.add('Accept-Encoding')
+            return response
+
+        body = self.body
+        encoding = None
+        if len(body) >= MIN_COMPRESS_BYTES:
+            encoding = preferred_encoding(request.accept_encodings)
+            if encoding:
+                body = self.encoded(encoding)
+
+        response = Response(body, status=status, mimetype=mimetype)
+        response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if self.etag:
+            response.set_etag(self.etag, weak=True)
+        return response
+
+
+class PayloadCache:
+    """Encoded payloads per endpoint, valid for one data version.
+
+    Only the latest version of each payload is kept, so memory stays at one
+    body (plus its compressed forms) per endpoint.
+    """
+
+    def __init__(self):
+        self._payloads: Dict[str, tuple] = {}
+
+    def get_or_build(self, name: str, version: Any, build: Callable[[], Any]) -> Payload:
+        """Payload of ``name`` at ``version``, encoding ``build()`` only on a miss"""
+        cached = self._payloads.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        payload = Payload(dumps(build()), etag=f"{name}-v{version}")
+        self._payloads[name] = (version, payload)
+        return payload
+
+    def clear(self):
+        self._payloads = {}
+
+
+def json_response(obj: Any, request, status: int = 200) -> Response:
+    """Encode and (if accepted) compress a one-off payload"""
+    return Payload(dumps(obj)).to_response(request, status=status)
@@ -0,0 +1,224 @@
+import gc
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyService:
+    """Builds a service on first use, exactly once.
+
+    Factories import their (heavy) modules themselves, so nothing beyond
+    this module is imported until a service is actually needed. A factory
+    that fails leaves the service as None, which the endpoints already
+    treat as "not available".
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._instance = None
+        self._built = False
+        self.error = None
+        self.build_seconds = None
+
+    @property
+    def is_built(self) -> bool:
+        return self._built
+
+    def get(self) -> Optional[Any]:
+        """The service instance, building it on first call"""
+        if self._built:
+            return self._instance
+        with self._lock:
+            if not self._built:
+                start = time.perf_counter()
+                try:
+                    self._instance = self._factory()
+                except Exception as e:
+                    logger.error(f"Failed to initialize {self.name}: {e}")
+                    self.error = str(e)
+                    self._instance = None
+                self.build_seconds = round(time.perf_counter() - start, 3)
+                self._built = True
+                logger.info(f"Initialized {self.name} in {self.build_seconds}s")
+        return self._instance
+
+    def get_if_built(self) -> Optional[Any]:
+        """The service instance if it is already built, without building it"""
+        return self._instance if self._built else None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'built': self._built,
+            'available': self._instance is not None,
+            'build_seconds': self.build_seconds,
+            'error': self.error
+        }
+
+
+def _create_state_store():
+    from state_store import StateStore
+    return StateStore()
+
+
+def _create_database():
+    from database import HealthDatabase
+    return HealthDatabase()
+
+
+def _create_snapshot_history():
+    from snapshot_history import SnapshotHistory
+    store = state_store.get()
+    return SnapshotHistory(os.path.join(store.state_dir, 'history')) if store else None
+
+
+def _create_data_processor():
+    from data_processor import HealthDataProcessor
+    return HealthDataProcessor(state_store=state_store.get(), database=database.get(),
+                               history=snapshot_history.get())
+
+
+def _create_ai_analyzer():
+    from ai_analysis import AIAnalyzer
+    return AIAnalyzer(state_store=state_store.get())
+
+
+def _create_weather_service():
+    from weather_service import WeatherService
+    return WeatherService(state_store=state_store.get(), database=database.get())
+
+
+def _create_event_broker():
+    from events import EventBroker, stream_limit
+    max_streams = stream_limit(worker_threads) if worker_threads else None
+    return EventBroker(data_versions, max_streams=max_streams)
+
+
+def _create_map_tiles():
+    from map_tiles import MapTiles
+    store = state_store.get()
+    spill_dir = os.path.join(store.state_dir, 'tiles', str(os.getpid())) if store else None
+    return MapTiles(spill_dir=spill_dir)
+
+
+def _create_boundaries():
+    from district_boundaries import DistrictBoundaries
+    return DistrictBoundaries(state_store=state_store.get())
+
+
+def _create_exporter():
+    from data_export import DataExporter
+    store = state_store.get()
+    spool_dir = os.path.join(store.state_dir, 'exports', str(os.getpid())) if store else None
+    return DataExporter(data_processor.get(), database=database.get(), spool_dir=spool_dir)
+
+
+def _create_weekly_reports():
+    from weekly_report import WeeklyReports
+    store = state_store.get()
+    report_dir = os.path.join(store.state_dir, 'reports') if store else 'reports'
+    return WeeklyReports(data_processor.get(), ai_analyzer=ai_analyzer.get(), report_dir=report_dir)
+
+
+def _create_scheduler():
+    from scheduler import DataScheduler
+    data_scheduler = DataScheduler(data_processor.get(), ai_analyzer.get(), weather_service.get(),
+                                   state_store=state_store.get(), weekly_reports=weekly_reports.get())
+    data_scheduler.start()
+    return data_scheduler
+
+
+state_store = LazyService('state_store', _create_state_store)
+database = LazyService('database', _create_database)
+snapshot_history = LazyService('snapshot_history', _create_snapshot_history)
+data_processor = LazyService('data_processor', _create_data_processor)
+ai_analyzer = LazyService('ai_analyzer', _create_ai_analyzer)
+weather_service = LazyService('weather_service', _create_weather_service)
+boundaries = LazyService('boundaries', _create_boundaries)
+weekly_reports = LazyService('weekly_reports', _create_weekly_reports)
+scheduler = LazyService('scheduler', _create_scheduler)
+# Not warmed up: the broker only starts with the first event stream
+event_broker = LazyService('event_broker', _create_event_broker)
+# Not warmed up: built with the first map tile request, in the worker serving it
+map_tiles = LazyService('map_tiles', _create_map_tiles)
+# Not warmed up: built with the first export request
+exporter = LazyService('exporter', _create_exporter)
+
+# Warm-up order: the scheduler goes last since it needs every other service
+ALL_SERVICES = (state_store, database, snapshot_history, data_processor, weather_service, ai_analyzer, boundaries, scheduler)
+
+# Request threads of this gunicorn worker (set by gunicorn.conf.py); None outside gunicorn
+worker_threads = None
+
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+_ready = threading.Event()
+_started_at = time.time()
+
+
+def warm_up():
+    """Build every service (loading data and caches) in the calling thread"""
+    start = time.perf_counter()
+    for service in ALL_SERVICES:
+        service.get()
+    _ready.set()
+    logger.info(f"Services warmed up in {time.perf_counter() - start:.2f}s")
+
+
+def preload():
+    """Parse and freeze the health data in the gunicorn master before it forks.
+    
+    Only fork-safe services are built here (no threads, no HTTP clients).
+    The frozen snapshot and everything imported so far are moved out of the
+    garbage collector's reach, so workers share those pages copy-on-write.
+    """
+    start = time.perf_counter()
+    processor = data_processor.get()
+    if processor is not None:
+        processor.freeze()
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Preloaded data for workers in {time.perf_counter() - start:.2f}s "
+                f"({gc.get_freeze_count()} objects frozen)")
+
+
+def start_warm_up():
+    """Warm up services in a background thread; safe to call repeatedly"""
+    global _warm_up_thread
+    if _warm_up_thread is not None or _ready.is_set():
+        return
+    with _warm_up_lock:
+        if _warm_up_thread is None and not _ready.is_set():
+            _warm_up_thread = threading.Thread(target=warm_up, name='service-warm-up', daemon=True)
+            _warm_up_thread.start()
+
+
+def is_ready() -> bool:
+    """True once every service is built and data and caches are loaded"""
+    return _ready.is_set()
+
+
+def data_versions() -> Dict[str, Any]:
+    """Current version of every data source, without building any service"""
+    processor = data_processor.get_if_built()
+    weather = weather_service.get_if_built()
+    return {
+        'health': processor.data_version if processor else None,
+        'weather': weather.data_version if weather else None
+    }
+
+
+def get_status() -> Dict[str, Any]:
+    """Readiness details for every service"""
+    from district_names import district_index
+    return {
+        'ready': is_ready(),
+        'uptime_seconds': round(time.time() - _started_at, 1),
+        'services': {service.name: service.get_status() for service in ALL_SERVICES},
+        'district_names': district_index.get_status()
+    }
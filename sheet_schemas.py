@@ -0,0 +1,271 @@
+import re
+import time
+import random
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from district_names import district_index
+from location_table import LocationTable
+from surveillance_cube import (cell_value, clean_label, dimension_key, district_table_records,
+                               national_table_records, province_key)
+
+logger = logging.getLogger(__name__)
+
+# Cell markers read as "no value" (not reported / not applicable), as typed in the reports
+NA_VALUES = ['NR', 'NR ', '-', '- ']
+
+# Approximate centre of each province, for placing its districts on the map
+PROVINCE_COORDS = {
+    'Sindh': {'base_lat': 25.8943, 'base_lng': 68.5247},
+    'Balochistan': {'base_lat': 28.3917, 'base_lng': 65.0456},
+    'KP': {'base_lat': 33.9425, 'base_lng': 71.5197},
+    'Punjab': {'base_lat': 31.1704, 'base_lng': 72.7097},
+    'AJK': {'base_lat': 33.9259, 'base_lng': 73.7810},
+    'GB': {'base_lat': 35.8026, 'base_lng': 74.9832},
+    'ICT': {'base_lat': 33.6844, 'base_lng': 73.0479}
+}
+
+PROVINCES = {province_key(name): name for name in PROVINCE_COORDS}
+
+
+def is_unnamed(column) -> bool:
+    """True for header cells that are blank (pandas names them "Unnamed: <n>")"""
+    return column is None or not str(column).strip() or str(column).startswith('Unnamed')
+
+
+def sheet_province(sheet_name: str) -> Optional[str]:
+    """Province a sheet covers, from any word of its name ("Table 4 KP" -> "KP")"""
+    words = re.split(r'\s+', sheet_name.strip())
+    # Longest run of words first, so "Khyber Pakhtunkhwa" wins over a single word
+    for size in range(len(words), 0, -1):
+        for start in range(len(words) - size + 1):
+            key = province_key(' '.join(words[start:start + size]))
+            if key in PROVINCES:
+                return PROVINCES[key]
+    return None
+
+
+def district_coordinates(district: str, province: str) -> Tuple[float, float]:
+    """Approximate (lat, lng) of a district, around its province's centre"""
+    coords = PROVINCE_COORDS.get(province, {'base_lat': 30.0, 'base_lng': 70.0})
+
+    # Seeded by name so a district keeps its position across refreshes (and ?since= deltas stay small)
+    district_random = random.Random(f"{province}/{district}")
+    lat_offset = district_random.uniform(-2, 2)
+    lng_offset = district_random.uniform(-2, 2)
+
+    return float(coords['base_lat'] + lat_offset), float(coords['base_lng'] + lng_offset)
+
+
+class ReportBuilder:
+    """Snapshot data and surveillance records accumulated from one workbook's sheets"""
+
+    def __init__(self):
+        self.data = {
+            'last_updated': datetime.now().isoformat(),
+            'dashboard_stats': {},
+            'disease_trends': {},
+            'alerts': [],
+            'national_summary': {},
+            'confirmed_cases': []
+        }
+        self.week_records = {'national': [], 'province': [], 'district': []}
+        # (district, province, lat, lng, cases) rows of the map's location table
+        self.locations: List[tuple] = []
+        self.sheets: List[Dict[str, Any]] = []
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.week_records['national'] and not self.week_records['district']
+
+    def build(self) -> Dict[str, Any]:
+        """The snapshot data, with the map locations packed into a LocationTable"""
+        self.data['map_data'] = LocationTable.from_rows(self.locations)
+        return self.data
+
+
+def process_national_summary(builder: ReportBuilder, sheet_name: str, columns: List[str], rows: Iterable[tuple]):
+    """National table: one row per disease, one column per province plus the national total"""
+    records = national_table_records(columns, rows)
+    builder.week_records['national'].extend(records['national'])
+    builder.week_records['province'].extend(records['province'])
+    builder.data['national_summary'].update(
+        {disease.lower(): int(cases) for disease, cases in records['national']}
+    )
+
+
+def process_district_table(builder: ReportBuilder, sheet_name: str, columns: List[str], rows: Iterable[tuple]):
+    """Province table: one row per district, one column per disease"""
+    province = sheet_province(sheet_name)
+    if province is None:
+        logger.warning(f"Sheet '{sheet_name}' has district rows but no known province in its name, skipping")
+        return
+    # Canonical district names, so every week and sheet spells a district the same way
+    records = []
+    for record in district_table_records(columns, rows, province):
+        district_id = district_index.resolve(record[1], province)
+        if district_id is None:
+            # Province total and lab rows
+            continue
+        record[1] = district_index.name(district_id)
+        records.append(record)
+    builder.week_records['district'].extend(records)
+
+    # The map shows malaria cases per district
+    malaria = {}
+    for _, district, disease, cases in records:
+        malaria.setdefault(district, 0)
+        if dimension_key(disease) == 'malaria':
+            malaria[district] = int(cases)
+    builder.locations.extend((district, province, *district_coordinates(district, province), cases)
+                             for district, cases in malaria.items())
+
+
+def process_confirmed_cases(builder: ReportBuilder, sheet_name: str, columns: List[str], rows: Iterable[tuple]):
+    """Lab confirmation table: per province a (tested, positive) column pair for each disease.
+
+    Some diseases have separate rows for SARI and ILI samples, marked in the
+    second column ("Out of SARI" / "Out of ILI", the latter wrapped over two rows).
+    """
+    provinces = [(i, PROVINCES.get(province_key(name), clean_label(name))) for i, name in enumerate(columns)
+                 if i >= 2 and not is_unnamed(name) and i + 1 < len(columns)]
+    disease = None
+    for row in rows:
+        label, qualifier = row[0], row[1]
+        if isinstance(label, str) and label.strip():
+            disease = clean_label(label)
+        if disease is None:
+            continue
+        name = disease
+        if isinstance(qualifier, str) and qualifier.strip():
+            name = f"{disease} ({'SARI' if 'SARI' in qualifier else 'ILI'})"
+        for i, province in provinces:
+            tested, positive = cell_value(row[i]), cell_value(row[i + 1])
+            if tested is None and positive is None:
+                continue
+            builder.data['confirmed_cases'].append({
+                'disease': name,
+                'province': province,
+                'tested': int(tested or 0),
+                'positive': int(positive or 0)
+            })
+
+
+class SheetSchema:
+    """A registered sheet type: how to recognise its header, what to read and how to process it.
+
+    ``matches`` receives the header's normalized keys (blank headers as '').
+    With ``prune`` only labelled columns are read; ``value_dtype`` is the
+    dtype of every value column (None to leave mixed columns as objects).
+    """
+
+    def __init__(self, name: str, matches: Callable[[Tuple[str, ...]], bool],
+                 process: Callable[[ReportBuilder, str, List[str], Iterable[tuple]], None],
+                 value_dtype: Optional[str] = 'float64', prune: bool = True):
+        self.name = name
+        self.matches = matches
+        self.process = process
+        self.value_dtype = value_dtype
+        self.prune = prune
+
+
+class CompiledSheet:
+    """A schema bound to one concrete header: the column indexes to read and their dtypes"""
+
+    __slots__ = ('schema', 'usecols', 'columns', 'dtype')
+
+    def __init__(self, schema: SheetSchema, header: List[Any]):
+        self.schema = schema
+        if schema.prune:
+            self.usecols = [i for i, column in enumerate(header) if i == 0 or not is_unnamed(column)]
+        else:
+            self.usecols = list(range(len(header)))
+        self.columns = [header[i] for i in self.usecols]
+        self.dtype = None
+        if schema.value_dtype:
+            self.dtype = {header[i]: schema.value_dtype for i in self.usecols[1:]}
+            self.dtype[header[0]] = 'object'
+
+
+class SchemaRegistry:
+    """Maps sheet headers to registered sheet schemas.
+
+    Each distinct header is fingerprinted and matched once; later sheets
+    (and later workbooks) with the same header reuse the compiled result.
+    New sheet types are added with ``register`` - the loading loop stays
+    unchanged.
+    """
+
+    def __init__(self):
+        self._schemas: List[SheetSchema] = []
+        self._compiled: Dict[Tuple, Optional[CompiledSheet]] = {}
+
+    def register(self, schema: SheetSchema) -> SheetSchema:
+        self._schemas.append(schema)
+        self._compiled.clear()
+        return schema
+
+    def compile(self, header: List[Any]) -> Optional[CompiledSheet]:
+        """Compiled schema for a header, or None if no registered schema matches"""
+        fingerprint = tuple('' if is_unnamed(column) else str(column) for column in header)
+        if fingerprint in self._compiled:
+            return self._compiled[fingerprint]
+        keys = tuple('' if is_unnamed(column) else dimension_key(column) for column in header)
+        compiled = None
+        for schema in self._schemas:
+            if keys and schema.matches(keys):
+                compiled = CompiledSheet(schema, list(header))
+                break
+        self._compiled[fingerprint] = compiled
+        return compiled
+
+    def process_sheet(self, builder: ReportBuilder, sheet_name: str, compiled: CompiledSheet,
+                      rows: Iterable[tuple]) -> Dict[str, Any]:
+        """Run a sheet's processor over its rows (restricted to ``compiled.usecols``) and record stats"""
+        start = time.perf_counter()
+        counted = _CountingRows(rows)
+        compiled.schema.process(builder, sheet_name, compiled.columns, counted)
+        stats = {
+            'name': sheet_name,
+            'kind': compiled.schema.name,
+            'rows': counted.count,
+            'columns': len(compiled.columns),
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+        builder.sheets.append(stats)
+        return stats
+
+
+class _CountingRows:
+    """Row iterator wrapper that counts the rows read through it"""
+
+    def __init__(self, rows: Iterable[tuple]):
+        self._rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self._rows:
+            self.count += 1
+            yield row
+
+
+registry = SchemaRegistry()
+
+registry.register(SheetSchema(
+    'national_summary',
+    lambda keys: keys[0] == 'diseases' and 'total' in keys,
+    process_national_summary
+))
+registry.register(SheetSchema(
+    'confirmed_cases',
+    lambda keys: keys[0] == 'diseases' and sum(1 for key in keys if province_key(key) in PROVINCES) >= 2,
+    process_confirmed_cases,
+    value_dtype=None,
+    prune=False
+))
+registry.register(SheetSchema(
+    'district_table',
+    lambda keys: keys[0] == 'districts',
+    process_district_table
+))
@@ -0,0 +1,103 @@
+import json
+import logging
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class DataSnapshot:
+    """Immutable, versioned view of processed health data.
+
+    A snapshot is built completely off to the side and then published with a
+    single reference assignment, so readers never observe a half-built
+    structure and never need a lock. The ``version`` is allocated by the
+    publisher (the state store, shared by every worker) and is the cache
+    key for anything derived from the snapshot's data.
+    """
+
+    __slots__ = ('version', 'data', 'source', 'created_at')
+
+    def __init__(self, data: Dict[str, Any], source: str = 'excel', *, version: int):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'data', data)
+        object.__setattr__(self, 'source', source)
+        object.__setattr__(self, 'created_at', datetime.now().isoformat())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DataSnapshot is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("DataSnapshot is immutable")
+
+    def __repr__(self):
+        return f"DataSnapshot(version={self.version}, source={self.source!r})"
+
+    def get(self, key: str, default=None):
+        """Shortcut for ``snapshot.data.get``"""
+        return self.data.get(key, default)
+
+    @property
+    def is_frozen(self) -> bool:
+        return isinstance(self.data, FrozenData)
+
+    def frozen(self) -> 'DataSnapshot':
+        """Same version, with the data packed into a FrozenData"""
+        if self.is_frozen:
+            return self
+        return DataSnapshot(FrozenData(self.data), source=self.source, version=self.version)
+
+
+def _json_default(value):
+    # Columnar tables (LocationTable)
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    # NumPy scalars and arrays from the pandas pipeline
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+def encode_section(value: Any) -> bytes:
+    """Compact JSON encoding of one section of snapshot data"""
+    return json.dumps(value, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+
+class FrozenData(Mapping):
+    """Read-only snapshot data stored as one JSON-encoded bytes object per section.
+
+    Lists of dicts are thousands of small Python objects; touching any of
+    them from a forked worker updates a refcount and copies the page. A
+    handful of bytes objects keeps the payload in pages that workers only
+    ever read, so data parsed in the gunicorn master stays shared
+    copy-on-write. Sections are decoded into fresh objects on access.
+    """
+
+    __slots__ = ('_sections',)
+
+    def __init__(self, data: Dict[str, Any]):
+        self._sections = {key: encode_section(value) for key, value in data.items()}
+
+    def __getitem__(self, key):
+        return json.loads(self._sections[key])
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the encoded sections"""
+        return sum(len(section) for section in self._sections.values())
+
+    def thaw(self) -> Dict[str, Any]:
+        """Decode every section into a plain dict"""
+        return {key: self[key] for key in self._sections}
+
+
+def empty_snapshot() -> DataSnapshot:
+    """Version-0 placeholder served before the first real snapshot is published"""
+    return DataSnapshot({}, source='empty', version=0)
@@ -0,0 +1,285 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from snapshot import DataSnapshot, encode_section
+
+logger = logging.getLogger(__name__)
+
+# Mappings whose encoding is larger than this are stored child by child, so a
+# new version shares every child that did not change (e.g. each week of the
+# surveillance history); smaller values are stored whole
+SPLIT_BYTES = 16 * 1024
+
+# Objects written or reused this recently are never garbage-collected, so a
+# version that another process is still recording keeps every object it uses
+GC_GRACE_SECONDS = 3600
+
+# A section as stored: an object digest, or {key: node} for a split mapping
+Node = Union[str, Dict[str, Any]]
+
+
+def _write_atomic(path: str, data: bytes):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def _digests(node: Node, into: set):
+    if isinstance(node, str):
+        into.add(node)
+    else:
+        for child in node.values():
+            _digests(child, into)
+
+
+class HistoricalData(Mapping):
+    """Sections of a recorded version, decoded from the shared object store on access"""
+
+    __slots__ = ('_history', '_sections')
+
+    def __init__(self, history: 'SnapshotHistory', sections: Dict[str, Node]):
+        self._history = history
+        self._sections = sections
+
+    def __getitem__(self, key):
+        return self._history.decode(self._sections[key])
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+
+class SnapshotHistory:
+    """Every published health data version, kept on disk with structural sharing.
+
+    A version is a small manifest naming, for each section of its data, the
+    content-addressed objects that hold it. Sections that did not change
+    between versions, and the unchanged children of large mappings such as
+    the weeks of the surveillance history, are stored once and shared by
+    every version, so an extra version costs only what changed. The store
+    lives under ``history_dir`` and is shared by all processes; objects are
+    read back through an in-memory cache of at most ``cache_bytes``.
+
+    Recording a version drops those older than ``max_days`` or beyond the
+    latest ``max_versions`` (never the latest one), and then every object
+    that no remaining version references.
+    """
+
+    def __init__(self, history_dir: str, max_versions: Optional[int] = None, max_days: Optional[float] = None,
+                 cache_bytes: Optional[int] = None):
+        self.history_dir = history_dir
+        self.objects_dir = os.path.join(history_dir, 'objects')
+        self.versions_dir = os.path.join(history_dir, 'versions')
+        self.max_versions = max_versions or int(os.environ.get("SNAPSHOT_HISTORY_VERSIONS", "500"))
+        self.max_days = max_days or float(os.environ.get("SNAPSHOT_HISTORY_DAYS", "365"))
+        self.cache_bytes = cache_bytes or int(os.environ.get("SNAPSHOT_HISTORY_CACHE_MB", "32")) * 1024 * 1024
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.versions_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._cache_size = 0
+        # version -> published_at, for every manifest seen in versions_dir
+        self._index: Dict[int, datetime] = {}
+        self._index_mtime = None
+
+    def _manifest_path(self, version: int) -> str:
+        return os.path.join(self.versions_dir, f"{version}.json")
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.json")
+
+    def record(self, snapshot: DataSnapshot) -> Optional[Dict[str, Any]]:
+        """Store ``snapshot`` as a version, unless it is already stored.
+
+        Returns how many bytes the version added and how many it shares
+        with stored versions, or None if nothing was recorded.
+        """
+        if snapshot.version <= 0 or os.path.exists(self._manifest_path(snapshot.version)):
+            return None
+        stats = {'version': snapshot.version, 'new_objects': 0, 'new_bytes': 0, 'shared_bytes': 0}
+        sections = {str(key): self._store(snapshot.data[key], stats) for key in snapshot.data}
+        manifest = {
+            'version': snapshot.version,
+            'source': snapshot.source,
+            'published_at': snapshot.created_at,
+            'sections': sections
+        }
+        _write_atomic(self._manifest_path(snapshot.version), encode_section(manifest))
+        logger.info(f"Recorded data snapshot v{snapshot.version} in history: {stats['new_bytes']} new bytes, "
+                    f"{stats['shared_bytes']} shared with earlier versions")
+        self.collect_garbage()
+        return stats
+
+    def _store(self, value: Any, stats: Dict[str, int]) -> Node:
+        encoded = encode_section(value)
+        if isinstance(value, Mapping) and value and len(encoded) > SPLIT_BYTES:
+            return {str(key): self._store(child, stats) for key, child in value.items()}
+
+        digest = hashlib.blake2b(encoded, digest_size=16).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            # Refresh the mtime so a concurrent garbage collection keeps it
+            os.utime(path)
+            stats['shared_bytes'] += len(encoded)
+        else:
+            _write_atomic(path, encoded)
+            stats['new_objects'] += 1
+            stats['new_bytes'] += len(encoded)
+        return digest
+
+    def _object(self, digest: str) -> bytes:
+        with self._lock:
+            data = self._cache.get(digest)
+            if data is not None:
+                self._cache.move_to_end(digest)
+                return data
+        with open(self._object_path(digest), 'rb') as f:
+            data = f.read()
+        with self._lock:
+            if digest not in self._cache:
+                self._cache[digest] = data
+                self._cache_size += len(data)
+                while self._cache_size > self.cache_bytes and len(self._cache) > 1:
+                    self._cache_size -= len(self._cache.popitem(last=False)[1])
+        return data
+
+    def decode(self, node: Node) -> Any:
+        """Value of a stored section (or part of one)"""
+        if isinstance(node, str):
+            return json.loads(self._object(node))
+        return {key: self.decode(child) for key, child in node.items()}
+
+    def versions(self) -> List[Tuple[int, datetime]]:
+        """(version, published_at) of every stored version, oldest first"""
+        with self._lock:
+            mtime = os.stat(self.versions_dir).st_mtime_ns
+            if mtime != self._index_mtime:
+                names = {name for name in os.listdir(self.versions_dir) if name.endswith('.json')}
+                index = {}
+                for name in names:
+                    version = int(name[:-len('.json')])
+                    published_at = self._index.get(version)
+                    if published_at is None:
+                        try:
+                            with open(os.path.join(self.versions_dir, name)) as f:
+                                published_at = datetime.fromisoformat(json.load(f)['published_at'])
+                        except (OSError, ValueError, KeyError):
+                            continue
+                    index[version] = published_at
+                self._index = index
+                self._index_mtime = mtime
+            return sorted(self._index.items())
+
+    def resolve(self, as_of: str) -> int:
+        """Version in effect at ``as_of``: a version number, or an ISO date or date/time.
+
+        A version number resolves to the latest stored version not above
+        it, a time to the latest version published at or before it (a
+        date alone means the end of that day). Raises ValueError for a
+        malformed ``as_of`` and LookupError if no stored version is that old.
+        """
+        as_of = as_of.strip()
+        versions = self.versions()
+        if as_of.isdigit():
+            candidates = [version for version, _ in versions if version <= int(as_of)]
+        else:
+            try:
+                when = datetime.fromisoformat(as_of)
+            except ValueError:
+                raise ValueError("as_of must be a data version or an ISO date/time such as 2025-07-29 or 2025-07-29T08:00")
+            if when.tzinfo is not None:
+                when = when.astimezone().replace(tzinfo=None)
+            if len(as_of) == 10:
+                when = datetime.combine(when.date(), time.max)
+            candidates = [version for version, published_at in versions if published_at <= when]
+        if not candidates:
+            raise LookupError(f"No data snapshot as old as {as_of} is kept")
+        return max(candidates)
+
+    def get(self, version: int) -> DataSnapshot:
+        """The stored ``version`` as a read-only snapshot; raises LookupError if it is not stored"""
+        try:
+            with open(self._manifest_path(version)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            raise LookupError(f"Data snapshot v{version} is not kept")
+        return DataSnapshot(HistoricalData(self, manifest['sections']), source='history', version=version)
+
+    def collect_garbage(self) -> int:
+        """Apply the retention policy; returns the number of versions dropped"""
+        versions = self.versions()
+        if not versions:
+            return 0
+        cutoff = datetime.now() - timedelta(days=self.max_days)
+        keep_from = len(versions) - self.max_versions
+        expired = [version for i, (version, published_at) in enumerate(versions[:-1])
+                   if i < keep_from or published_at < cutoff]
+        if not expired:
+            return 0
+        for version in expired:
+            try:
+                os.unlink(self._manifest_path(version))
+            except OSError:
+                pass
+
+        referenced = set()
+        for version, _ in self.versions():
+            try:
+                with open(self._manifest_path(version)) as f:
+                    for node in json.load(f)['sections'].values():
+                        _digests(node, referenced)
+            except (OSError, ValueError, KeyError):
+                # Unreadable manifest - skip the sweep rather than drop objects it may use
+                return len(expired)
+
+        grace = datetime.now().timestamp() - GC_GRACE_SECONDS
+        removed = 0
+        for prefix in os.listdir(self.objects_dir):
+            directory = os.path.join(self.objects_dir, prefix)
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name[:-len('.json')] in referenced or not name.endswith('.json'):
+                    continue
+                try:
+                    if os.path.getmtime(path) < grace:
+                        os.unlink(path)
+                        removed += 1
+                except OSError:
+                    pass
+        logger.info(f"Dropped {len(expired)} data snapshot versions and {removed} unreferenced objects from history")
+        return len(expired)
+
+    def get_status(self) -> Dict[str, Any]:
+        versions = self.versions()
+        objects = disk_bytes = 0
+        for prefix in os.listdir(self.objects_dir):
+            directory = os.path.join(self.objects_dir, prefix)
+            for name in os.listdir(directory):
+                objects += 1
+                disk_bytes += os.path.getsize(os.path.join(directory, name))
+        return {
+            'versions': len(versions),
+            'oldest': {'version': versions[0][0], 'published_at': versions[0][1].isoformat()} if versions else None,
+            'latest': {'version': versions[-1][0], 'published_at': versions[-1][1].isoformat()} if versions else None,
+            'objects': objects,
+            'object_bytes': disk_bytes,
+            'cache_bytes': self._cache_size,
+            'retention': {'max_versions': self.max_versions, 'max_days': self.max_days}
+        }
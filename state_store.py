@@ -0,0 +1,223 @@
+import os
+import json
+import logging
+import tempfile
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def _json_default(value):
+    if isinstance(value, Mapping):
+        return dict(value)
+    # Columnar tables (LocationTable)
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+class StateStore:
+    """Persists the last published state of each data source to local disk.
+
+    Every section (health, weather, ai) is a small JSON document written
+    atomically, so a restarted process can serve the previous state right
+    away and only refresh the sources that are actually stale. The same
+    directory holds the SQLite job store used by the scheduler and the
+    data version counter shared by every process using the store.
+    """
+
+    def __init__(self, state_dir: Optional[str] = None):
+        self.state_dir = state_dir or os.environ.get("STATE_DIR", "state")
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    def leader_lock(self) -> 'LeaderLock':
+        """Lock used to elect the scheduler leader among processes sharing this store"""
+        return LeaderLock(os.path.join(self.state_dir, 'scheduler.lock'))
+
+    @property
+    def jobstore_url(self) -> str:
+        """SQLAlchemy URL of the persistent APScheduler job store"""
+        return f"sqlite:///{os.path.abspath(os.path.join(self.state_dir, 'jobs.sqlite'))}"
+
+    def _path(self, section: str) -> str:
+        return os.path.join(self.state_dir, f"{section}.json")
+
+    def _version_path(self, section: str) -> str:
+        return os.path.join(self.state_dir, f"{section}.version")
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize read-modify-writes of the store (versions, shared jobs) across processes"""
+        with open(os.path.join(self.state_dir, 'store.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read_int(self, path: str) -> int:
+        try:
+            with open(path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_int(self, path: str, value: int):
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, prefix='.version.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(value))
+        os.replace(tmp_path, path)
+
+    def next_version(self, floor: int = 0) -> int:
+        """Allocate a data version, unique among every process sharing this store.
+
+        Versions only grow: the result is above every version allocated
+        before and above ``floor`` (e.g. the version a process restored).
+        """
+        path = os.path.join(self.state_dir, 'version')
+        with self._exclusive():
+            version = max(self._read_int(path), floor) + 1
+            self._write_int(path, version)
+            return version
+
+    def version(self, section: str) -> Optional[int]:
+        """Version of a section saved with ``save_versioned``, without loading it; None if there is none"""
+        if not os.path.exists(self._version_path(section)):
+            return None
+        return self._read_int(self._version_path(section))
+
+    def save_versioned(self, section: str, payload: Any, version: int, **meta) -> bool:
+        """Write a section unless the store already holds a newer version of it.
+
+        Processes publishing at the same time may finish in either order;
+        this keeps the stored version from ever going backwards.
+        """
+        with self._exclusive():
+            current = self.version(section)
+            if current is not None and current > version:
+                logger.info(f"Not saving {section} v{version}: the store already has v{current}")
+                return False
+            if not self.save(section, payload, version=version, **meta):
+                return False
+            self._write_int(self._version_path(section), version)
+            return True
+
+    def update(self, section: str, update: Callable[[Any], Any]) -> Any:
+        """Replace a section's payload with ``update(payload)`` (None if unsaved), atomically across processes.
+
+        Returns the new payload.
+        """
+        with self._exclusive():
+            document = self.load(section)
+            payload = update(document.get('payload') if document else None)
+            self.save(section, payload)
+            return payload
+
+    def save(self, section: str, payload: Any, **meta) -> bool:
+        """Atomically write a section, recording when it was refreshed"""
+        try:
+            document = {
+                'section': section,
+                'saved_at': datetime.now().isoformat(),
+                'meta': meta,
+                'payload': payload
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, prefix=f".{section}.", suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(document, f, default=_json_default)
+                os.replace(tmp_path, self._path(section))
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            return True
+        except Exception as e:
+            logger.error(f"Error saving {section} state: {e}")
+            return False
+
+    def load(self, section: str) -> Optional[Dict[str, Any]]:
+        """Load a saved section document, or None if there is none"""
+        path = self._path(section)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading {section} state: {e}")
+            return None
+
+    def mtime(self, section: str) -> Optional[float]:
+        """Modification time of a saved section, or None if never saved"""
+        try:
+            return os.path.getmtime(self._path(section))
+        except OSError:
+            return None
+
+    def age_seconds(self, section: str) -> Optional[float]:
+        """Seconds since a section was last saved, or None if never saved"""
+        document = self.load(section)
+        if not document:
+            return None
+        try:
+            return (datetime.now() - datetime.fromisoformat(document['saved_at'])).total_seconds()
+        except (KeyError, ValueError):
+            return None
+
+    def get_status(self) -> Dict[str, Any]:
+        """Last refresh time of every persisted section"""
+        status = {}
+        for section in ('health', 'weather', 'ai'):
+            document = self.load(section)
+            status[section] = document.get('saved_at') if document else None
+        return status
+
+
+class LeaderLock:
+    """Non-blocking exclusive lock electing one process as the scheduler leader.
+
+    With several gunicorn workers only the holder of this lock runs the
+    refresh jobs; the others follow the state it persists. The lock is tied
+    to the open file, so it is released when the leader process exits. On
+    platforms without ``fcntl`` every process is its own leader.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    @property
+    def is_held(self) -> bool:
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """Take the lock if it is free; True if this process holds it"""
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            self._file = True
+            return True
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+        self._file = None
@@ -1,17 +1,126 @@
 // Global variables
 let diseaseChart;
 let diseaseMap;
+let caseTileLayer;
+let choroplethLayer;
+let choroplethKey = null;
 let updateInterval;
+let eventSource;
+let knownVersions = null;
+let sourceSections = {};
+
+// Last payload and data version of endpoints that support ?since= deltas
+const deltaState = {};
+
+// Loader for each dashboard section, keyed by its API endpoint name
+const SECTION_LOADERS = {
+    'dashboard-data': loadDashboardData,
+    'weather-data': loadWeatherData,
+    'weather-alerts': loadWeatherData,
+    'ai-recommendations': loadAIRecommendations,
+    'scenario-simulation': loadScenarioSimulations,
+    'alerts': loadHealthAlerts,
+    'high-risk-areas': loadHighRiskAreas,
+    'disease-surveillance': loadDiseaseSurveillance,
+    'climate-monitoring': loadClimateMonitoring,
+    'map-data': loadMapData,
+    'disease-trends': loadChartData
+};
 
 // Initialize dashboard when page loads
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Dashboard initializing...');
     initializeDashboard();
     
-    // Set up auto-refresh every 5 minutes
-    updateInterval = setInterval(refreshData, 300000);
+    // Re-fetch sections when the server announces new data
+    connectEventStream();
 });
 
+// Listen for new data versions instead of polling every section
+function connectEventStream() {
+    if (!window.EventSource) {
+        // No server-sent events support - fall back to refreshing every 5 minutes
+        updateInterval = setInterval(refreshData, 300000);
+        return;
+    }
+    
+    eventSource = new EventSource('/api/events');
+    
+    // Sent first on every (re)connect: refresh whatever changed while disconnected
+    eventSource.addEventListener('versions', function(event) {
+        const message = JSON.parse(event.data);
+        sourceSections = message.sections || sourceSections;
+        if (knownVersions) {
+            const sections = [];
+            Object.keys(message.versions).forEach(source => {
+                const version = message.versions[source];
+                if (version !== null && version !== knownVersions[source]) {
+                    sections.push(...(sourceSections[source] || []));
+                }
+            });
+            refreshSections(sections);
+        }
+        knownVersions = message.versions;
+    });
+    
+    eventSource.addEventListener('update', function(event) {
+        const message = JSON.parse(event.data);
+        console.log(`New ${message.sources.join(', ')} data available`);
+        knownVersions = message.versions;
+        refreshSections(message.sections);
+    });
+    
+    eventSource.onerror = function() {
+        // The browser reconnects by itself unless the server refused the stream
+        if (eventSource.readyState === EventSource.CLOSED) {
+            eventSource = null;
+            setTimeout(connectEventStream, 60000);
+        }
+    };
+}
+
+// Fetch an endpoint, asking only for what changed since the version we hold.
+// keyOf must match the server's key for list payloads; objects use their own keys.
+async function fetchWithDelta(endpoint, keyOf) {
+    const state = deltaState[endpoint];
+    const response = await fetch(`/api/${endpoint}?since=${state ? state.version : 0}`);
+    
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    const message = await response.json();
+    let items = {};
+    let order = [];
+    if (message.delta) {
+        items = Object.assign({}, state ? state.items : {});
+        message.removed.forEach(key => delete items[key]);
+        Object.assign(items, message.added, message.changed);
+        order = message.order || (state ? state.order : []);
+    } else if (keyOf) {
+        message.data.forEach(entry => { items[keyOf(entry)] = entry; });
+        order = message.data.map(keyOf);
+    } else {
+        items = message.data;
+    }
+    
+    deltaState[endpoint] = { version: message.version, items: items, order: order };
+    return keyOf ? order.map(key => items[key]).filter(Boolean) : items;
+}
+
+// Re-fetch only the named sections
+async function refreshSections(sections) {
+    const loaders = new Set(sections.map(section => SECTION_LOADERS[section]).filter(Boolean));
+    if (loaders.size === 0) return;
+    
+    try {
+        console.log(`Refreshing sections: ${sections.join(', ')}`);
+        await Promise.all(Array.from(loaders, loader => loader()));
+    } catch (error) {
+        console.error('Error refreshing sections:', error);
+    }
+}
+
 // Initialize all dashboard components
 function initializeDashboard() {
     loadDashboardData();
@@ -488,13 +597,7 @@ function updateScenarioSimulations(data) {
 async function loadHealthAlerts() {
     try {
         console.log('Loading health alerts...');
-        const response = await fetch('/api/alerts');
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        
-        const data = await response.json();
+        const data = await fetchWithDelta('alerts', alert => `${alert.priority}: ${alert.message}`);
         updateHealthAlerts(data);
         
     } catch (error) {
@@ -569,85 +672,171 @@ function initializeMap() {
             attribution: '© OpenStreetMap contributors'
         }).addTo(diseaseMap);
         
-        // Load map data
-        loadMapData();
+        // District markers are drawn on canvas tiles served by /tiles/{z}/{x}/{y}.geojson,
+        // in a pane above the district shading (overlay pane, z-index 400)
+        diseaseMap.createPane('caseMarkers').style.zIndex = 450;
+        caseTileLayer = createCaseTileLayer().addTo(diseaseMap);
+        diseaseMap.on('click', showCaseTilePopup);
+        
+        // District boundaries shaded by cases, when the server has boundaries loaded
+        diseaseMap.on('zoomend', loadChoropleth);
+        loadChoropleth();
         
     } catch (error) {
         console.error('Error initializing map:', error);
     }
 }
 
-// Load map data
-async function loadMapData() {
-    try {
-        const response = await fetch('/api/map-data');
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+// Risk level and marker colour for a case count
+function caseRisk(cases) {
+    if (cases > 3000) {
+        return { level: 'High', color: '#dc3545' };  // Red for high risk
+    } else if (cases > 1000) {
+        return { level: 'Medium', color: '#ffc107' };  // Yellow for medium risk
+    }
+    return { level: 'Low', color: '#28a745' };  // Green for low risk
+}
+
+// Canvas grid layer drawing the district markers of each GeoJSON tile
+function createCaseTileLayer() {
+    const CaseTileLayer = L.GridLayer.extend({
+        createTile: function(coords, done) {
+            const tile = document.createElement('canvas');
+            const size = this.getTileSize();
+            tile.width = size.x;
+            tile.height = size.y;
+            
+            // The browser revalidates with the tile's ETag; unchanged tiles come back as 304
+            fetch(`/tiles/${coords.z}/${coords.x}/${coords.y}.geojson`, { cache: 'no-cache' })
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP error! status: ${response.status}`);
+                    }
+                    return response.json();
+                })
+                .then(collection => {
+                    const origin = coords.scaleBy(size);
+                    const context = tile.getContext('2d');
+                    const points = collection.features.map(feature => {
+                        const [lng, lat] = feature.geometry.coordinates;
+                        const point = this._map.project([lat, lng], coords.z).subtract(origin);
+                        return { point: point, properties: feature.properties };
+                    });
+                    points.forEach(({ point, properties }) => {
+                        context.beginPath();
+                        context.arc(point.x, point.y, 9, 0, 2 * Math.PI);
+                        context.fillStyle = caseRisk(properties.cases).color;
+                        context.fill();
+                        context.lineWidth = 2;
+                        context.strokeStyle = '#ffffff';
+                        context.stroke();
+                    });
+                    // Kept for click hit-testing
+                    tile.casePoints = points;
+                    done(null, tile);
+                })
+                .catch(error => {
+                    console.error('Error loading map tile:', error);
+                    done(error, tile);
+                });
+            return tile;
         }
-        
-        const data = await response.json();
-        console.log(`Loading ${data.length} map locations`);
-        updateMapMarkers(data);
-        
-    } catch (error) {
-        console.error('Error loading map data:', error);
-        console.error('Error details:', error.message);
+    });
+    return new CaseTileLayer({ tileSize: 256, updateWhenZooming: false, pane: 'caseMarkers' });
+}
+
+// Popup for the district marker under a map click
+function showCaseTilePopup(event) {
+    if (!caseTileLayer) {
+        return;
+    }
+    const size = caseTileLayer.getTileSize();
+    const zoom = Math.round(diseaseMap.getZoom());
+    const pixel = diseaseMap.project(event.latlng, zoom);
+    const coords = pixel.unscaleBy(size).floor();
+    coords.z = zoom;
+    
+    const tile = caseTileLayer._tiles[caseTileLayer._tileCoordsToKey(coords)];
+    if (!tile || !tile.el.casePoints) {
+        return;
+    }
+    const local = pixel.subtract(coords.scaleBy(size));
+    let nearest = null;
+    let nearestDistance = 12;
+    tile.el.casePoints.forEach(candidate => {
+        const distance = candidate.point.distanceTo(local);
+        if (distance <= nearestDistance) {
+            nearest = candidate;
+            nearestDistance = distance;
+        }
+    });
+    if (!nearest) {
+        return;
+    }
+    
+    const location = nearest.properties;
+    const risk = caseRisk(location.cases);
+    L.popup()
+        .setLatLng(diseaseMap.unproject(coords.scaleBy(size).add(nearest.point), zoom))
+        .setContent(`
+            <strong>${location.location}</strong><br>
+            Cases: ${formatNumber(location.cases)}<br>
+            Risk Level: <span style="color: ${risk.color}; font-weight: bold;">${risk.level}</span><br>
+            Province: ${location.province}
+        `)
+        .openOn(diseaseMap);
+}
+
+// Reload the map's case tiles and district shading after a data change
+function loadMapData() {
+    if (caseTileLayer) {
+        caseTileLayer.redraw();
     }
+    loadChoropleth();
 }
 
-// Update map markers
-function updateMapMarkers(data) {
+// Fetch district shapes simplified for the current zoom and shade them by cases
+async function loadChoropleth() {
+    if (!diseaseMap) {
+        return;
+    }
     try {
-        // Check if map is initialized
-        if (!diseaseMap) {
-            console.warn('Map not initialized yet, skipping marker update');
+        const response = await fetch(`/api/choropleth?zoom=${Math.round(diseaseMap.getZoom())}`, { cache: 'no-cache' });
+        if (response.status === 404) {
+            // No boundaries file on the server - the point markers alone are shown
             return;
         }
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        // The same level and data version come back with the same ETag; skip redrawing them
+        const key = response.headers.get('ETag');
+        if (key && key === choroplethKey) {
+            return;
+        }
+        const collection = await response.json();
+        choroplethKey = key;
         
-        // Clear existing markers
-        diseaseMap.eachLayer(function(layer) {
-            if (layer instanceof L.Marker) {
-                diseaseMap.removeLayer(layer);
-            }
-        });
-        
-        // Add new markers with color-coded risk levels
-        data.forEach(location => {
-            // Determine risk level and color based on cases
-            let riskLevel = 'Low';
-            let markerColor = '#28a745'; // Green for low risk
-            
-            if (location.cases > 3000) {
-                riskLevel = 'High';
-                markerColor = '#dc3545'; // Red for high risk
-            } else if (location.cases > 1000) {
-                riskLevel = 'Medium';
-                markerColor = '#ffc107'; // Yellow for medium risk
+        if (choroplethLayer) {
+            diseaseMap.removeLayer(choroplethLayer);
+        }
+        choroplethLayer = L.geoJSON(collection, {
+            renderer: L.canvas(),
+            style: feature => ({
+                color: '#ffffff',
+                weight: 1,
+                fillColor: feature.properties.cases === null ? '#adb5bd' : caseRisk(feature.properties.cases).color,
+                fillOpacity: 0.35
+            }),
+            onEachFeature: (feature, layer) => {
+                const properties = feature.properties;
+                layer.bindTooltip(`${properties.district}${properties.province ? ', ' + properties.province : ''}: ` +
+                    (properties.cases === null ? 'no data' : `${formatNumber(properties.cases)} cases`));
             }
-            
-            // Create custom colored marker
-            const customIcon = L.divIcon({
-                className: 'custom-marker',
-                html: `<div style="background-color: ${markerColor}; width: 20px; height: 20px; border-radius: 50%; border: 2px solid white; box-shadow: 0 2px 4px rgba(0,0,0,0.3);"></div>`,
-                iconSize: [20, 20],
-                iconAnchor: [10, 10]
-            });
-            
-            const marker = L.marker([location.lat, location.lng], { icon: customIcon })
-                .addTo(diseaseMap)
-                .bindPopup(`
-                    <strong>${location.location}</strong><br>
-                    Cases: ${formatNumber(location.cases)}<br>
-                    Risk Level: <span style="color: ${markerColor}; font-weight: bold;">${riskLevel}</span><br>
-                    Province: ${location.province}
-                `);
-        });
-        
-        console.log(`Map markers updated successfully - ${data.length} markers added`);
+        }).addTo(diseaseMap);
         
     } catch (error) {
-        console.error('Error updating map markers:', error);
+        console.error('Error loading choropleth:', error);
     }
 }
 
@@ -712,13 +901,7 @@ function initializeChart() {
 // Load chart data
 async function loadChartData() {
     try {
-        const response = await fetch('/api/disease-trends');
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        
-        const data = await response.json();
+        const data = await fetchWithDelta('disease-trends');
         updateChart(data);
         
     } catch (error) {
@@ -790,6 +973,32 @@ async function refreshData() {
     }
 }
 
+// Download the weekly Excel report, waiting while the server builds it (202 + Retry-After)
+async function downloadWeeklyReport() {
+    const button = document.getElementById('weeklyReportButton');
+    if (button) button.disabled = true;
+    try {
+        for (let attempt = 0; attempt < 60; attempt++) {
+            const response = await fetch('/api/reports/weekly.xlsx', { method: 'HEAD', cache: 'no-cache' });
+            if (response.status === 200) {
+                window.location.href = '/api/reports/weekly.xlsx';
+                return;
+            }
+            if (response.status !== 202) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 5;
+            await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+        }
+        throw new Error('timed out');
+    } catch (error) {
+        console.error('Error downloading weekly report:', error);
+        showErrorMessage('Failed to build the weekly report. Please try again.');
+    } finally {
+        if (button) button.disabled = false;
+    }
+}
+
 // Show loading indicators
 function showLoadingIndicators() {
     const loadingElements = document.querySelectorAll('.loading-spinner');
@@ -1092,4 +1301,7 @@ window.addEventListener('beforeunload', function() {
     if (updateInterval) {
         clearInterval(updateInterval);
     }
+    if (eventSource) {
+        eventSource.close();
+    }
 });
@@ -0,0 +1,342 @@
+import os
+import re
+import functools
+import logging
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ('national', 'province', 'district')
+
+# Weeks kept in the cube; older weeks are dropped at ingest
+MAX_WEEKS = 52
+
+# Alternative province spellings used across the workbook's sheets
+PROVINCE_ALIASES = {
+    'kpk': 'kp',
+    'khyberpakhtunkhwa': 'kp',
+    'isl': 'ict',
+    'islamabad': 'ict',
+    'islamabadcapitalterritory': 'ict',
+    'fata': 'kp',
+    'federallyadministeredtribalareas': 'kp',
+    'baluchistan': 'balochistan',
+    'gilgitbaltistan': 'gb',
+    'azadkashmir': 'ajk',
+    'azadjammuandkashmir': 'ajk',
+}
+
+
+def dimension_key(name: str) -> str:
+    """Lookup key for a disease/province/district name: lowercase letters and digits only"""
+    return re.sub(r'[^a-z0-9]+', '', str(name).lower())
+
+
+def province_key(name: str) -> str:
+    key = dimension_key(name)
+    return PROVINCE_ALIASES.get(key, key)
+
+
+def clean_label(name: str) -> str:
+    """Display form of a header or row label ("AD  (Non- Cholera) " -> "AD (Non-Cholera)")"""
+    label = ' '.join(str(name).split())
+    return re.sub(r'([(/-])\s+', r'\1', label)
+
+
+def week_label(when: datetime) -> str:
+    year, week, _ = when.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+# Week and year in report file names and titles, tried in order:
+# "Weekly_Report-21-2025 _1752183263239.xlsx", "2025-W30.xlsx", "IDSR week 42 2025.xlsx"
+REPORT_NAME_WEEK = re.compile(r'report[\s_-]*(?P<week>\d{1,2})[\s_-]+(?P<year>20\d\d)(?!\d)')
+ISO_NAME_WEEK = re.compile(r'(?<!\d)(?P<year>20\d\d)[\s_-]*w(?P<week>\d{1,2})(?!\d)')
+NAMED_WEEK = re.compile(r'(?<![a-z])(?:week|wk|w)[\s_-]*(?P<week>\d{1,2})(?!\d)')
+NAME_YEAR = re.compile(r'(?<!\d)(20\d\d)(?!\d)')
+
+
+def text_week(text: str) -> Optional[str]:
+    """Epi-week a piece of text names ("Weekly_Report-21-2025", "2025-W30", "IDSR week 42 2025"); None if it does not give week and year"""
+    text = str(text).lower()
+    match = REPORT_NAME_WEEK.search(text) or ISO_NAME_WEEK.search(text)
+    if match:
+        week, year = int(match.group('week')), int(match.group('year'))
+    else:
+        match, year_match = NAMED_WEEK.search(text), NAME_YEAR.search(text)
+        if not match or not year_match:
+            return None
+        week, year = int(match.group('week')), int(year_match.group(1))
+    if not 1 <= week <= 53:
+        return None
+    return f"{year}-W{week:02d}"
+
+
+def report_week(path: str) -> Optional[str]:
+    """Epi-week a weekly report covers, from its file name; None if the name does not give week and year"""
+    return text_week(os.path.basename(path))
+
+
+# Rows at the top of each sheet searched for a title naming the week
+TITLE_ROWS = 3
+
+
+def workbook_week(path: str) -> Optional[str]:
+    """Epi-week of a weekly report: from its file name, else from its content.
+
+    A workbook whose name gives no week is searched for one in its title,
+    subject and keywords, then in its sheet names and the text cells of
+    the first ``TITLE_ROWS`` rows of each sheet. None if none of them
+    gives week and year; the week is never guessed from file dates.
+    """
+    week = report_week(path)
+    if week is not None:
+        return week
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return _content_week(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=256)
+def _content_week(path: str, mtime_ns: int, size: int) -> Optional[str]:
+    """Epi-week named in a workbook's properties or title cells, read once per (path, mtime, size)"""
+    import openpyxl
+
+    try:
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        logger.warning(f"Cannot read {path} for its epi-week: {e}")
+        return None
+    try:
+        properties = workbook.properties
+        texts = [properties.title, properties.subject, properties.keywords]
+        for worksheet in workbook.worksheets:
+            texts.append(worksheet.title)
+            for row in worksheet.iter_rows(max_row=TITLE_ROWS, values_only=True):
+                texts.extend(value for value in row if isinstance(value, str))
+        return next((week for week in map(text_week, filter(None, texts)) if week), None)
+    finally:
+        workbook.close()
+
+
+def cell_value(value) -> Optional[float]:
+    """Case count of one cell; None for blanks and "NR" (not reported)"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def table_rows(columns: List[str], rows: Iterable[tuple]) -> Iterable[Tuple[str, Dict[str, Optional[float]]]]:
+    """(label, {column: value}) for each row of a report table whose first column holds the labels.
+
+    ``rows`` are plain tuples, from a DataFrame or streamed from the
+    workbook. Long labels wrap onto a second row with no values
+    ("Tando Muhammad" / "Khan"); such continuation rows are joined onto
+    the row above.
+    """
+    value_columns = list(enumerate(columns))[1:]
+    pending = None
+    for row in rows:
+        label = row[0]
+        if label is None or pd.isna(label) or not str(label).strip():
+            continue
+        values = {column: cell_value(row[i] if i < len(row) else None) for i, column in value_columns}
+        if pending is not None and all(value is None for value in values.values()):
+            pending = (f"{pending[0]} {label}", pending[1])
+            continue
+        if pending is not None:
+            yield clean_label(pending[0]), pending[1]
+        pending = (str(label), values)
+    if pending is not None:
+        yield clean_label(pending[0]), pending[1]
+
+
+def national_table_records(columns: List[str], rows: Iterable[tuple]) -> Dict[str, List[list]]:
+    """Province and national records from the national summary table (one column per province)"""
+    records = {'province': [], 'national': []}
+    for disease, values in table_rows(columns, rows):
+        for column, value in values.items():
+            if str(column).startswith('Unnamed'):
+                continue
+            if dimension_key(column) == 'total':
+                if value is not None:
+                    records['national'].append([disease, value])
+            else:
+                # Kept even when not reported (None), so the province stays a known dimension
+                records['province'].append([clean_label(column), disease, value])
+    return records
+
+
+def district_table_records(columns: List[str], rows: Iterable[tuple], province: str) -> List[list]:
+    """District records from a province table (one row per district, one column per disease)"""
+    records = []
+    for district, values in table_rows(columns, rows):
+        for column, value in values.items():
+            if value is not None and not str(column).startswith('Unnamed'):
+                records.append([province, district, clean_label(column), value])
+    return records
+
+
+class SurveillanceCube:
+    """Case counts by region x disease x epi-week, as dense NumPy arrays.
+
+    District counts come from the province tables; province and national
+    counts are the figures the report states, rolled up from the level
+    below wherever the report leaves a cell empty. Every level is stored
+    as its own array, so a slice is an index lookup rather than a sum.
+
+    The cube is persisted with the snapshot in its sparse record form
+    (``to_dict``), one entry per week.
+    """
+
+    def __init__(self, weeks_records: Optional[Dict[str, Dict[str, List[list]]]] = None):
+        self.records = dict(sorted((weeks_records or {}).items())[-MAX_WEEKS:])
+        self.weeks = list(self.records)
+        self.week_index = {week: i for i, week in enumerate(self.weeks)}
+
+        # Districts are keyed by their canonical id, so a district spelled differently across weeks is one row
+        from district_names import district_index
+
+        provinces, diseases, districts = {}, {}, {}
+        district_ids = {}
+        for week_records in self.records.values():
+            for province, *_ in week_records.get('province', []):
+                provinces.setdefault(province_key(province), province)
+            for province, district, *_ in week_records.get('district', []):
+                district_id = district_index.resolve(district, province)
+                district_ids[(province, district)] = district_id
+                if district_id is None:
+                    continue
+                provinces.setdefault(province_key(province), province)
+                districts.setdefault(district_id, (province, district_index.name(district_id)))
+            for level in LEVELS:
+                for record in week_records.get(level, []):
+                    diseases.setdefault(dimension_key(record[-2]), record[-2])
+
+        self.province_index = {key: i for i, key in enumerate(provinces)}
+        self.provinces = list(provinces.values())
+        self.disease_index = {key: i for i, key in enumerate(diseases)}
+        self.diseases = list(diseases.values())
+        self.district_index = {key: i for i, key in enumerate(districts)}
+        self.districts = list(districts.values())
+        self.district_province = np.array([self.province_index[province_key(province)]
+                                           for province, _ in districts.values()], dtype=np.intp)
+
+        shape = (len(self.diseases), len(self.weeks))
+        self.district_counts = np.full((len(self.districts),) + shape, np.nan)
+        self.province_counts = np.full((len(self.provinces),) + shape, np.nan)
+        self.national_counts = np.full(shape, np.nan)
+
+        for w, week_records in enumerate(self.records.values()):
+            for province, district, disease, value in week_records.get('district', []):
+                district_id = district_ids[(province, district)]
+                if district_id is None:
+                    continue
+                d = self.district_index[district_id]
+                self.district_counts[d, self.disease_index[dimension_key(disease)], w] = value
+            for province, disease, value in week_records.get('province', []):
+                if value is None:
+                    continue
+                self.province_counts[self.province_index[province_key(province)],
+                                     self.disease_index[dimension_key(disease)], w] = value
+            for disease, value in week_records.get('national', []):
+                self.national_counts[self.disease_index[dimension_key(disease)], w] = value
+
+        # Fill the cells the report left empty from the level below
+        rolled_up = self._rollup(self.district_counts, self.district_province, len(self.provinces))
+        self.province_counts = np.where(np.isnan(self.province_counts), rolled_up, self.province_counts)
+        rolled_up = self._rollup(self.province_counts, np.zeros(len(self.provinces), dtype=np.intp), 1)[0]
+        self.national_counts = np.where(np.isnan(self.national_counts), rolled_up, self.national_counts)
+
+    @staticmethod
+    def _rollup(counts: np.ndarray, parent: np.ndarray, parents: int) -> np.ndarray:
+        """Sum rows into their parent; NaN where no child reported a value"""
+        sums = np.zeros((parents,) + counts.shape[1:])
+        reported = np.zeros((parents,) + counts.shape[1:])
+        np.add.at(sums, parent, np.nan_to_num(counts))
+        np.add.at(reported, parent, ~np.isnan(counts))
+        return np.where(reported > 0, sums, np.nan)
+
+    @classmethod
+    def from_dict(cls, document: Optional[Dict[str, Any]]) -> 'SurveillanceCube':
+        return cls((document or {}).get('weeks'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'weeks': self.records}
+
+    def with_week(self, week: str, week_records: Dict[str, List[list]]) -> 'SurveillanceCube':
+        """New cube with ``week`` added (or replaced, if that week was already ingested)"""
+        records = dict(self.records)
+        records[week] = week_records
+        return SurveillanceCube(records)
+
+    def _lookup(self, index: Dict, key, kind: str) -> int:
+        try:
+            return index[key]
+        except KeyError:
+            raise ValueError(f"Unknown {kind}")
+
+    def slice(self, level: str = 'national', province: Optional[str] = None,
+              disease: Optional[str] = None, weeks: Optional[int] = None) -> Dict[str, Any]:
+        """Counts per week for one level, optionally narrowed to a province, a disease and the last N weeks.
+
+        Raises ValueError for an unknown level, province or disease, or for ``weeks`` below 1.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+        if weeks is not None and weeks < 1:
+            raise ValueError("weeks must be at least 1")
+        week_slice = slice(-weeks, None) if weeks else slice(None)
+        if disease:
+            disease_ids = [self._lookup(self.disease_index, dimension_key(disease), f"disease '{disease}'")]
+        else:
+            disease_ids = list(range(len(self.diseases)))
+        province_id = None
+        if province:
+            province_id = self._lookup(self.province_index, province_key(province), f"province '{province}'")
+
+        if level == 'national':
+            regions = [({}, self.national_counts)]
+        elif level == 'province':
+            ids = [province_id] if province_id is not None else range(len(self.provinces))
+            regions = [({'province': self.provinces[p]}, self.province_counts[p]) for p in ids]
+        else:
+            ids = range(len(self.districts))
+            if province_id is not None:
+                ids = np.flatnonzero(self.district_province == province_id)
+            regions = [({'province': self.provinces[self.district_province[d]], 'district': self.districts[d][1]},
+                        self.district_counts[d]) for d in ids]
+
+        series = []
+        for region, counts in regions:
+            for k in disease_ids:
+                cases = counts[k, week_slice]
+                if np.isnan(cases).all():
+                    continue
+                series.append(dict(region, disease=self.diseases[k],
+                                   cases=[None if np.isnan(value) else int(value) for value in cases],
+                                   total=int(np.nansum(cases))))
+
+        return {
+            'level': level,
+            'weeks': self.weeks[week_slice],
+            'series': series
+        }
+
+    def get_dimensions(self) -> Dict[str, Any]:
+        return {
+            'levels': list(LEVELS),
+            'weeks': list(self.weeks),
+            'provinces': list(self.provinces),
+            'diseases': list(self.diseases),
+            'districts': len(self.districts)
+        }
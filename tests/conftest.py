@@ -0,0 +1,48 @@
+"""Fixtures serving the weekly report shipped with the repository"""
+import os
+import shutil
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+# The workbook the dashboard ships with, which gives its epi-week (21 of 2025) in its title
+SHIPPED_WORKBOOK = os.path.join(PROJECT_ROOT, 'data', 'health_data.xlsx')
+# The same report as attached, with its week only in the file name
+REPORT_WORKBOOK = os.path.join(PROJECT_ROOT, 'attached_assets', 'Weekly_Report-21-2025 _1752183263239.xlsx')
+REPORT_WEEK = '2025-W21'
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    """HealthDataProcessor that has loaded the shipped workbook, in a scratch directory without state or database"""
+    from data_processor import HealthDataProcessor
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    shutil.copy2(SHIPPED_WORKBOOK, os.path.join('data', 'health_data.xlsx'))
+    return HealthDataProcessor()
+
+
+@pytest.fixture
+def client(processor, monkeypatch):
+    """Flask test client of the app, answering from ``processor`` and exporting without a database"""
+    import app as app_module
+    import services
+    from app import app
+    from data_export import DataExporter
+    from deltas import DeltaHistory
+    from serialization import PayloadCache
+
+    spool_dir = os.path.join(os.getcwd(), 'state', 'exports', str(os.getpid()))
+    monkeypatch.setattr(services, 'data_processor', services.LazyService('Data processor', lambda: processor))
+    monkeypatch.setattr(services, 'exporter', services.LazyService(
+        'Exporter', lambda: DataExporter(processor, spool_dir=spool_dir)))
+    monkeypatch.setattr(services, 'start_warm_up', lambda: None)
+    # Every test's processor numbers its versions from 1, so nothing cached for another one is valid
+    monkeypatch.setattr(app_module, 'payload_cache', PayloadCache())
+    monkeypatch.setattr(app_module, 'delta_histories', {
+        name: DeltaHistory(key=history.key) for name, history in app_module.delta_histories.items()})
+    return app.test_client()
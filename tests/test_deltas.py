@@ -0,0 +1,119 @@
+"""Version diffs of the map payload (deltas.DeltaHistory and ?since=)"""
+import copy
+import json
+
+import pytest
+
+from deltas import DeltaHistory
+
+NEW_LOCATION = 'Keti Bandar, Sindh'
+
+
+def map_history(max_versions=20):
+    return DeltaHistory(key=lambda entry: entry['location'], max_versions=max_versions)
+
+
+def keyed(payload):
+    return {entry['location']: entry for entry in payload}
+
+
+def apply_delta(items, delta):
+    """The keyed payload a client holding ``items`` has after applying ``delta``"""
+    items = dict(items)
+    for key in delta['removed']:
+        del items[key]
+    items.update(delta['changed'])
+    items.update(delta['added'])
+    return items
+
+
+@pytest.fixture
+def map_versions(processor):
+    """Four versions of the report's map payload, as later reports could change it"""
+    v1 = processor.get_map_data()
+    v2 = copy.deepcopy(v1)
+    v2[0]['cases'] += 100
+    v2.append({'location': NEW_LOCATION, 'lat': 24.15, 'lng': 67.45, 'cases': 12, 'province': 'Sindh'})
+    # The second district stops reporting, and the new location goes again
+    v3 = [entry for entry in copy.deepcopy(v2) if entry['location'] not in (v1[1]['location'], NEW_LOCATION)]
+    v4 = copy.deepcopy(v3)
+    v4[2]['cases'] += 5
+    return [v1, v2, v3, v4]
+
+
+def test_report_map_payload(map_versions):
+    v1 = map_versions[0]
+    assert len(v1) == 94
+    assert v1[0] == {'location': 'Badin, Sindh', 'lat': pytest.approx(27.0625, abs=1e-4),
+                     'lng': pytest.approx(67.8765, abs=1e-4), 'cases': 3495, 'province': 'Sindh'}
+
+
+def test_delta_composes_across_the_ring(map_versions):
+    history = map_history()
+    for version, payload in enumerate(map_versions, start=1):
+        history.record(version, payload)
+
+    for since in (1, 2, 3):
+        delta = history.delta(since, 4)
+        assert apply_delta(keyed(map_versions[since - 1]), delta) == keyed(map_versions[3])
+
+    delta = history.delta(1, 4)
+    v1, v4 = map_versions[0], map_versions[3]
+    assert delta['added'] == {}
+    assert set(delta['changed']) == {v1[0]['location'], v4[2]['location']}
+    assert delta['changed'][v1[0]['location']]['cases'] == 3495 + 100
+    # Keys were added and removed on the way, so the client also gets the new order
+    assert delta['order'] == [entry['location'] for entry in v4]
+
+
+def test_delta_since_current_version_is_empty(map_versions):
+    history = map_history()
+    history.record(7, map_versions[0])
+    assert history.delta(7, 7) == {'added': {}, 'changed': {}, 'removed': []}
+
+
+def test_removed_keys(map_versions):
+    history = map_history()
+    for version, payload in enumerate(map_versions[:3], start=1):
+        history.record(version, payload)
+
+    removed_district = map_versions[0][1]['location']
+    assert sorted(history.delta(2, 3)['removed']) == sorted([removed_district, NEW_LOCATION])
+    # Added after ``since`` and removed again: the client never had it, so nothing to remove
+    history.record(4, map_versions[3])
+    delta = history.delta(1, 4)
+    assert delta['removed'] == [removed_district]
+    assert NEW_LOCATION not in delta['added']
+
+
+def test_too_old_since_cannot_be_composed(map_versions):
+    history = map_history(max_versions=2)
+    for version, payload in enumerate(map_versions, start=1):
+        history.record(version, payload)
+
+    assert history.get_status() == {'version': 4, 'oldest_version': 2, 'entries': 93}
+    assert history.delta(1, 4) is None
+    assert history.delta(2, 4) is not None
+    # A version this process never recorded, or a request for a version that is not the latest
+    assert history.delta(0, 4) is None
+    assert history.delta(2, 3) is None
+
+
+def test_since_endpoint_falls_back_to_full_payload(client, processor, map_versions, monkeypatch):
+    import app
+
+    version = processor.data_version
+    history = map_history(max_versions=2)
+    for offset, payload in zip((3, 2, 1), map_versions[1:]):
+        history.record(version - offset, payload)
+    monkeypatch.setitem(app.delta_histories, 'map-data', history)
+
+    current = processor.get_map_data()
+    full = client.get(f'/api/map-data?since={version - 3}')
+    assert full.status_code == 200
+    assert json.loads(full.data) == {'delta': False, 'version': version, 'data': current}
+
+    response = client.get(f'/api/map-data?since={version - 2}')
+    delta = json.loads(response.data)
+    assert delta['delta'] is True and delta['since'] == version - 2 and delta['version'] == version
+    assert apply_delta(keyed(map_versions[2]), delta) == keyed(current)
@@ -0,0 +1,135 @@
+"""District choropleth: simplification per zoom band and the join to the case counts"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+import services
+from district_boundaries import DistrictBoundaries, pixel_degrees, simplify_geometry
+from district_names import district_index
+from state_store import StateStore
+
+# Synthetic districts: an outline with detail at two scales, a two-part district with a hole,
+# one smaller than a pixel, one the report does not know and a point feature
+BOUNDARIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'districts.geojson')
+
+
+def source_rings(district):
+    with open(BOUNDARIES) as f:
+        for feature in json.load(f)['features']:
+            if feature['properties']['ADM2_EN'] == district:
+                geometry = feature['geometry']
+                polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+                return [np.asarray(ring) for rings in polygons for ring in rings]
+
+
+def shape(features, district):
+    return next(feature['geometry'] for feature in features if feature['district'] == district)
+
+
+def rings(geometry):
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    return [np.asarray(ring) for rings in polygons for ring in rings]
+
+
+def distance_to_ring(points, ring):
+    """Distance of every point to the nearest edge of ``ring``"""
+    a, b = ring[:-1], ring[1:]
+    edge = b - a
+    offset = points[:, None, :] - a[None, :, :]
+    t = np.clip((offset * edge).sum(axis=2) / np.maximum((edge ** 2).sum(axis=1), 1e-18), 0, 1)
+    nearest = a[None, :, :] + t[:, :, None] * edge[None, :, :]
+    return np.hypot(*(points[:, None, :] - nearest).transpose(2, 0, 1)).min(axis=1)
+
+
+@pytest.fixture
+def boundaries():
+    return DistrictBoundaries(BOUNDARIES)
+
+
+def test_every_zoom_band_is_simplified_to_a_pixel(boundaries):
+    assert [(max_zoom, tolerance) for max_zoom, tolerance, _ in boundaries.levels] == [
+        (5, pixel_degrees(5)), (7, pixel_degrees(7)), (9, pixel_degrees(9)), (None, 0.0)]
+    assert [boundaries.level_for_zoom(zoom) for zoom in (0, 5, 6, 7, 8, 9, 10, 18)] == [0, 0, 1, 1, 2, 2, 3, 3]
+
+    original = source_rings('Badin')[0]
+    vertices = []
+    for _, tolerance, features in boundaries.levels:
+        badin = rings(shape(features, 'Badin'))[0]
+        vertices.append(len(badin))
+        # No dropped vertex is farther than the band's tolerance (plus rounding) from the simplified outline
+        assert distance_to_ring(original, badin).max() <= tolerance * 1.1 + 1e-9
+    # Coarser bands keep fewer vertices; full resolution keeps all of them
+    assert vertices == sorted(vertices) and len(set(vertices)) == 4
+    assert vertices[-1] == len(original)
+
+
+def test_parts_and_holes_are_kept(boundaries):
+    for _, _, features in boundaries.levels:
+        geometry = shape(features, 'D.I. Khan')
+        assert geometry['type'] == 'MultiPolygon'
+        assert [len(rings) for rings in geometry['coordinates']] == [2, 1]
+    # Only (Multi)Polygons are districts
+    assert all(feature['district'] != 'Hyderabad' for _, _, features in boundaries.levels for feature in features)
+
+
+def test_district_smaller_than_a_pixel_stays_visible(boundaries):
+    original = source_rings('Karachi South')[0]
+    for max_zoom, _, features in boundaries.levels:
+        ring = rings(shape(features, 'Karachi South'))[0]
+        if max_zoom is None:
+            assert len(ring) == len(original)
+        else:
+            # The quadrilateral of its extreme points, closed
+            assert len(ring) == 5 and (ring[0] == ring[-1]).all()
+            assert (ring.min(axis=0) >= original.min(axis=0) - 1e-6).all()
+            assert (ring.max(axis=0) <= original.max(axis=0) + 1e-6).all()
+
+    # A sliver without area has no such quadrilateral
+    line = {'type': 'Polygon', 'coordinates': [[[67.0, 24.0], [67.0001, 24.0], [67.0002, 24.0], [67.0, 24.0]] * 2]}
+    assert simplify_geometry(line, pixel_degrees(5), 3) is None
+
+
+def test_simplified_levels_are_reused_from_the_state_store(tmp_path, monkeypatch):
+    store = StateStore(str(tmp_path / 'state'))
+    levels = DistrictBoundaries(BOUNDARIES, state_store=store).levels
+
+    def fail(self, source):
+        raise AssertionError("simplified again")
+
+    monkeypatch.setattr(DistrictBoundaries, '_simplify', fail)
+    restored = DistrictBoundaries(BOUNDARIES, state_store=store)
+    assert json.loads(json.dumps(restored.levels)) == json.loads(json.dumps(levels))
+
+
+def test_choropleth_endpoint(client, processor, tmp_path, monkeypatch):
+    missing = DistrictBoundaries(str(tmp_path / 'none.geojson'))
+    monkeypatch.setattr(services, 'boundaries', services.LazyService('boundaries', lambda: missing))
+    response = client.get('/api/choropleth')
+    assert response.status_code == 404
+    assert 'No district boundaries' in json.loads(response.data)['error']
+
+    boundaries = DistrictBoundaries(BOUNDARIES)
+    monkeypatch.setattr(services, 'boundaries', services.LazyService('boundaries', lambda: boundaries))
+    response = client.get('/api/choropleth?zoom=6')
+    assert response.status_code == 200
+    collection = json.loads(response.data)
+    assert collection['level'] == {'max_zoom': 7, 'tolerance': pixel_degrees(7)}
+
+    cases = district_index.table_cases(processor.get_location_table())
+    joined = {feature['properties']['district']: feature['properties']['cases'] for feature in collection['features']}
+    assert joined == {
+        'Badin': cases[district_index.resolve('Badin', 'Sindh')],
+        # Joined by canonical district, whatever the spelling
+        'D.I. Khan': cases[district_index.resolve('Dera Ismail Khan', 'KP')],
+        'Karachi South': cases[district_index.resolve('Karachi South', 'Sindh')],
+        'Atlantis': None,
+    }
+    assert joined['D.I. Khan'] is not None
+    unmatched = collection['unmatched_districts']
+    assert len(unmatched) == len(processor.get_location_table()) - 3
+    assert not any('Badin' in label or 'Dera Ismail Khan' in label for label in unmatched)
+
+    full = json.loads(client.get('/api/choropleth?zoom=12').data)
+    assert full['level'] == {'max_zoom': None, 'tolerance': 0.0}
@@ -0,0 +1,101 @@
+"""Resolving the weekly report's district names to canonical districts"""
+import copy
+
+import pytest
+
+from conftest import REPORT_WEEK
+from district_names import FUZZY_THRESHOLD, DistrictIndex
+from surveillance_cube import SurveillanceCube
+
+
+@pytest.fixture
+def report_districts(processor):
+    """(province, district) of every district row in the report"""
+    records = processor.get_surveillance_cube().records[REPORT_WEEK]
+    return sorted({(province, district) for province, district, *_ in records['district']})
+
+
+def resolved_name(index, name, province):
+    district_id = index.resolve(name, province)
+    return None if district_id is None else index.name(district_id)
+
+
+def is_registered(index, name, province):
+    """Whether ``name`` matched no gazetteer district and was registered as a new one"""
+    return index.resolve(name, province) >= index.known
+
+
+def test_report_districts_resolve_exactly(report_districts):
+    index = DistrictIndex()
+    assert len(report_districts) == 94
+    for province, district in report_districts:
+        assert resolved_name(index, district, province) == district
+    # Only the Tank subdivision is not in the gazetteer
+    assert [district for province, district in report_districts if is_registered(index, district, province)] == ['SD Tank']
+    assert index.stats['fuzzy'] == 0
+
+
+@pytest.mark.parametrize('spelling, province, district', [
+    ('Kamber', 'Sindh', 'Kambar Shahdadkot'),
+    ('Nawabshah', 'Sindh', 'Shaheed Benazirabad'),
+    ('D.I. Khan', 'KP', 'Dera Ismail Khan'),
+    ('Lower Dir', 'KP', 'Dir Lower'),
+    ('Tando Muhamad Khan', 'Sindh', 'Tando Muhammad Khan'),
+    ('Shaheed Benazeerabad', 'Sindh', 'Shaheed Benazirabad'),
+    ('Jacobabaad', 'Sindh', 'Jacobabad'),
+    ('Abottabad', 'KP', 'Abbottabad'),
+    ('Nowshehra', None, 'Nowshera'),
+    ('Sukur', 'Sindh', 'Sukkur'),
+])
+def test_other_spellings_resolve_to_the_report_district(report_districts, spelling, province, district):
+    assert district in {name for _, name in report_districts}
+    assert resolved_name(DistrictIndex(), spelling, province) == district
+
+
+@pytest.mark.parametrize('name', ['Total', 'Grand Total', 'Sindh Labs', 'Lab'])
+def test_total_and_lab_rows_are_not_districts(name):
+    assert DistrictIndex().resolve(name, 'Sindh') is None
+
+
+def test_fuzzy_threshold_is_inclusive():
+    # 'Tharparker' shares trigrams with 'Tharparkar' at a Dice coefficient of exactly 0.7
+    assert FUZZY_THRESHOLD == 0.7
+    assert resolved_name(DistrictIndex(), 'Tharparker', 'Sindh') == 'Tharparkar'
+
+    strict = DistrictIndex(threshold=0.71)
+    assert is_registered(strict, 'Tharparker', 'Sindh')
+    assert strict.stats['registered'] == 1
+
+
+@pytest.mark.parametrize('name, province', [
+    ('Larkna', 'Sindh'),               # Dice 0.615 against Larkana
+    ('Hyderabad Rural', 'Sindh'),
+    ('Chitral', 'KP'),                 # 0.632 against both Chitral Lower and Chitral Upper
+    ('Jacobabaad', 'KP'),              # close to Jacobabad, but that is in Sindh
+])
+def test_names_below_threshold_are_registered(name, province):
+    index = DistrictIndex()
+    assert is_registered(index, name, province)
+    assert resolved_name(index, name, province) == name
+    # Registered names are matched exactly afterwards, never fuzzily
+    assert index.resolve(name + 'x', province) != index.resolve(name, province)
+
+
+def test_equally_close_districts_are_not_guessed():
+    index = DistrictIndex({'Sindh': ['Mirpur A', 'Mirpur B']})
+    assert is_registered(index, 'Mirpur', 'Sindh')
+
+
+def test_cube_joins_spellings_across_weeks(processor):
+    week_records = processor.get_surveillance_cube().records[REPORT_WEEK]
+    renamed = {'Tando Muhammad Khan': 'Tando Muhamad Khan', 'Kambar Shahdadkot': 'Kamber'}
+    earlier = copy.deepcopy(week_records)
+    earlier['district'] = [[province, renamed.get(district, district), disease, value]
+                           for province, district, disease, value in earlier['district']]
+
+    cube = SurveillanceCube({'2025-W20': earlier, REPORT_WEEK: week_records})
+    assert len(cube.districts) == len(SurveillanceCube({REPORT_WEEK: week_records}).districts)
+    result = cube.slice(level='district', province='Sindh', disease='Malaria')
+    [series] = [series for series in result['series'] if series['district'] == 'Tando Muhammad Khan']
+    assert series['cases'][0] is not None
+    assert series['cases'][0] == series['cases'][1]
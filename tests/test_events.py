@@ -0,0 +1,45 @@
+"""How many server-sent event streams a worker keeps open next to its API requests"""
+import pytest
+
+import services
+from events import stream_limit
+
+
+@pytest.mark.parametrize('threads, requested, limit', [
+    (128, None, 32),
+    (128, '10', 10),
+    # SSE_MAX_STREAMS cannot hand streams more than their share of the threads
+    (128, '100', 32),
+    (8, None, 2),
+    (1, None, 0),
+])
+def test_stream_limit(monkeypatch, threads, requested, limit):
+    if requested is None:
+        monkeypatch.delenv('SSE_MAX_STREAMS', raising=False)
+    else:
+        monkeypatch.setenv('SSE_MAX_STREAMS', requested)
+    assert stream_limit(threads) == limit
+
+
+def test_streams_beyond_the_limit_are_refused(client, monkeypatch):
+    monkeypatch.delenv('SSE_MAX_STREAMS', raising=False)
+    monkeypatch.setattr(services, 'worker_threads', 8)
+    monkeypatch.setattr(services, 'event_broker', services.LazyService('event_broker',
+                                                                      services._create_event_broker))
+    broker = services.event_broker.get()
+    assert broker.max_streams == 2
+    try:
+        streams = [client.get('/api/events', buffered=False) for _ in range(2)]
+        assert [response.status_code for response in streams] == [200, 200]
+        refused = client.get('/api/events')
+        assert refused.status_code == 503 and refused.headers['Retry-After'] == '60'
+
+        # A closed stream frees its slot
+        streams.pop().close()
+        response = client.get('/api/events', buffered=False)
+        assert response.status_code == 200
+        response.close()
+        for response in streams:
+            response.close()
+    finally:
+        broker.stop()
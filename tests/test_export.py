@@ -0,0 +1,111 @@
+"""CSV and Parquet exports of the weekly case counts, their spool files and Range requests"""
+import csv
+import io
+import os
+
+import pytest
+
+from conftest import REPORT_WEEK
+from data_export import COLUMNS, DataExporter, ExportQuery
+
+BADIN_MALARIA = [REPORT_WEEK, 'district', 'Sindh', 'Badin', 'Malaria', '3495']
+
+
+def csv_rows(data):
+    rows = list(csv.reader(io.StringIO(data.decode('utf-8'))))
+    assert tuple(rows[0]) == COLUMNS
+    return rows[1:]
+
+
+def spooled(directory):
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+@pytest.fixture
+def record_count(processor):
+    """Rows in an unfiltered export of the shipped workbook"""
+    records = processor.get_surveillance_cube().records[REPORT_WEEK]
+    return sum(len(records[level]) for level in ('national', 'province', 'district'))
+
+
+def test_csv_export_of_shipped_data(client, record_count):
+    response = client.get('/api/export?format=csv')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename="surveillance_start_latest.csv"'
+    rows = csv_rows(response.data)
+    assert len(rows) == record_count
+    assert BADIN_MALARIA in rows
+    # Provinces the report left blank are exported without a count
+    assert [REPORT_WEEK, 'province', 'Punjab', '', 'Malaria', ''] in rows
+
+
+def test_csv_export_filters(client):
+    rows = csv_rows(client.get('/api/export?province=sindh&disease=MALARIA').data)
+    assert len(rows) == 1 + 30
+    assert rows[0] == [REPORT_WEEK, 'province', 'Sindh', '', 'Malaria', '55095']
+    assert csv_rows(client.get('/api/export?to=2025-W20').data) == []
+
+
+def test_range_requests_are_served_from_the_spooled_file(client):
+    full = client.get('/api/export')
+    etag = full.headers['ETag']
+    assert full.headers['Accept-Ranges'] == 'bytes'
+
+    partial = client.get('/api/export', headers={'Range': 'bytes=100-199', 'If-Range': etag})
+    assert partial.status_code == 206
+    assert partial.data == full.data[100:200]
+    # Another version's ETag: the whole export again
+    stale = client.get('/api/export', headers={'Range': 'bytes=100-199', 'If-Range': '"export-v0-0.csv"'})
+    assert stale.status_code == 200 and stale.data == full.data
+    assert client.get('/api/export', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_parquet_export(client, record_count):
+    pq = pytest.importorskip('pyarrow.parquet')
+    response = client.get('/api/export?format=parquet')
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.data))
+    assert table.column_names == list(COLUMNS)
+    assert table.num_rows == record_count
+    rows = [[str(value) for value in row.values()] for row in table.to_pylist()]
+    assert BADIN_MALARIA in rows
+
+
+def test_bad_export_arguments(client):
+    assert client.get('/api/export?format=xml').status_code == 400
+    assert client.get('/api/export?from=2025-21').status_code == 400
+
+
+def test_interrupted_stream_leaves_no_spool_file(processor, tmp_path):
+    exporter = DataExporter(processor, spool_dir=str(tmp_path / 'exports' / '1'))
+    stream = exporter.stream(processor.data_version, ExportQuery())
+    next(stream)
+    stream.close()
+    assert spooled(exporter.spool_dir) == []
+
+    assert b''.join(exporter.stream(processor.data_version, ExportQuery()))
+    assert spooled(exporter.spool_dir) == [ExportQuery().key(processor.data_version)]
+
+
+def test_pruning_keeps_other_processes_exports(processor, tmp_path):
+    query = ExportQuery()
+    old_worker = DataExporter(processor, spool_dir=str(tmp_path / 'exports' / str(os.getpid())))
+    new_worker = DataExporter(processor, spool_dir=str(tmp_path / 'exports' / '1'))
+
+    old_path = old_worker.build(5, query)
+    new_path = new_worker.build(6, query)
+    # A worker moving on to a newer version drops only its own older exports
+    assert os.path.exists(old_path)
+    old_worker.build(6, query)
+    assert not os.path.exists(old_path)
+    assert os.path.exists(new_path)
+
+
+def test_spool_dirs_of_exited_processes_are_removed(processor, tmp_path):
+    exports = tmp_path / 'exports'
+    gone = exports / '999999999'
+    gone.mkdir(parents=True)
+    (gone / ExportQuery().key(1)).write_text('week\n')
+
+    DataExporter(processor, spool_dir=str(exports / str(os.getpid())))
+    assert not gone.exists()
@@ -0,0 +1,170 @@
+"""Atomic publishing of refreshed data, warm restarts, and refresh jobs shared between workers"""
+import json
+import os
+import shutil
+import threading
+
+import pytest
+
+import scheduler as scheduler_module
+import services
+from conftest import REPORT_WEEK, REPORT_WORKBOOK
+from data_processor import HealthDataProcessor
+from scheduler import DataScheduler, REFRESH_STAGES
+from state_store import StateStore
+
+NEWER_REPORT = os.path.join('data', 'Weekly_Report-22-2025.xlsx')
+
+
+def fail(*args, **kwargs):
+    raise ValueError("unreadable workbook")
+
+
+def test_readers_only_see_whole_snapshots(processor):
+    first = processor.get_snapshot()
+    sections = set(first.data)
+    surveillance = json.dumps(first.get('surveillance'), sort_keys=True)
+    seen = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            snapshot = processor.get_snapshot()
+            seen.append((snapshot.version, set(snapshot.data) == sections))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for _ in range(3):
+            assert processor.refresh_data(force=True) is True
+    finally:
+        done.set()
+        reader.join()
+
+    assert all(complete for _, complete in seen)
+    versions = [version for version, _ in seen]
+    assert versions == sorted(versions)
+    assert processor.data_version == first.version + 3
+    # A published snapshot never changes, whatever was published after it
+    assert json.dumps(first.get('surveillance'), sort_keys=True) == surveillance
+    with pytest.raises(AttributeError):
+        first.version = 0
+
+
+def test_failed_refresh_keeps_the_published_snapshot(processor, monkeypatch):
+    snapshot = processor.get_snapshot()
+    shutil.copy(REPORT_WORKBOOK, NEWER_REPORT)
+    with monkeypatch.context() as patch:
+        patch.setattr(processor, 'read_workbook', fail)
+        processor.refresh_data()
+    assert processor.get_snapshot() is snapshot
+
+    # Not marked as loaded, so the next refresh tries the workbook again
+    assert processor.refresh_data() is True
+    assert processor.get_surveillance()['weeks'] == [REPORT_WEEK, '2025-W22']
+
+
+def test_unreadable_first_workbook_publishes_sample_data(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    with open(os.path.join('data', 'health_data.xlsx'), 'wb') as f:
+        f.write(b'not a workbook')
+
+    processor = HealthDataProcessor()
+    assert processor.get_snapshot().source == 'sample'
+    assert processor.loaded_workbook is None
+
+    shutil.copy(REPORT_WORKBOOK, NEWER_REPORT)
+    assert processor.refresh_data() is True
+    assert processor.get_snapshot().source == 'excel'
+    assert processor.data_version > 1
+
+
+def test_restart_and_followers_use_the_stored_snapshot(processor, tmp_path, monkeypatch):
+    store = StateStore(str(tmp_path / 'state'))
+    leader = HealthDataProcessor(state_store=store)
+
+    # A restarted worker serves the stored version without parsing the unchanged workbook
+    with monkeypatch.context() as patch:
+        patch.setattr(HealthDataProcessor, 'read_workbook', fail)
+        follower = HealthDataProcessor(state_store=store)
+    assert follower.get_snapshot().source == 'restored'
+    assert follower.data_version == leader.data_version
+
+    shutil.copy(REPORT_WORKBOOK, NEWER_REPORT)
+    assert leader.refresh_data() is True
+    assert follower.sync_from_store() is True
+    assert follower.data_version == leader.data_version == store.version('health')
+    assert follower.get_surveillance()['weeks'] == [REPORT_WEEK, '2025-W22']
+    assert follower.sync_from_store() is False
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StateStore(str(tmp_path / 'state'))
+
+
+def test_refresh_requests_coalesce_until_the_job_runs(processor, store):
+    scheduler = DataScheduler(processor, None, None, state_store=store)
+    # Another worker sharing the state directory
+    other = DataScheduler(processor, None, None, state_store=store)
+
+    job, created = scheduler.request_refresh()
+    assert created and job['status'] == 'queued'
+    again, created = other.request_refresh()
+    assert not created and again['job_id'] == job['job_id']
+    assert other.get_refresh_job(job['job_id'])['coalesced_requests'] == 1
+
+    shutil.copy(REPORT_WORKBOOK, NEWER_REPORT)
+    assert scheduler._run_next_job() is True
+    assert scheduler._run_next_job() is False
+
+    done = other.get_refresh_job(job['job_id'])
+    assert done['status'] == 'completed' and done['progress'] == 100
+    assert list(done['stages']) == list(REFRESH_STAGES)
+    assert all(info['status'] == 'completed' and info['duration_ms'] is not None
+               for info in done['stages'].values())
+    assert done['coalesced_requests'] == 1
+    assert processor.get_surveillance()['weeks'] == [REPORT_WEEK, '2025-W22']
+
+    # Once it finished, the next request starts a new job
+    assert other.request_refresh()[1] is True
+
+
+def test_failed_stage_fails_the_job(processor, store, monkeypatch):
+    scheduler = DataScheduler(processor, None, None, state_store=store)
+    monkeypatch.setattr(processor, 'refresh_data', fail)
+    job, _ = scheduler.request_refresh()
+    scheduler._run_next_job()
+
+    done = scheduler.get_refresh_job(job['job_id'])
+    assert done['status'] == 'failed'
+    assert done['stages']['health_data']['status'] == 'failed'
+    assert done['stages']['weather']['status'] == 'completed'
+
+
+def test_abandoned_job_is_replaced(processor, store, monkeypatch):
+    scheduler = DataScheduler(processor, None, None, state_store=store)
+    job, _ = scheduler.request_refresh()
+
+    # Its worker died before running it
+    monkeypatch.setattr(scheduler_module, 'ABANDONED_JOB_SECONDS', -1)
+    replacement, created = scheduler.request_refresh()
+    assert created and replacement['job_id'] != job['job_id']
+    assert scheduler.get_refresh_job(job['job_id'])['status'] == 'failed'
+
+
+def test_refresh_endpoints(client, processor, store, monkeypatch):
+    scheduler = DataScheduler(processor, None, None, state_store=store)
+    monkeypatch.setattr(services, 'scheduler', services.LazyService('scheduler', lambda: scheduler))
+
+    response = client.post('/api/refresh-data')
+    assert response.status_code == 202
+    body = json.loads(response.data)
+    assert response.headers['Location'] == body['status_url'] == f"/api/refresh-status/{body['job_id']}"
+    assert json.loads(client.post('/api/refresh-data').data)['message'] == "Data refresh already in progress"
+
+    scheduler._run_next_job()
+    status = json.loads(client.get(body['status_url']).data)
+    assert status['status'] == 'completed'
+    assert client.get('/api/refresh-status/unknown').status_code == 404
@@ -0,0 +1,32 @@
+"""Versions of published data snapshots"""
+import pytest
+
+from snapshot import DataSnapshot
+from state_store import StateStore
+
+
+def test_snapshot_needs_a_version():
+    with pytest.raises(TypeError):
+        DataSnapshot({})
+    assert DataSnapshot({}, version=7).version == 7
+
+
+def test_versions_come_from_the_state_store(processor, tmp_path):
+    from data_processor import HealthDataProcessor
+
+    store = StateStore(str(tmp_path / 'state'))
+    first = HealthDataProcessor(state_store=store)
+    second = HealthDataProcessor(state_store=store)
+    restored = second.data_version
+    assert restored == first.data_version == store.version('health')
+
+    # Workers sharing the store never hand out the same version twice
+    versions = [first._publish({}).version, second._publish({}).version, first._publish({}).version]
+    assert versions == sorted(set(versions))
+    assert versions[0] > restored
+
+
+def test_processor_without_a_store_numbers_its_own_versions(processor):
+    version = processor.data_version
+    assert processor._publish({}).version == version + 1
+    assert processor._publish({}).version == version + 2
@@ -0,0 +1,120 @@
+"""Point-in-time (as_of) reads of recorded data versions, their structural sharing and retention"""
+import json
+import os
+import shutil
+
+import pytest
+
+import snapshot_history
+from conftest import REPORT_WEEK, REPORT_WORKBOOK
+from snapshot import DataSnapshot
+from snapshot_history import SnapshotHistory
+
+
+def objects(history):
+    """{path: inode} of every stored object"""
+    found = {}
+    for directory, _, names in os.walk(history.objects_dir):
+        for name in names:
+            path = os.path.join(directory, name)
+            found[path] = os.stat(path).st_ino
+    return found
+
+
+def backfill(processor, week, badin_malaria=None):
+    """Add the report again as the older ``week`` (e.g. 20) and return the version it publishes"""
+    path = os.path.join('data', f'Weekly_Report-{week}-2025.xlsx')
+    shutil.copy(REPORT_WORKBOOK, path)
+    if badin_malaria is not None:
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(path)
+        assert workbook['Table 2 Sindh']['A2'].value.strip() == 'Badin'
+        workbook['Table 2 Sindh']['B2'] = badin_malaria
+        workbook.save(path)
+    assert processor.add_history_workbook(path)
+    processor.wait_for_history()
+    return processor.data_version
+
+
+@pytest.fixture
+def history_processor(processor, tmp_path):
+    """``processor`` recording every version it publishes from now on, keeping at most three"""
+    processor.history = SnapshotHistory(str(tmp_path / 'history'), max_versions=3)
+    backfill(processor, 20)
+    return processor
+
+
+def test_unchanged_sections_are_shared(history_processor):
+    history = history_processor.history
+    v1 = history_processor.data_version
+    before = objects(history)
+
+    v2 = backfill(history_processor, 19, badin_malaria=3000)
+    after = objects(history)
+    # Nothing stored before was rewritten; only the district counts of the added week are new
+    assert {path: after[path] for path in before} == before
+    assert len(after) - len(before) == 1
+
+    assert history_processor.get_snapshot_as_of(str(v1)).get('surveillance')['weeks'].keys() == {'2025-W20', REPORT_WEEK}
+    assert history_processor.get_snapshot_as_of(str(v2)).get('surveillance')['weeks'].keys() == {
+        '2025-W19', '2025-W20', REPORT_WEEK}
+    snapshot = history_processor.get_snapshot_as_of(str(v1))
+    assert snapshot.source == 'history'
+    assert history_processor.get_map_data(snapshot) == history_processor.get_map_data()
+    for snapshot, cases in ((snapshot, [3495, 3495]), (None, [3000, 3495, 3495])):
+        badin = history_processor.get_surveillance(level='district', province='Sindh', disease='Malaria',
+                                                   snapshot=snapshot)
+        assert [series['cases'] for series in badin['series'] if series['district'] == 'Badin'] == [cases]
+
+
+def test_pruned_versions_are_not_served(history_processor, client):
+    v1 = history_processor.data_version
+    for week in (19, 18, 17):
+        backfill(history_processor, week)
+
+    assert [version for version, _ in history_processor.history.versions()] == [v1 + 1, v1 + 2, v1 + 3]
+    with pytest.raises(LookupError):
+        history_processor.get_snapshot_as_of(str(v1))
+    with pytest.raises(LookupError):
+        history_processor.history.get(v1)
+    response = client.get(f'/api/surveillance?as_of={v1}')
+    assert response.status_code == 404
+
+    response = client.get(f'/api/surveillance?as_of={v1 + 1}')
+    assert response.status_code == 200
+    assert json.loads(response.data)['weeks'] == ['2025-W19', '2025-W20', REPORT_WEEK]
+
+
+def test_objects_of_pruned_versions_are_collected(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_history, 'GC_GRACE_SECONDS', -1)
+    history = SnapshotHistory(str(tmp_path / 'history'), max_versions=2)
+    for version in (1, 2, 3):
+        history.record(DataSnapshot({'alerts': [f'alert {version}'], 'map_data': []}, version=version))
+
+    assert [version for version, _ in history.versions()] == [2, 3]
+    # The first version's alerts went with it; the map data all three shared is kept
+    assert len(objects(history)) == 3
+    assert history.get(2).get('alerts') == ['alert 2']
+    assert history.get(3).get('map_data') == []
+
+
+def test_history_is_written_after_the_publish(processor, tmp_path, monkeypatch):
+    processor.history = SnapshotHistory(str(tmp_path / 'history'))
+
+    def fail(snapshot):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(processor.history, 'record', fail)
+    version = backfill(processor, 20)
+    # The version is published even though it could not be recorded
+    assert processor.get_surveillance()['weeks'] == ['2025-W20', REPORT_WEEK]
+    with pytest.raises(LookupError):
+        processor.get_snapshot_as_of(str(version))
+
+
+def test_followers_do_not_record(processor, tmp_path):
+    processor.history = SnapshotHistory(str(tmp_path / 'history'))
+    processor.records_history = False
+    backfill(processor, 20)
+    assert processor.history.versions() == []
@@ -0,0 +1,187 @@
+"""Epi-weeks of report names and slices of the surveillance cube built from the weekly report"""
+import copy
+import json
+import os
+import shutil
+
+import pytest
+
+from conftest import REPORT_WEEK, REPORT_WORKBOOK, SHIPPED_WORKBOOK
+from surveillance_cube import SurveillanceCube, report_week, workbook_week
+
+
+@pytest.fixture
+def week_records(processor):
+    """Sparse records of the report's week, as the cube stores them"""
+    return copy.deepcopy(processor.get_surveillance_cube().records[REPORT_WEEK])
+
+
+def blank(week_records, province=None, disease='Malaria'):
+    """Empty the report's stated province (or, without one, national) cell of ``disease``"""
+    if province is None:
+        week_records['national'] = [record for record in week_records['national'] if record[0] != disease]
+    else:
+        for record in week_records['province']:
+            if record[:2] == [province, disease]:
+                record[2] = None
+    return week_records
+
+
+def cases(result, **region):
+    [series] = [series for series in result['series']
+                if all(series.get(name) == value for name, value in region.items())]
+    return series['cases']
+
+
+@pytest.mark.parametrize('name, week', [
+    ('Weekly_Report-21-2025 _1752183263239.xlsx', '2025-W21'),
+    ('attached_assets/Weekly_Report-21-2025 _1752183263239.xlsx', '2025-W21'),
+    ('Weekly_Report-21-2025.xlsx', '2025-W21'),
+    ('weekly report 3 2026.xlsx', '2026-W03'),
+    ('2025-W30.xlsx', '2025-W30'),
+    ('IDSR week 42 2025.xlsx', '2025-W42'),
+    ('new_2025-W22.xlsx', '2025-W22'),
+])
+def test_report_week_from_name(name, week):
+    assert report_week(name) == week
+
+
+@pytest.mark.parametrize('name', ['health_data.xlsx', 'IDSR week 30.xlsx', 'Weekly_Report-60-2025.xlsx', 'report 2025.xlsx'])
+def test_report_week_needs_week_and_year(name):
+    assert report_week(name) is None
+
+
+def test_shipped_workbook_gives_its_week_in_its_title():
+    assert report_week(SHIPPED_WORKBOOK) is None
+    assert workbook_week(SHIPPED_WORKBOOK) == REPORT_WEEK
+    # The name wins over the title
+    assert workbook_week(REPORT_WORKBOOK) == REPORT_WEEK
+
+
+@pytest.mark.parametrize('sheet_title, title_cell, week', [
+    ('Week 12 2024', None, '2024-W12'),
+    ('Table 1 Pakistan', 'IDSR Weekly Report, week 30 2025', '2025-W30'),
+    ('Table 1 Pakistan', 'Diseases', None),
+])
+def test_week_from_sheet_name_or_title_cell(tmp_path, sheet_title, title_cell, week):
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    workbook.active.title = sheet_title
+    workbook.active.append([title_cell])
+    workbook.active.append(['Diseases', 'Sindh'])
+    path = tmp_path / 'health_data.xlsx'
+    workbook.save(path)
+    assert workbook_week(str(path)) == week
+
+
+def test_report_without_week_stays_out_of_the_cube(tmp_path, monkeypatch):
+    from data_processor import HealthDataProcessor
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    shutil.copy(REPORT_WORKBOOK, os.path.join('data', 'health_data.xlsx'))
+    processor = HealthDataProcessor()
+
+    assert processor.get_snapshot().version > 0
+    assert processor.get_map_data()
+    assert processor.get_surveillance_cube().weeks == []
+
+
+def test_report_dimensions(processor):
+    dimensions = processor.get_surveillance_cube().get_dimensions()
+    assert dimensions['weeks'] == [REPORT_WEEK]
+    assert dimensions['provinces'] == ['AJK', 'Balochistan', 'GB', 'ICT', 'KP', 'Punjab', 'Sindh']
+    assert len(dimensions['diseases']) == 28
+    assert dimensions['diseases'][:3] == ['AD (Non-Cholera)', 'Malaria', 'ILI']
+
+
+def test_stated_counts_are_kept(processor):
+    # The report states Sindh's malaria as 55,095 although its districts add up to 55,085
+    assert cases(processor.get_surveillance(level='national', disease='Malaria'), disease='Malaria') == [62096]
+    provinces = processor.get_surveillance(level='province', disease='Malaria')
+    assert cases(provinces, province='Sindh') == [55095]
+    # Punjab's column is blank and the report has no Punjab district table: no series rather than a zero
+    assert [series['province'] for series in provinces['series']] == ['AJK', 'Balochistan', 'GB', 'ICT', 'KP', 'Sindh']
+
+
+def test_blank_province_cell_rolls_up_districts(week_records):
+    sindh_districts = sum(value for province, _, disease, value in week_records['district']
+                          if province == 'Sindh' and disease == 'Malaria')
+    assert sindh_districts == 55085
+
+    cube = SurveillanceCube({REPORT_WEEK: blank(week_records, 'Sindh')})
+    assert cases(cube.slice(level='province', disease='Malaria'), province='Sindh') == [55085]
+    # The national count is still the stated one
+    assert cases(cube.slice(level='national', disease='Malaria'), disease='Malaria') == [62096]
+
+
+def test_blank_national_cell_rolls_up_provinces(week_records):
+    cube = SurveillanceCube({REPORT_WEEK: blank(blank(week_records), 'Sindh')})
+    # AJK 0 + Balochistan 2,418 + GB 0 + ICT 1 + KP 4,582 + Sindh's districts 55,085; blank Punjab adds nothing
+    assert cases(cube.slice(level='national', disease='Malaria'), disease='Malaria') == [62086]
+
+
+def test_week_without_any_count_stays_blank(week_records):
+    cube = SurveillanceCube({REPORT_WEEK: week_records, '2025-W20': {'province': [['Sindh', 'Malaria', None]]}})
+    result = cube.slice(level='province', province='Sindh', disease='Malaria')
+    assert result['weeks'] == ['2025-W20', REPORT_WEEK]
+    # The older week is rolled up from no districts: blank, not zero
+    assert cases(result, province='Sindh') == [None, 55095]
+
+
+@pytest.mark.parametrize('arguments, message', [
+    ({'province': 'Narnia'}, "Unknown province 'Narnia'"),
+    ({'disease': 'Scurvy'}, "Unknown disease 'Scurvy'"),
+    ({'level': 'tehsil'}, 'level must be one of national, province, district'),
+    ({'weeks': 0}, 'weeks must be at least 1'),
+    ({'weeks': -3}, 'weeks must be at least 1'),
+])
+def test_bad_slice_arguments_raise(processor, arguments, message):
+    with pytest.raises(ValueError, match=message):
+        processor.get_surveillance(**arguments)
+
+
+def test_last_weeks(week_records):
+    weeks = ['2025-W18', '2025-W19', '2025-W20', REPORT_WEEK]
+    cube = SurveillanceCube({week: week_records for week in weeks})
+    assert cube.slice(weeks=2)['weeks'] == weeks[-2:]
+    assert cube.slice(weeks=10)['weeks'] == weeks
+    assert cube.slice()['weeks'] == weeks
+
+
+def test_province_aliases_resolve(processor):
+    result = processor.get_surveillance(level='province', province='Khyber Pakhtunkhwa', disease='malaria')
+    assert cases(result, province='KP') == [4582]
+
+
+@pytest.mark.parametrize('query, message', [
+    ('province=Narnia', "Unknown province 'Narnia'"),
+    ('level=district&disease=Scurvy', "Unknown disease 'Scurvy'"),
+    ('level=tehsil', 'level must be one of national, province, district'),
+    ('weeks=-3', 'weeks must be at least 1'),
+    ('weeks=0', 'weeks must be at least 1'),
+])
+def test_surveillance_endpoint_answers_400(client, query, message):
+    response = client.get(f'/api/surveillance?{query}')
+    assert response.status_code == 400
+    assert json.loads(response.data) == {'error': message}
+
+
+def test_surveillance_endpoint(client, processor):
+    response = client.get('/api/surveillance?level=district&province=Sindh&disease=Malaria')
+    assert response.status_code == 200
+    result = json.loads(response.data)
+    assert result['data_version'] == processor.data_version
+    assert len(result['series']) == 30
+    assert cases(result, district='Badin') == [3495]
+
+
+def test_shipped_workbook_is_sliced(client, processor):
+    assert processor.report_week == REPORT_WEEK
+    result = json.loads(client.get('/api/surveillance').data)
+    assert result['weeks'] == [REPORT_WEEK]
+    assert len(result['series']) == 28
+    response = client.get('/api/surveillance?level=province&disease=Malaria')
+    assert response.status_code == 200
+    assert cases(json.loads(response.data), province='Sindh') == [55095]
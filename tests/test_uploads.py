@@ -0,0 +1,117 @@
+"""Uploaded weekly reports: publishing, backfilling, and what is left behind when ingesting fails"""
+import io
+import json
+import os
+
+import pytest
+
+from conftest import REPORT_WEEK, REPORT_WORKBOOK, SHIPPED_WORKBOOK
+
+
+def upload(processor, filename, workbook=REPORT_WORKBOOK, week=None):
+    with open(workbook, 'rb') as f:
+        return processor.ingest_upload(f, filename, week=week)
+
+
+def data_files():
+    return sorted(os.listdir('data'))
+
+
+def test_newer_report_is_published(processor):
+    version = processor.data_version
+    result = upload(processor, 'Weekly_Report-22-2025.xlsx')
+
+    assert result['week'] == '2025-W22' and result['version'] == processor.data_version > version
+    assert data_files() == ['Weekly_Report-22-2025.xlsx', 'health_data.xlsx']
+    assert processor.get_surveillance()['weeks'] == [REPORT_WEEK, '2025-W22']
+    assert processor.find_latest_workbook() == os.path.join('data', 'Weekly_Report-22-2025.xlsx')
+    # Already loaded: the watcher and the scheduler skip it
+    assert processor.refresh_data() is False
+
+
+def test_older_report_only_fills_in_history(processor):
+    map_data = processor.get_map_data()
+    result = upload(processor, 'Weekly_Report-20-2025.xlsx')
+
+    assert result['week'] == '2025-W20'
+    assert processor.get_snapshot().source == 'backfill'
+    assert processor.get_surveillance()['weeks'] == ['2025-W20', REPORT_WEEK]
+    assert processor.get_map_data() == map_data
+    assert processor.find_latest_workbook() == os.path.join('data', 'health_data.xlsx')
+
+
+def test_week_from_title_is_added_to_the_name(processor):
+    result = upload(processor, 'upload.xlsx', workbook=SHIPPED_WORKBOOK)
+    assert result['file'] == f'upload_{REPORT_WEEK}.xlsx'
+    assert f'upload_{REPORT_WEEK}.xlsx' in data_files()
+
+
+@pytest.mark.parametrize('filename, week, content, message', [
+    ('health_data.xlsx', None, None, 'No epi-week in the file name or title of health_data.xlsx'),
+    ('Weekly_Report-22-2025.xlsx', '2025-W23', None, 'does not match the week 2025-W22'),
+    ('Weekly_Report-22-2025.xlsx', None, b'week,cases\n', 'not an .xlsx workbook'),
+])
+def test_rejected_upload_leaves_nothing_behind(processor, filename, week, content, message):
+    version = processor.data_version
+    with pytest.raises(ValueError, match=message):
+        if content is None:
+            upload(processor, filename, week=week)
+        else:
+            processor.ingest_upload(io.BytesIO(content), filename, week=week)
+    assert data_files() == ['health_data.xlsx']
+    assert processor.data_version == version
+
+
+def test_existing_name_is_never_replaced(processor):
+    upload(processor, 'Weekly_Report-22-2025.xlsx')
+    version = processor.data_version
+    with pytest.raises(FileExistsError):
+        upload(processor, 'Weekly_Report-22-2025.xlsx', workbook=SHIPPED_WORKBOOK)
+    assert data_files() == ['Weekly_Report-22-2025.xlsx', 'health_data.xlsx']
+    assert processor.data_version == version
+
+
+def test_failure_before_publishing_removes_the_upload(processor, monkeypatch):
+    version = processor.data_version
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("publish failed")
+
+    monkeypatch.setattr(processor, '_publish', fail)
+    with pytest.raises(RuntimeError):
+        upload(processor, 'Weekly_Report-22-2025.xlsx')
+    assert data_files() == ['health_data.xlsx']
+    assert processor.data_version == version
+    assert processor.report_file == 'health_data.xlsx'
+
+
+def test_failure_after_publishing_keeps_the_upload(processor, monkeypatch):
+    def fail(fingerprint):
+        raise OSError("state directory not writable")
+
+    monkeypatch.setattr(processor, '_mark_loaded', fail)
+    result = upload(processor, 'Weekly_Report-22-2025.xlsx')
+    assert result['version'] == processor.data_version
+    assert 'Weekly_Report-22-2025.xlsx' in data_files()
+
+    # The next refresh loads the upload again rather than rolling the data back
+    monkeypatch.undo()
+    assert processor.refresh_data() is True
+    assert processor.get_surveillance()['weeks'] == [REPORT_WEEK, '2025-W22']
+    assert processor.refresh_data() is False
+
+
+def test_upload_endpoint(client, processor):
+    with open(REPORT_WORKBOOK, 'rb') as f:
+        response = client.post('/api/reports', data={'file': (f, 'IDSR week 22 2025.xlsx')})
+    assert response.status_code == 201
+    assert json.loads(response.data)['week'] == '2025-W22'
+
+    with open(REPORT_WORKBOOK, 'rb') as f:
+        response = client.post('/api/reports', data={'file': (f, 'IDSR week 22 2025.xlsx')})
+    assert response.status_code == 409
+
+    with open(REPORT_WORKBOOK, 'rb') as f:
+        response = client.post('/api/reports?filename=report.xlsx', data=f.read())
+    assert response.status_code == 400
+    assert 'No epi-week' in json.loads(response.data)['error']
@@ -1,9 +1,12 @@
 import os
+import time
 import requests
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from district_names import district_index
+
 logger = logging.getLogger(__name__)
 from dotenv import load_dotenv
 
@@ -12,9 +15,18 @@ load_dotenv()
 class WeatherService:
     """Service for fetching real-time weather data"""
     
-    def __init__(self):
+    def __init__(self, state_store=None, database=None):
         self.api_key = os.environ.get("OPENWEATHER_API_KEY")
-        self.base_url = "https://api.openweathermap.org/data/2.5"
+        # Overridable so load tests can point the service at a local stand-in
+        self.base_url = os.environ.get("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
+        self.state_store = state_store
+        self.database = database
+        
+        # Last successful API result, reused by every endpoint until it expires
+        self.cache_ttl = 30 * 60
+        self._cached_weather = None
+        self._cached_at = 0.0
+        self._synced_mtime = None
         
         # Major cities in Pakistan for weather monitoring
         self.cities = [
@@ -28,17 +40,67 @@ class WeatherService:
             {"name": "Quetta", "lat": 30.1798, "lon": 66.9750}
         ]
         
+        # High-risk areas based on disease case data, as district ids so any spelling of a city joins
+        self.high_risk_districts = set()
+        for name in ["Karachi", "Lahore", "Faisalabad", "Rawalpindi", "Multan", "Peshawar", "Quetta"]:
+            self.high_risk_districts.update(district_index.city(name))
+        
         if not self.api_key:
             logger.warning("OpenWeatherMap API key not found. Weather features will be limited.")
         else:
             print(f"OpenWeatherMap API Key loaded: {self.api_key[:5]}...{self.api_key[-5:]}") # Print partial key for verification
+        
+        self.sync_from_store()
+    
+    def sync_from_store(self) -> bool:
+        """Reuse the persisted weather result (from before a restart or from the scheduler leader)"""
+        if not self.state_store:
+            return False
+        mtime = self.state_store.mtime('weather')
+        if mtime is None or mtime == self._synced_mtime:
+            return False
+        self._synced_mtime = mtime
+        document = self.state_store.load('weather')
+        if not document or not document.get('payload'):
+            return False
+        saved_at = datetime.fromisoformat(document['saved_at']).timestamp()
+        if saved_at <= self._cached_at:
+            return False
+        self._cached_weather = document['payload']
+        self._cached_at = saved_at
+        logger.info(f"Restored weather data from {document.get('saved_at')}")
+        return True
+    
+    @property
+    def cache_age(self) -> Optional[float]:
+        """Seconds since the cached weather was fetched, or None if nothing is cached"""
+        if self._cached_weather is None:
+            return None
+        return time.time() - self._cached_at
+    
+    @property
+    def data_version(self) -> Optional[int]:
+        """Version of the cached weather (fetch time in ms), or None when serving fallback data"""
+        if self._cached_weather is None or not self.api_key:
+            return None
+        return int(self._cached_at * 1000)
     
-    def get_current_weather(self) -> Dict[str, Any]:
-        """Get current weather data for major Pakistani cities"""
+    def get_current_weather(self, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """Get current weather data for major Pakistani cities
+        
+        Results younger than ``max_age`` seconds (default ``cache_ttl``) are
+        served from cache; pass ``max_age=0`` to force a fetch.
+        """
         try:
             if not self.api_key:
                 return self._get_fallback_weather()
             
+            if max_age is None:
+                max_age = self.cache_ttl
+            cache_age = self.cache_age
+            if cache_age is not None and cache_age < max_age:
+                return self._cached_weather
+            
             weather_data = {
                 "national_summary": {},
                 "cities": [],
@@ -54,6 +116,11 @@ class WeatherService:
             # Calculate national summary
             if weather_data["cities"]:
                 weather_data["national_summary"] = self._calculate_national_summary(weather_data["cities"])
+                self._cached_weather = weather_data
+                self._cached_at = time.time()
+                if self.state_store:
+                    self.state_store.save('weather', weather_data)
+                self._record_observations(weather_data["cities"])
             
             return weather_data
             
@@ -61,6 +128,15 @@ class WeatherService:
             logger.error(f"Error fetching weather data: {e}")
             return self._get_fallback_weather()
     
+    def _record_observations(self, cities):
+        """Keep each fetch in the database, building up an observation history"""
+        if not self.database:
+            return
+        try:
+            self.database.record_weather(cities)
+        except Exception as e:
+            logger.error(f"Error recording weather observations: {e}")
+    
     def _get_city_weather(self, city: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Get weather data for a specific city"""
         try:
@@ -152,53 +228,57 @@ class WeatherService:
             logger.error(f"Error getting dominant condition: {e}")
             return "Unknown"
     
+    def evaluate_alerts(self, weather_data: Dict[str, Any]) -> list:
+        """Alerts raised by actual weather conditions (no demonstration alerts)"""
+        alerts = []
+        
+        for city in weather_data.get("cities", []):
+            # Focus on high-risk areas or areas with concerning weather conditions
+            high_risk = not self.high_risk_districts.isdisjoint(district_index.city(city["city"]))
+            if high_risk or city["temperature"] > 35 or city["humidity"] > 70:
+                if city["temperature"] > 40:
+                    alerts.append({
+                        "city": city["city"],
+                        "type": "heat_wave",
+                        "severity": "high",
+                        "message": f"Extreme heat warning: {city['temperature']}°C - High risk for heat-related illness",
+                        "health_impact": "Increases dehydration and heat stroke risk"
+                    })
+                
+                if city["humidity"] > 75:
+                    alerts.append({
+                        "city": city["city"],
+                        "type": "high_humidity",
+                        "severity": "medium",
+                        "message": f"High humidity: {city['humidity']}% - Optimal conditions for disease vectors",
+                        "health_impact": "Increases malaria and dengue transmission risk"
+                    })
+                
+                if city["temperature"] > 28 and city["humidity"] > 70:
+                    alerts.append({
+                        "city": city["city"],
+                        "type": "vector_breeding",
+                        "severity": "high",
+                        "message": f"Ideal vector conditions: {city['temperature']}°C, {city['humidity']}% humidity",
+                        "health_impact": "Perfect breeding conditions for mosquitoes"
+                    })
+                
+                if city["temperature"] < 5:
+                    alerts.append({
+                        "city": city["city"],
+                        "type": "cold_wave",
+                        "severity": "medium",
+                        "message": f"Cold wave warning: {city['temperature']}°C - Respiratory illness risk",
+                        "health_impact": "Increases respiratory infection risk"
+                    })
+        
+        return alerts
+    
     def get_weather_alerts(self) -> Dict[str, Any]:
         """Get weather alerts that may affect health"""
         try:
             weather_data = self.get_current_weather()
-            alerts = []
-            
-            # High-risk areas based on disease case data
-            high_risk_areas = ["Karachi", "Lahore", "Faisalabad", "Rawalpindi", "Multan", "Peshawar", "Quetta"]
-            
-            for city in weather_data.get("cities", []):
-                # Focus on high-risk areas or areas with concerning weather conditions
-                if city["city"] in high_risk_areas or city["temperature"] > 35 or city["humidity"] > 70:
-                    if city["temperature"] > 40:
-                        alerts.append({
-                            "city": city["city"],
-                            "type": "heat_wave",
-                            "severity": "high",
-                            "message": f"Extreme heat warning: {city['temperature']}°C - High risk for heat-related illness",
-                            "health_impact": "Increases dehydration and heat stroke risk"
-                        })
-                    
-                    if city["humidity"] > 75:
-                        alerts.append({
-                            "city": city["city"],
-                            "type": "high_humidity",
-                            "severity": "medium",
-                            "message": f"High humidity: {city['humidity']}% - Optimal conditions for disease vectors",
-                            "health_impact": "Increases malaria and dengue transmission risk"
-                        })
-                    
-                    if city["temperature"] > 28 and city["humidity"] > 70:
-                        alerts.append({
-                            "city": city["city"],
-                            "type": "vector_breeding",
-                            "severity": "high",
-                            "message": f"Ideal vector conditions: {city['temperature']}°C, {city['humidity']}% humidity",
-                            "health_impact": "Perfect breeding conditions for mosquitoes"
-                        })
-                    
-                    if city["temperature"] < 5:
-                        alerts.append({
-                            "city": city["city"],
-                            "type": "cold_wave",
-                            "severity": "medium",
-                            "message": f"Cold wave warning: {city['temperature']}°C - Respiratory illness risk",
-                            "health_impact": "Increases respiratory infection risk"
-                        })
+            alerts = self.evaluate_alerts(weather_data)
             
             # Always add at least some alerts for demonstration
             if len(alerts) == 0:
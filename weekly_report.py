@@ -0,0 +1,261 @@
+import os
+import uuid
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# A failed build of a version is retried by requests only after this long
+RETRY_SECONDS = 300
+
+
+def collect_report(data_processor, snapshot, ai_analyzer=None) -> Dict[str, Any]:
+    """The numbers of ``snapshot``'s weekly report, as plain data that can be sent to a worker process"""
+    data = snapshot.data
+    table = data_processor.get_location_table(snapshot)
+    recommendations = None
+    if ai_analyzer is not None:
+        recommendations = ai_analyzer.generate_recommendations(data, data_version=snapshot.version)
+    return {
+        'version': snapshot.version,
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M'),
+        'last_updated': data.get('last_updated', ''),
+        'stats': dict(data.get('dashboard_stats', {})),
+        'national_summary': sorted(dict(data.get('national_summary', {})).items(), key=lambda x: x[1], reverse=True),
+        'districts': table.to_records(table.top(len(table))),
+        'alerts': data_processor.get_alerts(snapshot),
+        'recommendations': recommendations or {}
+    }
+
+
+def write_workbook(report: Dict[str, Any], path: str) -> str:
+    """Write ``report`` to an .xlsx file at ``path``.
+
+    Runs in a worker process. The workbook is written in xlsxwriter's
+    constant_memory mode, which flushes each row to disk as soon as the
+    next one starts, so every sheet is written strictly top to bottom.
+    """
+    import xlsxwriter
+
+    with xlsxwriter.Workbook(path, {'constant_memory': True}) as workbook:
+        title = workbook.add_format({'bold': True, 'font_size': 14})
+        header = workbook.add_format({'bold': True, 'bg_color': '#DDEBF7', 'border': 1})
+        bold = workbook.add_format({'bold': True})
+        count = workbook.add_format({'num_format': '#,##0'})
+        percent = workbook.add_format({'num_format': '0.0%'})
+        wrap = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+
+        sheet = workbook.add_worksheet('Summary')
+        sheet.set_column(0, 0, 32)
+        sheet.set_column(1, 2, 14)
+        row = _write_rows(sheet, 0, [
+            ['Weekly Health Surveillance Report'],
+            ['Generated', report['generated_at']],
+            ['Data updated', report['last_updated']],
+            ['Data version', report['version']],
+            []
+        ], title_format=title)
+        sheet.write_row(row, 0, ['Indicator', 'Value'], header)
+        row += 1
+        for name, value in report['stats'].items():
+            sheet.write(row, 0, name.replace('_', ' ').capitalize())
+            sheet.write(row, 1, value, count if isinstance(value, int) else None)
+            row += 1
+        row += 1
+        sheet.write(row, 0, 'National summary', bold)
+        row += 1
+        sheet.write_row(row, 0, ['Disease', 'Cases', 'Share'], header)
+        row += 1
+        total = sum(cases for _, cases in report['national_summary'])
+        for disease, cases in report['national_summary']:
+            sheet.write(row, 0, disease.title())
+            sheet.write_number(row, 1, cases, count)
+            sheet.write_number(row, 2, cases / total if total else 0, percent)
+            row += 1
+
+        sheet = workbook.add_worksheet('District Rankings')
+        sheet.set_column(0, 0, 6)
+        sheet.set_column(1, 1, 30)
+        sheet.set_column(2, 4, 14)
+        sheet.freeze_panes(1, 0)
+        sheet.write_row(0, 0, ['Rank', 'District', 'Province', 'Cases', 'Risk level'], header)
+        for rank, location in enumerate(report['districts'], start=1):
+            cases = location.get('cases', 0)
+            sheet.write_number(rank, 0, rank)
+            sheet.write(rank, 1, location.get('location', ''))
+            sheet.write(rank, 2, location.get('province', ''))
+            sheet.write_number(rank, 3, cases, count)
+            sheet.write(rank, 4, 'High' if cases > 2000 else 'Medium' if cases > 1000 else 'Low')
+        if report['districts']:
+            sheet.autofilter(0, 0, len(report['districts']), 4)
+
+        sheet = workbook.add_worksheet('Alerts')
+        sheet.set_column(0, 0, 10)
+        sheet.set_column(1, 2, 60, wrap)
+        sheet.set_column(3, 4, 16)
+        sheet.freeze_panes(1, 0)
+        sheet.write_row(0, 0, ['Priority', 'Alert', 'Location', 'Cases', 'Date'], header)
+        for row, alert in enumerate(report['alerts'], start=1):
+            sheet.write(row, 0, str(alert.get('priority', '')).capitalize())
+            sheet.write(row, 1, alert.get('message', ''))
+            sheet.write(row, 2, alert.get('location', ''))
+            if alert.get('case_count') is not None:
+                sheet.write_number(row, 3, alert['case_count'], count)
+            sheet.write(row, 4, alert.get('date', ''))
+
+        recommendations = report['recommendations']
+        sheet = workbook.add_worksheet('Recommendations')
+        sheet.set_column(0, 0, 60, wrap)
+        sheet.set_column(1, 3, 40, wrap)
+        row = 0
+        risk = recommendations.get('risk_assessment') or {}
+        if risk:
+            row = _write_rows(sheet, row, [
+                ['Risk assessment'],
+                ['Overall risk', str(risk.get('overall_risk', '')).capitalize()],
+                ['Key concerns', '; '.join(risk.get('key_concerns', []))],
+                ['Potential outcomes', risk.get('potential_outcomes', '')],
+                []
+            ], title_format=bold)
+        row = _write_table(sheet, row, 'Priority actions', header, bold, recommendations.get('priority_actions', []),
+                           [('Action', 'action'), ('Priority', 'priority'), ('Timeline', 'timeline'),
+                            ('Resources needed', 'resources_needed')])
+        _write_table(sheet, row, 'Prevention strategies', header, bold, recommendations.get('prevention_strategies', []),
+                     [('Strategy', 'strategy'), ('Target population', 'target_population'),
+                      ('Expected impact', 'expected_impact')])
+    return path
+
+
+def _write_rows(sheet, row: int, rows, title_format=None) -> int:
+    """Write ``rows`` from ``row`` down, the first in ``title_format``; returns the next free row"""
+    for i, values in enumerate(rows):
+        if values:
+            sheet.write_row(row, 0, values, title_format if i == 0 else None)
+        row += 1
+    return row
+
+
+def _write_table(sheet, row: int, title: str, header, title_format, entries, columns) -> int:
+    if not entries:
+        return row
+    sheet.write(row, 0, title, title_format)
+    sheet.write_row(row + 1, 0, [label for label, _ in columns], header)
+    row += 2
+    for entry in entries:
+        sheet.write_row(row, 0, [str(entry.get(key, '')) for _, key in columns])
+        row += 1
+    return row + 1
+
+
+class WeeklyReports:
+    """Weekly Excel reports, built in a worker process and cached per data version.
+
+    A build collects the report's numbers in a background thread, which may
+    have to wait for the AI recommendations of a new version, and writes the
+    workbook in a short-lived worker process, so neither the web workers nor
+    their memory are tied up. Finished reports are written atomically to
+    ``report_dir`` (shared by every worker); the latest ``keep`` are kept.
+    """
+
+    def __init__(self, data_processor, ai_analyzer=None, report_dir: str = 'reports', keep: int = 4):
+        self.data_processor = data_processor
+        self.ai_analyzer = ai_analyzer
+        self.report_dir = report_dir
+        self.keep = keep
+        self._lock = threading.Lock()
+        # Build status per data version: {'status', 'started_at', 'finished_at', 'error'}
+        self._builds: Dict[int, Dict[str, Any]] = {}
+        os.makedirs(report_dir, exist_ok=True)
+
+    def path(self, version: int) -> str:
+        return os.path.join(self.report_dir, f"weekly-report-v{version}.xlsx")
+
+    def ready(self, version: int) -> Optional[str]:
+        """Path of the finished report of ``version``, or None if it is not built yet"""
+        path = self.path(version)
+        return path if os.path.exists(path) else None
+
+    def request(self) -> Dict[str, Any]:
+        """Start building the report of the current data version in the background.
+
+        Returns the build status; nothing is started if the report exists
+        or is already being built.
+        """
+        snapshot, build, started = self._start()
+        version = snapshot.version
+        if started:
+            threading.Thread(target=self._build, args=(snapshot, build), name=f"weekly-report-v{version}",
+                             daemon=True).start()
+            logger.info(f"Weekly report v{version} queued")
+        return dict(build, version=version)
+
+    def build(self) -> Optional[str]:
+        """Build the report of the current data version in the calling thread (scheduled runs)"""
+        snapshot, build, started = self._start()
+        if started:
+            self._build(snapshot, build)
+        return self.ready(snapshot.version)
+
+    def _start(self):
+        """(current snapshot, its build status, whether the caller must run the build)"""
+        snapshot = self.data_processor.get_snapshot()
+        version = snapshot.version
+        with self._lock:
+            if self.ready(version):
+                return snapshot, {'status': 'ready'}, False
+            build = self._builds.get(version)
+            if build is not None and (build['status'] == 'building' or self._recently_failed(build)):
+                return snapshot, build, False
+            build = {'status': 'building', 'started_at': datetime.now().isoformat(), 'finished_at': None, 'error': None}
+            # Only the current version's build is tracked
+            self._builds = {version: build}
+        return snapshot, build, True
+
+    def _recently_failed(self, build: Dict[str, Any]) -> bool:
+        return (build['status'] == 'failed' and build['finished_at'] is not None and
+                (datetime.now() - datetime.fromisoformat(build['finished_at'])).total_seconds() < RETRY_SECONDS)
+
+    def _build(self, snapshot, build: Dict[str, Any]):
+        version = snapshot.version
+        tmp_path = f"{self.path(version)}.{uuid.uuid4().hex}.tmp"
+        try:
+            report = collect_report(self.data_processor, snapshot, self.ai_analyzer)
+            # A fresh interpreter: forking a threaded web worker is unsafe, and the pool ends with the build
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                executor.submit(write_workbook, report, tmp_path).result()
+            os.replace(tmp_path, self.path(version))
+            self._prune()
+            build['finished_at'] = datetime.now().isoformat()
+            build['status'] = 'ready'
+            logger.info(f"Weekly report v{version} built")
+        except Exception as e:
+            build['error'] = str(e)
+            logger.error(f"Error building weekly report v{version}: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            build['finished_at'] = datetime.now().isoformat()
+            build['status'] = 'failed'
+
+    def _prune(self):
+        reports = [os.path.join(self.report_dir, name) for name in os.listdir(self.report_dir)
+                   if name.startswith('weekly-report-v') and name.endswith('.xlsx')]
+        reports.sort(key=os.path.getmtime)
+        for path in reports[:-self.keep]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'report_dir': self.report_dir,
+            'builds': {version: dict(build) for version, build in self._builds.items()}
+        }
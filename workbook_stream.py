@@ -0,0 +1,75 @@
+import os
+import shutil
+import logging
+import tempfile
+from typing import BinaryIO, Callable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bytes copied per read while saving an upload
+CHUNK_SIZE = 1024 * 1024
+
+# Every .xlsx file is a zip archive
+XLSX_MAGIC = b'PK\x03\x04'
+
+
+def save_stream(stream: BinaryIO, directory: str) -> str:
+    """Copy ``stream`` to a hidden temporary file in ``directory`` in fixed-size chunks.
+
+    The file has a leading dot, so the data directory watcher ignores it;
+    ``publish_file`` moves it into place once it has been ingested.
+    Returns its path. Raises ValueError if the content is not an .xlsx workbook.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.xlsx')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(stream, f, CHUNK_SIZE)
+        with open(tmp_path, 'rb') as f:
+            if f.read(len(XLSX_MAGIC)) != XLSX_MAGIC:
+                raise ValueError("Uploaded file is not an .xlsx workbook")
+        return tmp_path
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def publish_file(tmp_path: str, directory: str, filename: str) -> str:
+    """Move ``tmp_path`` to ``directory/filename``, never replacing an existing file.
+
+    Raises FileExistsError if that name is taken; ``tmp_path`` is left in
+    place for the caller to remove.
+    """
+    path = os.path.join(directory, filename)
+    # A hard link fails if the name exists, so a workbook already there is never overwritten
+    os.link(tmp_path, path)
+    os.unlink(tmp_path)
+    return path
+
+
+def iter_sheets(path: str) -> Iterator[Tuple[str, List[str], Callable[[List[int]], Iterator[tuple]]]]:
+    """(sheet name, header, read_rows) for every sheet, streamed with openpyxl read-only.
+
+    Blank header cells are named "Unnamed: <n>" as pandas does.
+    ``read_rows(usecols)`` iterates the data rows as tuples of just the
+    ``usecols`` cells; it must be consumed (or dropped) before moving on
+    to the next sheet, and a sheet whose rows are not needed is never read.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            header = next(worksheet.iter_rows(max_row=1, values_only=True), None)
+            if not header:
+                continue
+            header = [f'Unnamed: {i}' if name is None or not str(name).strip() else str(name)
+                      for i, name in enumerate(header)]
+
+            def read_rows(usecols, worksheet=worksheet):
+                rows = worksheet.iter_rows(min_row=2, max_col=max(usecols) + 1, values_only=True)
+                return (tuple(row[i] if i < len(row) else None for i in usecols) for row in rows)
+
+            yield worksheet.title, header, read_rows
+    finally:
+        workbook.close()